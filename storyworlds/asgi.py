@@ -0,0 +1,174 @@
+"""
+ASGI config for storyworlds project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+for servers such as uvicorn or daphne, e.g. ``uvicorn storyworlds.asgi:application``.
+
+Django 2.2 has no ASGI support of its own, so ASGIHandler runs the usual
+middleware and views on a bounded pool of ASGI_THREADS threads. The threads
+only do database and view work. While a streamed response (timelines,
+campaign maps, exports) waits on a slow client, it holds no thread: each
+pool job produces the next chunk or so, and the event loop sends it. One
+process can then keep many more clients streaming than it has threads or
+database connections.
+
+Each pool thread keeps its own database connection, so set CONN_MAX_AGE to
+reuse them rather than reconnecting for every chunk.
+"""
+
+import asyncio
+import functools
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core import signals
+from django.core.handlers import base
+from django.core.handlers.wsgi import WSGIRequest, get_script_name
+from django.db import close_old_connections
+from django.urls import set_script_prefix
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "storyworlds.settings")
+
+# Bytes of streamed content gathered per pool job.
+CHUNK_SIZE = 64 * 1024
+
+
+class ASGIHandler(base.BaseHandler):
+    request_class = WSGIRequest
+
+    def __init__(self, threads=None):
+        super().__init__()
+        self.load_middleware()
+        self.executor = ThreadPoolExecutor(threads or settings.ASGI_THREADS, thread_name_prefix="storyworlds")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError("Unsupported ASGI scope type %r" % scope["type"])
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def run(self, script_name, function, *args):
+        """Call function in the thread pool."""
+        job = functools.partial(_pool_job, script_name, function, *args)
+        return await asyncio.get_event_loop().run_in_executor(self.executor, job)
+
+    async def http(self, scope, receive, send):
+        body = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, mode="w+b")
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                body.close()
+                return
+            body.write(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body.seek(0)
+        environ = wsgi_environ(scope, body)
+        script_name = get_script_name(environ)
+
+        disconnected = asyncio.Event()
+        watcher = asyncio.ensure_future(_watch_disconnect(receive, disconnected))
+        response = None
+        try:
+            response = await self.run(script_name, self.respond, environ)
+            headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response.items()]
+            headers += [
+                (b"Set-Cookie", c.output(header="").strip().encode("latin-1")) for c in response.cookies.values()
+            ]
+            await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+            if not response.streaming:
+                await send({"type": "http.response.body", "body": response.content})
+                return
+            chunks = iter(response.streaming_content)
+            done = False
+            while not done and not disconnected.is_set():
+                content, done = await self.run(script_name, _read, chunks)
+                await send({"type": "http.response.body", "body": content, "more_body": not done})
+        finally:
+            watcher.cancel()
+            if response is not None:
+                # Closing sends request_finished, which releases the database connection.
+                await self.run(script_name, response.close)
+            body.close()
+
+    def respond(self, environ):
+        signals.request_started.send(sender=self.__class__, environ=environ)
+        request = self.request_class(environ)
+        return self.get_response(request)
+
+
+def _pool_job(script_name, function, *args):
+    set_script_prefix(script_name)
+    close_old_connections()
+    return function(*args)
+
+
+def _read(chunks):
+    """Up to about CHUNK_SIZE bytes of streamed content, and whether that was the last of it."""
+    content, size = [], 0
+    for chunk in chunks:
+        content.append(chunk)
+        size += len(chunk)
+        if size >= CHUNK_SIZE:
+            return b"".join(content), False
+    return b"".join(content), True
+
+
+async def _watch_disconnect(receive, disconnected):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            disconnected.set()
+            return
+
+
+def wsgi_environ(scope, body):
+    """The WSGI environ equivalent to an ASGI HTTP scope, reading the request body from body."""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        # WSGI strings are bytes decoded as latin-1; Django re-encodes them.
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/%s" % scope.get("http_version", "1.1"),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+        environ["REMOTE_PORT"] = str(scope["client"][1])
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+        value = value.decode("latin-1")
+        environ[name] = "%s,%s" % (environ[name], value) if name in environ else value
+    return environ
+
+
+django.setup(set_prefix=False)
+application = ASGIHandler()
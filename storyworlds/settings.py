@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 import os
+import sys
+
 import environ
 
 ###############################################################################
@@ -34,6 +36,13 @@ SECRET_KEY = env("SECRET_KEY")
 defaultdb = "spatialite:///%s/db.sqlite3" % BASE_DIR
 DATABASES = {"default": env.db(default=defaultdb)}
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# Holds versioned world responses (see worlds.caching). Local memory is per
+# process; set CACHE_URL to e.g. filecache:///var/tmp/storyworlds or
+# rediscache://127.0.0.1:6379/1 (needs django-redis) to share it.
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 STATIC_URL = "/static/"
@@ -53,6 +62,14 @@ USE_TZ = True
 
 TAGGIT_CASE_INSENSITIVE = True
 
+# Query budgets (see worlds.instrumentation): views running more queries than
+# their budget log a warning, or fail when strict, as they do under the tests.
+# QUERY_BUDGETS sets budgets by view name, e.g. {"admin:worlds_event_changelist": 10}.
+QUERY_BUDGET_STRICT = env.bool("QUERY_BUDGET_STRICT", default=sys.argv[1:2] == ["test"])
+QUERY_BUDGETS = {}
+# Addresses allowed to read /metrics/.
+METRICS_ALLOWED_IPS = env.list("METRICS_ALLOWED_IPS", default=["127.0.0.1", "::1"])
+
 
 ###############################################################################
 # Project Composition
@@ -80,6 +97,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that it measures the whole request (see worlds.instrumentation).
+    "worlds.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -126,3 +145,5 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "storyworlds.wsgi.application"
+# Threads running views and database queries under ASGI (see storyworlds.asgi).
+ASGI_THREADS = env.int("ASGI_THREADS", default=8)
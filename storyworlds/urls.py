@@ -14,8 +14,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from worlds import views as worlds_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('worlds/', include('worlds.urls')),
+    path('metrics/', worlds_views.metrics, name='metrics'),
 ]
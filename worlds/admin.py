@@ -2,8 +2,10 @@ from adminsortable2.admin import SortableInlineAdminMixin
 from django.contrib import admin
 from django.contrib.gis import admin as geoadmin
 
+from . import search
 from .models import (
     Character,
+    DateConstraint,
     Event,
     EventParticipation,
     FamilyTie,
@@ -17,6 +19,18 @@ from .models import (
 )
 
 
+# ======================================================================
+# Mixins
+# ======================================================================
+class FullTextSearchMixin:
+    """Answer changelist and autocomplete searches from the full-text index (see worlds.search)."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=search.matching_pks(self.model, search_term)), False
+
+
 # ======================================================================
 # Inlines used in entity admins
 # ======================================================================
@@ -24,30 +38,55 @@ class EventParticipationInline(admin.TabularInline):
     model = Event.participants.through
     # For the inline, just show and allow the event association. To edit timespans
     # or other properties, go to the Event Participation admin.
-    fields = ("character", "role")
+    fields = ("character", "role", "significance")
+    autocomplete_fields = ("character",)
+
+
+class DateConstraintInline(admin.TabularInline):
+    model = DateConstraint
+    fk_name = "event"
+    extra = 1
+    autocomplete_fields = ("other",)
 
 
 class ChildrenInline(SortableInlineAdminMixin, admin.TabularInline):
     model = Character.children.through
     fk_name = "parent"  # Relations where the current character is parent
     extra = 1
+    autocomplete_fields = ("child",)
+
+    def get_queryset(self, request):
+        # Each row is labelled with the tie's __str__, which names both characters.
+        return super().get_queryset(request).select_related("parent", "child")
 
 
 class ParentsInline(SortableInlineAdminMixin, admin.TabularInline):
     model = Character.parents.through
     fk_name = "child"  # Relations where the current character is child
     extra = 1
+    autocomplete_fields = ("parent",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("parent", "child")
 
 
 class HonorsInline(admin.TabularInline):
     model = Honor
     extra = 1
     fields = ("org", "start_year", "start_month", "start_day", "end_year", "end_month", "end_day")
+    autocomplete_fields = ("org",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("org")
 
 
 class CharacterTitlesInline(admin.TabularInline):
     model = Title
     extra = 1
+    autocomplete_fields = ("place",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("place")
 
 
 class ReferencesInline(admin.TabularInline):
@@ -64,19 +103,30 @@ class WorldAdmin(admin.ModelAdmin):
 
 
 @admin.register(Place)
-class PlaceAdmin(geoadmin.OSMGeoAdmin):
+class PlaceAdmin(FullTextSearchMixin, geoadmin.OSMGeoAdmin):
     prepopulated_fields = {"slug": ("name",)}
     search_fields = ("name",)
+    list_display = ("name", "outlines_stale")
+
+    def get_queryset(self, request):
+        # Detailed geography can run to megabytes per row; only the change form needs it.
+        return super().get_queryset(request).defer("geo_detail")
+
+    def save_model(self, request, obj, form, change):
+        if change and "geo_detail" not in form.changed_data:
+            # The place was loaded without its geography, so the save cannot tell it is unchanged.
+            obj._stored_geo_detail = obj.geo_detail
+        super().save_model(request, obj, form, change)
 
 
 @admin.register(Setting)
-class SettingAdmin(admin.ModelAdmin):
+class SettingAdmin(FullTextSearchMixin, admin.ModelAdmin):
     prepopulated_fields = {"slug": ("name",)}
     search_fields = ("name",)
 
 
 @admin.register(Organization)
-class OrgAdmin(geoadmin.OSMGeoAdmin):
+class OrgAdmin(FullTextSearchMixin, geoadmin.OSMGeoAdmin):
     fields = (
         "world",
         ("name", "slug"),
@@ -91,7 +141,7 @@ class OrgAdmin(geoadmin.OSMGeoAdmin):
 
 
 @admin.register(Character)
-class CharacterAdmin(admin.ModelAdmin):
+class CharacterAdmin(FullTextSearchMixin, admin.ModelAdmin):
     fields = (
         "world",
         ("name", "slug"),
@@ -107,7 +157,7 @@ class CharacterAdmin(admin.ModelAdmin):
 
 
 @admin.register(Event)
-class EventAdmin(admin.ModelAdmin):
+class EventAdmin(FullTextSearchMixin, admin.ModelAdmin):
     fields = (
         "world",
         ("name", "slug"),
@@ -115,12 +165,14 @@ class EventAdmin(admin.ModelAdmin):
         ("start_year", "start_month", "start_day", "start_time"),
         ("end_year", "end_month", "end_day", "end_time"),
         "place",
+        "significance",
         "tags",
         "notes",
     )
     prepopulated_fields = {"slug": ("name",)}
     search_fields = ("name",)
-    inlines = [EventParticipationInline]
+    autocomplete_fields = ("place",)
+    inlines = [EventParticipationInline, DateConstraintInline]
 
     list_display = ("start_year", "start_month", "start_day", "name")
     list_display_links = ("name",)
@@ -129,11 +181,19 @@ class EventAdmin(admin.ModelAdmin):
 @admin.register(EventParticipation)
 class EventParticipationAdmin(admin.ModelAdmin):
     empty_value_display = "unknown"
+    autocomplete_fields = ("character", "event")
+
+    list_display = ("character", "role", "event")
+    list_select_related = ("character", "event")
 
 
 @admin.register(FamilyTie)
 class FamilyTieAdmin(admin.ModelAdmin):
     empty_value_display = "unknown"
+    autocomplete_fields = ("parent", "child")
+
+    list_display = ("__str__", "birth_order")
+    list_select_related = ("parent", "child")
 
 
 @admin.register(Reference)
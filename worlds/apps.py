@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class WorldsConfig(AppConfig):
     name = 'worlds'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (connects the receivers)
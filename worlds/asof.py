@@ -0,0 +1,233 @@
+"""The state of a world as of a date: titles held, honors, relationships and participations current then.
+
+Each kind of Temporal row is loaded once per world into a static centered
+interval tree over its (start_key, end_key) spans, so a snapshot costs no
+query and about O(log n + k) work for k current rows: fast enough to scrub
+through centuries one year at a time.
+
+Spans are those of the sort keys, so a row with an unknown end stays current
+from its start on (see chronology.OPEN_END). As in the graph, rows without
+dates (null keys) are current at any time, and participations without dates
+of their own last as long as the event. Indexes are cached per process and
+rebuilt on first use after the world's version (see worlds.caching) changes.
+"""
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+
+from django.db.models.functions import Coalesce
+
+from . import caching
+from .chronology import lower_bound, upper_bound
+from .models import CharacterRelationship, EventParticipation, Honor, Title
+
+KINDS = ("title", "honor", "relationship", "participation")
+
+# Open ends of the spans of rows without dates.
+KEY_MIN = -(2**63)
+KEY_MAX = 2**63 - 1
+
+# Worlds whose indexes are kept loaded, least recently used first.
+MAX_WORLDS = 8
+
+
+class IntervalIndex:
+    """A static centered interval tree of (start, end, item) spans, ends inclusive."""
+
+    def __init__(self, spans):
+        self.size = len(spans)
+        self.root = self._build(sorted(spans, key=lambda span: span[0]))
+
+    @classmethod
+    def _build(cls, spans):
+        """A node for spans sorted by start: (center, starts, items by start, negated ends, items by end, left, right)."""
+        if not spans:
+            return None
+        center = spans[len(spans) // 2][0]
+        here, left, right = [], [], []
+        for span in spans:
+            if span[1] < center:
+                left.append(span)
+            elif span[0] > center:
+                right.append(span)
+            else:
+                here.append(span)
+        by_end = sorted(here, key=lambda span: -span[1])
+        return (
+            center,
+            [span[0] for span in here],
+            [span[2] for span in here],
+            [-span[1] for span in by_end],
+            [span[2] for span in by_end],
+            cls._build(left),
+            cls._build(right),
+        )
+
+    def overlapping(self, lo, hi):
+        """The items whose spans touch lo through hi."""
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            center, starts, by_start, ends, by_end, left, right = node
+            if hi < center:
+                # Every span here ends after hi; keep those starting by hi.
+                found.extend(by_start[: bisect_right(starts, hi)])
+                stack.append(left)
+            elif lo > center:
+                # Every span here starts before lo; keep those ending from lo.
+                found.extend(by_end[: bisect_right(ends, -lo)])
+                stack.append(right)
+            else:
+                found.extend(by_start)
+                stack.append(left)
+                stack.append(right)
+        return found
+
+
+def _sources(world_id):
+    """kind -> (values_list of start key, end key, then the payload fields; payload field names)."""
+    return {
+        "title": (
+            Title.objects.filter(character__world=world_id).values_list(
+                "start_key", "end_key", "pk", "character", "character__name", "place", "place__name", "rank"
+            ),
+            ("pk", "character", "place", "rank"),
+        ),
+        "honor": (
+            Honor.objects.filter(character__world=world_id).values_list(
+                "start_key", "end_key", "pk", "character", "character__name", "org", "org__name"
+            ),
+            ("pk", "character", "organization"),
+        ),
+        "relationship": (
+            CharacterRelationship.objects.filter(from_char__world=world_id).values_list(
+                "start_key",
+                "end_key",
+                "pk",
+                "from_char",
+                "from_char__name",
+                "to_char",
+                "to_char__name",
+                "rel",
+                "rev",
+            ),
+            ("pk", "from_char", "to_char", "rel", "rev"),
+        ),
+        "participation": (
+            EventParticipation.objects.filter(character__world=world_id).values_list(
+                Coalesce("start_key", "event__start_key"),
+                Coalesce("end_key", "event__end_key"),
+                "pk",
+                "character",
+                "character__name",
+                "event",
+                "event__name",
+                "role",
+            ),
+            ("pk", "character", "event", "role"),
+        ),
+    }
+
+
+# The node kind of each (pk, name) pair in a source's payload, in order.
+_NODE_FIELDS = {
+    "title": ("character", "place"),
+    "honor": ("character", "organization"),
+    "relationship": ("character", "character"),
+    "participation": ("character", "event"),
+}
+
+
+class WorldIndex:
+    """One IntervalIndex per kind for a world, and the names of the nodes its rows refer to."""
+
+    def __init__(self, world_id, version):
+        self.world_id = world_id
+        self.version = version
+        self.names = {}
+        self.fields = {}
+        self.indexes = {}
+        for kind, (rows, fields) in _sources(world_id).items():
+            spans = []
+            node_kinds = _NODE_FIELDS[kind]
+            for row in rows.order_by().iterator():
+                start, end, pk = row[:3]
+                # Payload: pk, then node pks with their names interned, then plain fields.
+                payload = [pk]
+                for i, node_kind in enumerate(node_kinds):
+                    node, name = row[3 + 2 * i], row[4 + 2 * i]
+                    self.names["%s-%d" % (node_kind, node)] = name
+                    payload.append(node)
+                payload.extend(row[3 + 2 * len(node_kinds) :])
+                spans.append((KEY_MIN if start is None else start, KEY_MAX if end is None else end, tuple(payload)))
+            self.fields[kind] = fields
+            self.indexes[kind] = IntervalIndex(spans)
+
+    def as_of(self, start, end=None, kinds=None):
+        """The rows of each kind current at some time from start through end, and the names they refer to."""
+        lo, hi = lower_bound(start), upper_bound(start if end is None else end)
+        payload = {}
+        referred = set()
+        for kind in kinds or KINDS:
+            fields = self.fields[kind]
+            rows = sorted(self.indexes[kind].overlapping(lo, hi))
+            payload[kind] = [dict(zip(fields, row)) for row in rows]
+            for node_kind, i in zip(_NODE_FIELDS[kind], range(1, 3)):
+                referred.update("%s-%d" % (node_kind, row[i]) for row in rows)
+        payload["names"] = {node: self.names[node] for node in sorted(referred)}
+        return payload
+
+
+# ----------------------------------------------------------------------
+# Per-process registry
+# ----------------------------------------------------------------------
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_index(world):
+    """The index of a world (instance or pk), (re)building it when the world has changed."""
+    world_id = getattr(world, "pk", world)
+    version = caching.world_version(world_id)
+    with _lock:
+        index = _indexes.get(world_id)
+        if index is not None and index.version == version:
+            _indexes.move_to_end(world_id)
+            return index
+    index = WorldIndex(world_id, version)
+    with _lock:
+        _indexes[world_id] = index
+        _indexes.move_to_end(world_id)
+        while len(_indexes) > MAX_WORLDS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def world_as_of(world, start, end=None, kinds=None):
+    """The state of a world (instance or pk) at a date, or over start through end.
+
+    Dates are years, (year, month, day) tuples or dates. Returns a list of rows
+    for each of kinds (default KINDS) and "names", mapping the node ids of the
+    graph view ("character-<pk>", "place-<pk>", ...) referred to by the rows to
+    their names. Rows are dicts:
+
+    - title: pk, character, place, rank
+    - honor: pk, character, organization
+    - relationship: pk, from_char, to_char, rel, rev
+    - participation: pk, character, event, role
+    """
+    if kinds is not None and not set(kinds) <= set(KINDS):
+        raise ValueError("kind must be one of %s" % ", ".join(KINDS))
+    return get_index(world).as_of(start, end, kinds)
+
+
+def invalidate(world_id=None):
+    """Drop the index of one world, or of every world."""
+    with _lock:
+        if world_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(world_id, None)
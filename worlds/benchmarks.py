@@ -0,0 +1,180 @@
+"""Timings of the hot paths over a synthetic world (see worlds.synthetic).
+
+run() generates a world, then times each case in CASES a few times. Every
+run is measured with worlds.instrumentation, so results give query counts as
+well as times. Caches are cleared before each run, so views are timed cold.
+Results are plain dicts, ready to be written as JSON and compared with
+compare() against a baseline from an earlier run.
+"""
+import io
+import platform
+import statistics
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from . import asof, exchange, graph, instrumentation, search
+from .models import Character
+from .synthetic import GENERATIONS, generate_world
+
+FORMAT_VERSION = 1
+ADMIN_CHANGELISTS = ("character", "event", "eventparticipation", "familytie", "place")
+
+
+class Bench:
+    """What the cases need: the world, a logged in client, and some characters to start from."""
+
+    def __init__(self, world):
+        self.world = world
+        self.client = Client()
+        user, _ = get_user_model().objects.get_or_create(
+            username="benchmark", defaults={"is_staff": True, "is_superuser": True}
+        )
+        self.client.force_login(user)
+        characters = Character.objects.filter(world=world).order_by("pk").values_list("pk", flat=True)
+        count = characters.count()
+        # Characters from the first, middle and last generations.
+        self.first = characters[0]
+        self.middle = characters[count // 2]
+        self.last = characters[count - 1]
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        if response.status_code != 200:
+            raise AssertionError("%s returned %d" % (url, response.status_code))
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def world_url(self, name, **kwargs):
+        return reverse(name, kwargs=dict(slug=self.world.slug, **kwargs))
+
+
+def _changelist(model):
+    return lambda bench: bench.get(reverse("admin:worlds_%s_changelist" % model))
+
+
+CASES = dict(
+    [("admin_%s_changelist" % model, _changelist(model)) for model in ADMIN_CHANGELISTS]
+    + [
+        (
+            "admin_character_search",
+            lambda bench: bench.get(reverse("admin:worlds_character_changelist"), q="character 1"),
+        ),
+        ("timeline_first_page", lambda bench: bench.get(bench.world_url("world_timeline"), limit=100)),
+        (
+            "timeline_window",
+            lambda bench: bench.get(bench.world_url("world_timeline"), start="1050", end="1060", limit=100),
+        ),
+        ("timeline_zoomed_out", lambda bench: bench.get(bench.world_url("world_timeline"), zoom=1, per_bucket=5)),
+        (
+            "character_timeline",
+            lambda bench: bench.get(bench.world_url("character_timeline", pk=bench.middle)),
+        ),
+        ("family_ancestors", lambda bench: list(Character(pk=bench.last).ancestors())),
+        ("family_descendants", lambda bench: list(Character(pk=bench.first).descendants(max_depth=3))),
+        ("as_of_load", lambda bench: asof.get_index(bench.world)),
+        ("as_of_view", lambda bench: bench.get(bench.world_url("world_as_of"), as_of="1050")),
+        (
+            "deltas_view",
+            lambda bench: bench.get(bench.world_url("world_deltas"), start="1000", end="1100", step=1),
+        ),
+        ("graph_load", lambda bench: graph.get_graph(bench.world)),
+        (
+            "graph_neighbourhood",
+            lambda bench: bench.get(bench.world_url("world_graph"), character=bench.middle, hops=2),
+        ),
+        (
+            "graph_shortest_path",
+            lambda bench: bench.get(bench.world_url("world_graph"), character=bench.first, to=bench.last),
+        ),
+        ("search", lambda bench: search.search("character 12", bench.world, limit=50)),
+        ("search_view", lambda bench: bench.get(bench.world_url("world_search"), q="magic")),
+        ("export", lambda bench: exchange.export_world(bench.world, io.StringIO())),
+    ]
+)
+
+
+def _forget_caches():
+    cache.clear()
+    graph.invalidate()
+    asof.invalidate()
+
+
+def time_case(name, case, bench, repeat):
+    """Run one case repeat times; returns its result dict."""
+    runs = []
+    for _ in range(repeat):
+        _forget_caches()
+        with instrumentation.measure("benchmark:%s" % name, record=False) as measurement:
+            case(bench)
+        runs.append(measurement)
+    walls = [run.wall_time for run in runs]
+    return {
+        "runs": repeat,
+        "queries": max(run.queries for run in runs),
+        "wall_median": statistics.median(walls),
+        "wall_min": min(walls),
+        "wall_max": max(walls),
+        "db_median": statistics.median(run.db_time for run in runs),
+    }
+
+
+def run(characters, seed=0, repeat=5, cases=None, slug="benchmark"):
+    """Generate a world of the given size and time the cases on it (all of CASES by default)."""
+    started = time.perf_counter()
+    with instrumentation.measure("benchmark:import", record=False) as measurement:
+        world, counts = generate_world(slug, characters, seed, replace=True)
+    results = {
+        "import": {
+            "runs": 1,
+            "queries": measurement.queries,
+            "wall_median": measurement.wall_time,
+            "wall_min": measurement.wall_time,
+            "wall_max": measurement.wall_time,
+            "db_median": measurement.db_time,
+        }
+    }
+    bench = Bench(world)
+    for name in cases or CASES:
+        results[name] = time_case(name, CASES[name], bench, repeat)
+    return {
+        "format": FORMAT_VERSION,
+        "characters": characters,
+        "generations": GENERATIONS,
+        "seed": seed,
+        "rows": counts,
+        "database": connection.vendor,
+        "django": django.get_version(),
+        "python": platform.python_version(),
+        "seconds": time.perf_counter() - started,
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=0.25):
+    """Regressions of report against a baseline report, as messages.
+
+    A case regresses when its median time grows by more than tolerance (a
+    fraction), or when it runs more queries than it did.
+    """
+    if (report["characters"], report["seed"]) != (baseline["characters"], baseline["seed"]):
+        raise ValueError("The baseline was run on a different world")
+    regressions = []
+    for name, result in sorted(report["results"].items()):
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        if result["queries"] > before["queries"]:
+            regressions.append("%s: %d queries, was %d" % (name, result["queries"], before["queries"]))
+        if result["wall_median"] > before["wall_median"] * (1 + tolerance):
+            regressions.append(
+                "%s: %.1f ms, was %.1f ms" % (name, result["wall_median"] * 1000, before["wall_median"] * 1000)
+            )
+    return regressions
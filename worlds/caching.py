@@ -0,0 +1,140 @@
+"""Response caching keyed by per-world version counters.
+
+Every world has a version number in the cache, bumped by the receivers in
+worlds.signals whenever a row belonging to the world is saved or deleted, once
+the change is committed: a bump any earlier would let a concurrent request
+cache what it read before the commit under the new version.
+Cached responses and their ETags embed the version, so a change to a world
+makes all of its cached responses unreachable at once without having to find
+and delete them, and a hit needs no database query at all.
+
+Entries live in the cache configured by the CACHE_URL setting (see
+storyworlds.settings): local memory by default, or a file or Redis cache
+shared between processes. With local memory, each process keeps its own
+versions, so only use it with a single process.
+"""
+import functools
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+from . import slugs
+
+VERSION_PREFIX = "worlds:version"
+RESPONSE_PREFIX = "worlds:response"
+RESPONSE_TIMEOUT = 60 * 60 * 24
+# Larger responses are served with an ETag but not stored.
+MAX_RESPONSE_SIZE = 8 * 1024 * 1024
+
+
+def _fresh_version():
+    # Versions restart from the clock rather than from 1 when evicted, so an
+    # evicted counter never comes back to a number already used.
+    return int(time.time() * 1000)
+
+
+def world_version(world_id):
+    """The current version of a world."""
+    key = "%s:%d" % (VERSION_PREFIX, world_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump(world_id):
+    """Invalidate everything cached for a world. Returns its new version."""
+    key = "%s:%d" % (VERSION_PREFIX, world_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _fresh_version()
+        cache.set(key, version, None)
+        return version
+
+
+def bump_on_commit(world_id):
+    """Bump a world's version once the current transaction commits (at once outside one)."""
+    transaction.on_commit(lambda: bump(world_id))
+
+
+def world_id_of(instance):
+    """The pk of the world a row belongs to, following its model's world_path, or None."""
+    path = getattr(type(instance), "world_path", "world").split("__")
+    obj = instance
+    try:
+        for name in path[:-1]:
+            obj = getattr(obj, name)
+    except ObjectDoesNotExist:
+        return None
+    return getattr(obj, path[-1] + "_id", None)
+
+
+def world_pk(slug):
+    """The pk of the world with a slug, or None if there is none."""
+    return slugs.resolve("world", slug)
+
+
+def world_cached(view):
+    """Cache the 200 responses of a view taking a world slug, until the world changes.
+
+    Responses carry an ETag, and requests whose If-None-Match already has it get
+    a 304 without the view running.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, slug, *args, **kwargs):
+        world_id = world_pk(slug)
+        if world_id is None:
+            return view(request, slug, *args, **kwargs)
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        tag = "%d-%d-%s" % (world_id, world_version(world_id), path)
+        etag = quote_etag(tag)
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+        key = "%s:%s" % (RESPONSE_PREFIX, tag)
+        cached = cache.get(key)
+        if cached is not None:
+            headers, content = cached
+            response = HttpResponse(content)
+            for header, value in headers:
+                response[header] = value
+            return response
+        response = view(request, slug, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        response["ETag"] = etag
+
+        def store(content):
+            cache.set(key, (list(response.items()), content), RESPONSE_TIMEOUT)
+
+        if response.streaming:
+            response.streaming_content = _tee(response.streaming_content, store)
+        elif len(response.content) <= MAX_RESPONSE_SIZE:
+            store(response.content)
+        return response
+
+    return wrapper
+
+
+def _tee(chunks, store):
+    """Pass a streamed response through, storing its content once complete if it is small enough."""
+    buffered, size = [], 0
+    for chunk in chunks:
+        if buffered is not None:
+            size += len(chunk)
+            if size <= MAX_RESPONSE_SIZE:
+                buffered.append(chunk)
+            else:
+                buffered = None
+        yield chunk
+    if buffered is not None:
+        store(b"".join(buffered))
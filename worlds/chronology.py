@@ -0,0 +1,167 @@
+"""Packing of partial dates into sortable integer keys.
+
+Temporal dates are stored as separate, optional year/month/day/time fields. To
+sort and range-scan them efficiently, each date is packed into a single integer
+using a mixed radix. Missing components are encoded with explicit "unknown"
+sentinels: a lower bound sorts an unknown component before every known value,
+an upper bound sorts it after every known value. So "1200" as a lower bound is
+1200-01-01 00:00:00 or earlier, and as an upper bound 1200-12-31 23:59:59 or
+later. A span whose end is unknown gets OPEN_END as its end key, after every
+date, since it may still be going on.
+"""
+import datetime
+import re
+
+# Slot 0 and the last slot of every radix are the unknown sentinels.
+UNKNOWN_LOW = 0
+MONTH_RADIX = 12 + 2
+DAY_RADIX = 31 + 2
+TIME_RADIX = 24 * 60 * 60 + 2
+
+DAY_SPAN = TIME_RADIX
+MONTH_SPAN = DAY_RADIX * DAY_SPAN
+YEAR_SPAN = MONTH_RADIX * MONTH_SPAN
+
+# The end key of spans with an unknown end: the largest key a BigIntegerField holds.
+OPEN_END = 2**63 - 1
+
+TIME_TYPES = ("span", "instant")
+
+PARTIAL_DATE_RE = re.compile(r"^(-?\d+)(?:-(\d{1,2})(?:-(\d{1,2}))?)?$")
+
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def pack_date(year, month=None, day=None, time=None, upper=False):
+    """Pack a partial date into an integer key.
+
+    Components finer than the first unknown one are ignored, so a day without a
+    month is treated as unknown. Returns None when the year is unknown.
+    """
+    if year is None:
+        return None
+    slots = []
+    known = True
+    for value, radix in ((month, MONTH_RADIX), (day, DAY_RADIX), (time, TIME_RADIX)):
+        known = known and value is not None
+        if not known:
+            slots.append(radix - 1 if upper else UNKNOWN_LOW)
+        elif radix == TIME_RADIX:
+            slots.append(_seconds(value) + 1)
+        else:
+            slots.append(value)
+    month_slot, day_slot, time_slot = slots
+    return year * YEAR_SPAN + month_slot * MONTH_SPAN + day_slot * DAY_SPAN + time_slot
+
+
+def unpack_date(key):
+    """Split a key back into (year, month, day, time), with None for unknown components."""
+    if key is None or key == OPEN_END:
+        return (None, None, None, None)
+    year, rest = divmod(key, YEAR_SPAN)
+    month, rest = divmod(rest, MONTH_SPAN)
+    day, time_slot = divmod(rest, DAY_SPAN)
+    month = month if 0 < month < MONTH_RADIX - 1 else None
+    day = day if 0 < day < DAY_RADIX - 1 else None
+    if 0 < time_slot < TIME_RADIX - 1:
+        hours, seconds = divmod(time_slot - 1, 3600)
+        time = datetime.time(hours, seconds // 60, seconds % 60)
+    else:
+        time = None
+    return (year, month, day, time)
+
+
+def parse_partial_date(text):
+    """Parse "YYYY", "YYYY-MM" or "YYYY-MM-DD" (year may be negative) into a components tuple.
+
+    Raises ValueError for anything else.
+    """
+    match = PARTIAL_DATE_RE.match(text.strip())
+    if not match:
+        raise ValueError("Invalid partial date: %r" % text)
+    year, month, day = (int(part) if part else None for part in match.groups())
+    if month is not None and not 1 <= month <= 12 or day is not None and not 1 <= day <= 31:
+        raise ValueError("Invalid partial date: %r" % text)
+    return (year, month, day)
+
+
+def _components(value):
+    if isinstance(value, datetime.datetime):
+        return (value.year, value.month, value.day, value.time())
+    if isinstance(value, datetime.date):
+        return (value.year, value.month, value.day)
+    if isinstance(value, (tuple, list)):
+        return tuple(value)
+    return (value,)
+
+
+def lower_bound(value):
+    """Smallest key falling within a year, a (year, month, day, time) tuple, or a date."""
+    return pack_date(*_components(value))
+
+
+def upper_bound(value):
+    """Largest key falling within a year, a (year, month, day, time) tuple, or a date."""
+    return pack_date(*_components(value), upper=True)
+
+
+def date_bounds(time_type, start, end):
+    """Compute (start_key, start_latest, end_earliest, end_key) for start and end component tuples.
+
+    start_key and start_latest bound when the start could be, end_earliest and
+    end_key when the end could be. Instants end where they start. A span with an
+    unknown end may end as early as its start, or not at all: its end_key is
+    OPEN_END. All four are None when the start year is unknown.
+    """
+    if start[0] is None:
+        return (None, None, None, None)
+    start_key = pack_date(*start)
+    start_latest = pack_date(*start, upper=True)
+    if time_type == "instant":
+        return (start_key, start_latest, start_key, start_latest)
+    if end[0] is None:
+        return (start_key, start_latest, start_key, OPEN_END)
+    return (start_key, start_latest, pack_date(*end), pack_date(*end, upper=True))
+
+
+def sort_keys(time_type, start, end):
+    """Compute the (start_key, end_key) pair for start and end date component tuples (see date_bounds)."""
+    bounds = date_bounds(time_type, start, end)
+    return bounds[0], bounds[3]
+
+
+def normalize_dates(values, repair=False):
+    """Make a dict of Temporal date fields consistent, returning a new dict.
+
+    Components finer than the first unknown one are dropped, since they cannot be
+    placed, and instants get their start copied into their end. With repair,
+    out of range months and days are also dropped, along with an end that
+    certainly precedes the start; without it they are left for validation to
+    reject.
+    """
+    values = dict(values)
+    if values.get("time_type") not in TIME_TYPES:
+        values["time_type"] = "span"
+    for prefix in ("start", "end"):
+        fields = ["%s_%s" % (prefix, part) for part in ("year", "month", "day", "time")]
+        if repair:
+            for field, high in zip(fields[1:3], (12, 31)):
+                if values.get(field) is not None and not 1 <= values[field] <= high:
+                    values[field] = None
+        known = True
+        for field in fields:
+            known = known and values.get(field) is not None
+            if not known:
+                values[field] = None
+    if values["time_type"] == "instant":
+        for part in ("year", "month", "day", "time"):
+            values["end_" + part] = values["start_" + part]
+    elif repair and values["start_year"] is not None and values["end_year"] is not None:
+        start = [values["start_" + part] for part in ("year", "month", "day", "time")]
+        end = [values["end_" + part] for part in ("year", "month", "day", "time")]
+        if pack_date(*end, upper=True) < pack_date(*start):
+            for part in ("year", "month", "day", "time"):
+                values["end_" + part] = None
+    return values
@@ -0,0 +1,102 @@
+"""Character connections: the people, places, events and organizations shared by a set of characters.
+
+An entity is shared when at least min_shared of the characters are linked to
+it. Characters are linked to events they took part in; to the places of
+those events and of their titles; to organizations they were honored by; and
+to people they have a relationship with (either way) or are a child of.
+
+Each kind of link is read with one query returning distinct (entity,
+character) pairs. Where a link has a single source, the query keeps only
+entities grouped to at least min_shared characters (GROUP BY ... HAVING), so
+the cost is a fixed number of queries however many characters are asked
+about.
+"""
+from django.db.models import Count
+
+from .models import Character, CharacterRelationship, EventParticipation, FamilyTie, Honor, Title
+
+# Limits the query parameters: sqlite allows 999 per query, and ids appear twice.
+MAX_CHARACTERS = 400
+
+
+def _shared(queryset, entity, min_shared):
+    """Subquery of the entities linked to at least min_shared characters in queryset."""
+    return (
+        queryset.values(entity)
+        .annotate(characters=Count("character", distinct=True))
+        .filter(characters__gte=min_shared)
+        .order_by()
+        .values(entity)
+    )
+
+
+def _grouped_pairs(queryset, entity, min_shared):
+    """(entity pk, entity name, character pk) of the entities linked to at least min_shared characters."""
+    shared = _shared(queryset, entity, min_shared)
+    pairs = queryset.filter(**{entity + "__in": shared}).order_by()
+    return pairs.values_list(entity, entity + "__name", "character").distinct()
+
+
+def connections(world, character_ids, min_shared=2):
+    """The entities of world shared by at least min_shared of some characters, as a bipartite graph.
+
+    Returns {"characters": [...], "entities": [...], "edges": [...]}. Nodes have
+    an "id" of the form "<kind>-<pk>", a kind, pk and name; entities also have
+    the number of characters sharing them. Each edge joins a character to an
+    entity, with the kind of link. Ids of characters outside the world are
+    ignored.
+    """
+    if len(character_ids) > MAX_CHARACTERS:
+        raise ValueError("At most %d characters can be compared" % MAX_CHARACTERS)
+    members = dict(
+        Character.objects.filter(world=world, pk__in=character_ids).order_by("pk").values_list("pk", "name")
+    )
+    ids = list(members)
+    # (kind, pk) -> name, and (kind, pk) -> {character pk: link kinds}
+    names = {}
+    links = {}
+
+    def link(kind, pk, name, character, how):
+        names[(kind, pk)] = name
+        links.setdefault((kind, pk), {}).setdefault(character, set()).add(how)
+
+    participations = EventParticipation.objects.filter(character__in=ids).order_by()
+    for pk, name, character in _grouped_pairs(participations, "event", min_shared):
+        link("event", pk, name, character, "participation")
+    for pk, name, character in _grouped_pairs(Honor.objects.filter(character__in=ids).order_by(), "org", min_shared):
+        link("organization", pk, name, character, "honor")
+
+    # Places and people are reached more than one way, so their counts are combined here.
+    places = participations.filter(event__place__isnull=False).values_list(
+        "event__place", "event__place__name", "character"
+    )
+    for pk, name, character in places.distinct():
+        link("place", pk, name, character, "event")
+    titles = Title.objects.filter(character__in=ids).order_by().values_list("place", "place__name", "character")
+    for pk, name, character in titles.distinct():
+        link("place", pk, name, character, "title")
+    people = (
+        (CharacterRelationship.objects.filter(from_char__in=ids), "to_char", "from_char", "relationship"),
+        (CharacterRelationship.objects.filter(to_char__in=ids), "from_char", "to_char", "relationship"),
+        (FamilyTie.objects.filter(child__in=ids), "parent", "child", "parent"),
+    )
+    for queryset, other, character, how in people:
+        for pk, name, member in queryset.order_by().values_list(other, other + "__name", character).distinct():
+            link("character", pk, name, member, how)
+
+    entities = []
+    edges = []
+    for key, linked in sorted(links.items()):
+        if len(linked) < min_shared:
+            continue
+        node = "%s-%d" % key
+        entities.append({"id": node, "kind": key[0], "pk": key[1], "name": names[key], "count": len(linked)})
+        for character, kinds in sorted(linked.items()):
+            edges.extend({"source": "character-%d" % character, "target": node, "kind": how} for how in sorted(kinds))
+    return {
+        "characters": [
+            {"id": "character-%d" % pk, "kind": "character", "pk": pk, "name": name} for pk, name in members.items()
+        ],
+        "entities": entities,
+        "edges": edges,
+    }
@@ -0,0 +1,160 @@
+"""Estimated sort keys for events with unknown dates, from their DateConstraints.
+
+Events linked by "after" and "before" constraints form components of a
+directed graph (an edge runs from the earlier event to the later one). Each
+component is solved on its own:
+
+1. Every event gets a window of possible sort keys: a single point when its
+   start is known, the span of "circa" years otherwise, or unbounded.
+2. Windows are narrowed by propagating lower bounds forward and upper bounds
+   backward through the events in topological order. Events on a cycle of
+   contradictory constraints are ordered by pk, ignoring the cycle's edges.
+3. Undated events take the middle of their window, or sit just inside its
+   one finite end, and are then nudged so each follows everything it must
+   follow.
+
+Changing one constraint or event only re-solves its component.
+"""
+from collections import deque
+
+from django.db.models import F, Q
+
+from .chronology import lower_bound, upper_bound
+from .models import DateConstraint, Event
+
+BATCH_SIZE = 1000
+
+
+def component(pks):
+    """(event pks, constraint rows) of the components containing some events.
+
+    Constraint rows are (event, kind, other, year, margin) tuples.
+    """
+    seen = set(pks)
+    frontier = list(seen)
+    constraints = {}
+    while frontier:
+        rows = DateConstraint.objects.filter(Q(event__in=frontier) | Q(other__in=frontier)).values_list(
+            "pk", "event", "kind", "other", "year", "margin"
+        )
+        frontier = []
+        for pk, *row in rows:
+            constraints[pk] = tuple(row)
+            for end in (row[0], row[2]):
+                if end is not None and end not in seen:
+                    seen.add(end)
+                    frontier.append(end)
+    return seen, list(constraints.values())
+
+
+def _topological_order(nodes, edges):
+    """Order nodes so edges run forwards, dropping edges on cycles. Returns (order, kept edges)."""
+    successors = {node: [] for node in nodes}
+    indegree = dict.fromkeys(nodes, 0)
+    for a, b in edges:
+        successors[a].append(b)
+        indegree[b] += 1
+    order = []
+    ready = deque(sorted(node for node in nodes if indegree[node] == 0))
+    placed = set()
+    while len(order) < len(nodes):
+        if not ready:
+            # A cycle: break it at its lowest pk.
+            ready.append(min(node for node in nodes if node not in placed))
+        node = ready.popleft()
+        if node in placed:
+            continue
+        placed.add(node)
+        order.append(node)
+        for successor in successors[node]:
+            indegree[successor] -= 1
+            if indegree[successor] == 0 and successor not in placed:
+                ready.append(successor)
+    position = {node: i for i, node in enumerate(order)}
+    return order, [(a, b) for a, b in edges if position[a] < position[b]]
+
+
+def solve(known, constraints):
+    """Estimate a sort key for every event of a component.
+
+    known maps each event pk to its start_key (None when undated); constraints
+    are rows from component(). Returns {event pk: estimated key or None}.
+    """
+    nodes = list(known)
+    low = {pk: key for pk, key in known.items()}
+    high = dict(low)
+    edges = []
+    for event, kind, other, year, margin in constraints:
+        if kind == DateConstraint.CIRCA:
+            if known[event] is None and year is not None:
+                start, end = lower_bound(year - margin), upper_bound(year + margin)
+                low[event] = start if low[event] is None else max(low[event], start)
+                high[event] = end if high[event] is None else min(high[event], end)
+        elif other is not None:
+            edges.append((other, event) if kind == DateConstraint.AFTER else (event, other))
+    order, edges = _topological_order(nodes, edges)
+    successors = {pk: [] for pk in nodes}
+    predecessors = {pk: [] for pk in nodes}
+    for a, b in edges:
+        successors[a].append(b)
+        predecessors[b].append(a)
+
+    for b in order:
+        if known[b] is None:
+            bounds = [low[a] + 1 for a in predecessors[b] if low[a] is not None]
+            if bounds:
+                low[b] = max(bounds + ([] if low[b] is None else [low[b]]))
+    for a in reversed(order):
+        if known[a] is None:
+            bounds = [high[b] - 1 for b in successors[a] if high[b] is not None]
+            if bounds:
+                high[a] = min(bounds + ([] if high[a] is None else [high[a]]))
+
+    estimates = {}
+    for pk in order:
+        if known[pk] is not None:
+            estimates[pk] = known[pk]
+        elif low[pk] is not None and high[pk] is not None:
+            estimates[pk] = low[pk] if low[pk] >= high[pk] else (low[pk] + high[pk]) // 2
+        else:
+            estimates[pk] = low[pk] if low[pk] is not None else high[pk]
+    # Keep undated events strictly after everything they follow.
+    for b in order:
+        if known[b] is None:
+            after = [estimates[a] + 1 for a in predecessors[b] if estimates[a] is not None]
+            if after and (estimates[b] is None or estimates[b] < max(after)):
+                estimates[b] = max(after)
+    return estimates
+
+
+def _store(events, constraints):
+    rows = Event.objects.filter(pk__in=events).values_list("pk", "start_key", "estimated_key")
+    known, stored = {}, {}
+    for pk, start_key, estimated_key in rows:
+        known[pk], stored[pk] = start_key, estimated_key
+    # Constraints may name events deleted since; drop them.
+    constraints = [row for row in constraints if row[0] in known and (row[2] is None or row[2] in known)]
+    estimates = solve(known, constraints)
+    changed = [Event(pk=pk, estimated_key=key) for pk, key in estimates.items() if stored[pk] != key]
+    Event.objects.bulk_update(changed, ["estimated_key"], batch_size=BATCH_SIZE)
+    return len(changed)
+
+
+def resolve(pks):
+    """Re-solve the components containing some events and store their estimated keys.
+
+    Returns the number of events whose estimate changed.
+    """
+    return _store(*component(pks))
+
+
+def resolve_world(world):
+    """Re-solve every event of a world: copy known start keys, then solve the constrained components."""
+    events = Event.objects.filter(world=world)
+    events.filter(start_key__isnull=False).update(estimated_key=F("start_key"))
+    events.filter(start_key__isnull=True).update(estimated_key=None)
+    constrained = set(DateConstraint.objects.filter(event__world=world).values_list("event", flat=True))
+    while constrained:
+        pks, constraints = component([constrained.pop()])
+        _store(pks, constraints)
+        constrained -= pks
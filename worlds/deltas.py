@@ -0,0 +1,109 @@
+"""Time-slice deltas of a world's state, for animating maps and scrubbing timelines.
+
+The window from start through end is cut into steps of a number of years. For
+each step, a frame lists the characters, organizations, titles, honors and
+relationships that begin in it (with their fields) and those that end in it
+(by pk). A client holding the state at start (see worlds.asof) applies the
+frames in order to follow the world through the window, instead of fetching
+the full state for every frame. Rows are keyed by kind and pk, so a row
+beginning in the first frame and already in the snapshot is simply replaced.
+
+Frames come from one sweep in key order over the start_key and end_key of all
+five kinds: each kind is read twice, by start and by end, as keyset-paginated
+pages ordered by (key, pk), and the ten streams are merged as they are read.
+Only one page per stream is held in memory, and only steps where something
+changes get a frame. Rows without dates (null keys) never begin or end.
+"""
+import heapq
+import itertools
+import json
+
+from .chronology import YEAR_SPAN, lower_bound, upper_bound
+from .models import Character, CharacterRelationship, Honor, Organization, Title
+from .timeline import PAGE_SIZE, timeline_page
+
+# kind -> (model, world lookup, columns read for rows beginning, their names in frames)
+SOURCES = {
+    "character": (Character, "world", ("name",), ("name",)),
+    "organization": (Organization, "world", ("name",), ("name",)),
+    "title": (Title, "character__world", ("character", "place", "rank"), ("character", "place", "rank")),
+    "honor": (Honor, "character__world", ("character", "org"), ("character", "organization")),
+    "relationship": (
+        CharacterRelationship,
+        "from_char__world",
+        ("from_char", "to_char", "rel", "rev"),
+        ("from_char", "to_char", "rel", "rev"),
+    ),
+}
+KINDS = tuple(SOURCES)
+
+
+def _stream(queryset, key):
+    """Generate the rows of a values_list queryset starting (key value, pk), paged on key."""
+    cursor = None
+    while True:
+        rows, cursor = timeline_page(queryset, cursor, PAGE_SIZE, cursor_of=lambda row: (row[0], row[1]), key=key)
+        yield from rows
+        if cursor is None:
+            return
+
+
+def _tagged(rows, change, kind):
+    for row in rows:
+        yield row[0], change, kind, row
+
+
+def changes(world, start, end, kinds=None):
+    """Generate (key, change, kind, row) for rows of world beginning or ending from start through end, in key order.
+
+    change is "begin" or "end". Rows beginning are (key, pk, *columns) as in
+    SOURCES; rows ending are (key, pk).
+    """
+    lo, hi = lower_bound(start), upper_bound(end)
+    streams = []
+    for kind in kinds or KINDS:
+        model, world_lookup, columns, _ = SOURCES[kind]
+        rows = model.objects.filter(**{world_lookup: world})
+        for change, key, fields in (("begin", "start_key", columns), ("end", "end_key", ())):
+            queryset = (
+                rows.filter(**{key + "__gte": lo, key + "__lte": hi})
+                .order_by(key, "pk")
+                .values_list(key, "pk", *fields)
+            )
+            streams.append(_tagged(_stream(queryset, key), change, kind))
+    return heapq.merge(*streams, key=lambda item: item[0])
+
+
+def frames(world, start, end, step=1, kinds=None):
+    """The frames of the window from start through end, in steps of step years, as a generator.
+
+    Each frame is {"frame": n, "begin": {kind: [row, ...]}, "end": {kind: [pk, ...]}}
+    for the nth step (from 0) of the window; steps without changes are skipped.
+    Raises ValueError for a bad step or kind before any query runs.
+    """
+    if step < 1:
+        raise ValueError("step must be at least one year")
+    if kinds is not None and not set(kinds) <= set(KINDS):
+        raise ValueError("kind must be one of %s" % ", ".join(KINDS))
+    return _frames(changes(world, start, end, kinds), lower_bound(start), step * YEAR_SPAN)
+
+
+def _frames(items, lo, span):
+    for number, changed in itertools.groupby(items, key=lambda item: (item[0] - lo) // span):
+        frame = {"frame": number, "begin": {}, "end": {}}
+        for _, change, kind, row in changed:
+            if change == "begin":
+                frame["begin"].setdefault(kind, []).append(dict(zip(("pk",) + SOURCES[kind][3], row[1:])))
+            else:
+                frame["end"].setdefault(kind, []).append(row[1])
+        yield frame
+
+
+def stream_frames(step, frames):
+    """Generate {"step": step, "frames": [...]} in chunks, one frame at a time."""
+    yield '{"step":%d,"frames":[' % step
+    separator = ""
+    for frame in frames:
+        yield separator + json.dumps(frame)
+        separator = ","
+    yield "]}"
@@ -0,0 +1,251 @@
+"""Bulk import and export of whole worlds as newline-delimited JSON.
+
+Each line is one record: ``{"model": "<model name>", ...fields}``. The first
+record is the world itself, followed by each model in dependency order.
+Foreign keys to slugged models are written as slugs, so a file can be loaded
+into a fresh database. Tags are written inline as a list of names.
+
+Export reads keyset-paginated ``.values()`` pages; import buffers one batch
+of records per model and writes it with ``bulk_create``. Neither holds more
+than a batch of rows in memory, apart from the slug to pk maps the import
+needs to resolve foreign keys.
+"""
+import datetime
+import json
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import transaction
+from django.utils.text import slugify
+from taggit.models import Tag, TaggedItem
+
+from . import caching, dating, facets, graph, search, significance
+from .models import TEMPORAL_FIELDS, Lineage, Place, World
+
+BATCH_SIZE = 2000
+
+# (model name, plain fields, {foreign key: target model name}), in load order.
+SPECS = (
+    ("place", ("name", "slug", "notes", "point_location", "geo_detail"), {}),
+    ("setting", ("name", "slug", "notes"), {}),
+    ("organization", ("name", "slug", "notes") + TEMPORAL_FIELDS, {}),
+    ("character", ("name", "slug", "notes") + TEMPORAL_FIELDS, {}),
+    ("event", ("name", "slug", "notes", "significance") + TEMPORAL_FIELDS, {"place": "place"}),
+    ("dateconstraint", ("kind", "year", "margin"), {"event": "event", "other": "event"}),
+    ("familytie", ("birth_order",), {"parent": "character", "child": "character"}),
+    ("eventparticipation", ("role", "significance") + TEMPORAL_FIELDS, {"character": "character", "event": "event"}),
+    ("characterrelationship", ("rel", "rev") + TEMPORAL_FIELDS, {"from_char": "character", "to_char": "character"}),
+    ("title", ("rank",) + TEMPORAL_FIELDS, {"character": "character", "place": "place"}),
+    ("honor", TEMPORAL_FIELDS, {"character": "character", "org": "organization"}),
+)
+SPEC_BY_MODEL = {name: (fields, fks) for name, fields, fks in SPECS}
+GEOMETRY_FIELDS = ("point_location", "geo_detail")
+TIME_FIELDS = ("start_time", "end_time")
+
+
+def _model(name):
+    return apps.get_model("worlds", name)
+
+
+def _is_taggable(model):
+    return any(f.name == "tags" for f in model._meta.get_fields())
+
+
+def _world_filter(model, world):
+    return {getattr(model, "world_path", "world"): world}
+
+
+# ----------------------------------------------------------------------
+# Export
+# ----------------------------------------------------------------------
+def _encode(value):
+    if isinstance(value, datetime.time):
+        return value.isoformat()
+    if isinstance(value, GEOSGeometry):
+        return value.ewkt
+    return value
+
+
+def _tags_by_object(model, pks):
+    tags = {}
+    rows = TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(model), object_id__in=pks)
+    for object_id, name in rows.values_list("object_id", "tag__name"):
+        tags.setdefault(object_id, []).append(name)
+    return tags
+
+
+def export_records(world):
+    """Generate the records of a world, as dicts ready for json.dumps."""
+    yield {"model": "world", "name": world.name, "slug": world.slug}
+    for name, fields, fks in SPECS:
+        model = _model(name)
+        taggable = _is_taggable(model)
+        rows = (
+            model.objects.filter(**_world_filter(model, world))
+            .order_by("pk")
+            .values("pk", *fields, *("%s__slug" % fk for fk in fks))
+        )
+        last_pk = 0
+        while True:
+            page = list(rows.filter(pk__gt=last_pk)[:BATCH_SIZE])
+            if not page:
+                break
+            last_pk = page[-1]["pk"]
+            tags = _tags_by_object(model, [row["pk"] for row in page]) if taggable else {}
+            for row in page:
+                record = {"model": name}
+                record.update((field, _encode(row[field])) for field in fields)
+                record.update((fk, row["%s__slug" % fk]) for fk in fks)
+                if taggable:
+                    record["tags"] = tags.get(row["pk"], [])
+                yield record
+
+
+def export_world(world, out):
+    """Write a world to the text stream out, one JSON record per line. Returns the record count."""
+    count = 0
+    for record in export_records(world):
+        out.write(json.dumps(record, separators=(",", ":")))
+        out.write("\n")
+        count += 1
+    return count
+
+
+# ----------------------------------------------------------------------
+# Import
+# ----------------------------------------------------------------------
+class WorldFileError(ValueError):
+    """Raised for files that cannot be loaded."""
+
+
+class WorldImporter:
+    """Load world records in batches. Use import_world() rather than this directly."""
+
+    def __init__(self, batch_size=BATCH_SIZE, replace=False):
+        self.batch_size = batch_size
+        self.replace = replace
+        self.world = None
+        self.pks = {}  # model name -> {slug: pk}
+        self.tag_pks = {}  # lower case tag name -> pk
+        self.counts = {}
+        self.pending_model = None
+        self.pending = []
+
+    def load(self, lines):
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                name = record.pop("model")
+            except (ValueError, KeyError, AttributeError):
+                raise WorldFileError("Line %d is not a world record" % number)
+            if name == "world":
+                self.create_world(record)
+                continue
+            if self.world is None:
+                raise WorldFileError("Line %d: the world record must come first" % number)
+            if name not in SPEC_BY_MODEL:
+                raise WorldFileError("Line %d: unknown model %r" % (number, name))
+            if name != self.pending_model or len(self.pending) >= self.batch_size:
+                self.flush()
+                self.pending_model = name
+            self.pending.append(record)
+        self.flush()
+        if self.world is None:
+            raise WorldFileError("No world record found")
+        # bulk_create skips the signals that maintain derived data, so rebuild it.
+        Lineage.objects.rebuild(self.world)
+        Place.objects.filter(world=self.world, geo_detail__isnull=False).update(outlines_stale=True)
+        graph.invalidate(self.world.pk)
+        search.reindex(self.world)
+        facets.rebuild(self.world)
+        dating.resolve_world(self.world)
+        significance.rebuild(self.world)
+        caching.bump_on_commit(self.world.pk)
+        return self.counts
+
+    def create_world(self, record):
+        if self.world is not None:
+            raise WorldFileError("Only one world may be imported at a time")
+        for field in ("slug", "name"):
+            if not record.get(field):
+                raise WorldFileError("The world record has no %s" % field)
+        existing = World.objects.filter(slug=record["slug"])
+        if existing.exists():
+            if not self.replace:
+                raise WorldFileError("World %r already exists" % record["slug"])
+            existing.delete()
+        self.world = World.objects.create(name=record["name"], slug=record["slug"])
+
+    def flush(self):
+        if not self.pending:
+            return
+        name, records = self.pending_model, self.pending
+        self.pending = []
+        model = _model(name)
+        fields, fks = SPEC_BY_MODEL[name]
+        objs = []
+        for record in records:
+            values = {field: self.decode(field, record.get(field)) for field in fields if field in record}
+            for fk, target in fks.items():
+                values["%s_id" % fk] = self.resolve(target, record.get(fk))
+            if "slug" in fields:
+                values["world"] = self.world
+            objs.append(model(**values))
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.counts[name] = self.counts.get(name, 0) + len(objs)
+        if "slug" in fields:
+            slugs = [obj.slug for obj in objs]
+            pks = self.pks.setdefault(name, {})
+            pks.update(model.objects.filter(world=self.world, slug__in=slugs).values_list("slug", "pk"))
+            if _is_taggable(model):
+                self.tag(model, [(pks[r["slug"]], r.get("tags") or []) for r in records])
+
+    def decode(self, field, value):
+        if value is None:
+            return None
+        if field in GEOMETRY_FIELDS:
+            return GEOSGeometry(value)
+        if field in TIME_FIELDS:
+            return datetime.time.fromisoformat(value)
+        return value
+
+    def resolve(self, target, slug):
+        if slug is None:
+            return None
+        try:
+            return self.pks[target][slug]
+        except KeyError:
+            raise WorldFileError("Unknown %s %r" % (target, slug))
+
+    def tag(self, model, tagged):
+        """Attach tags to (pk, [tag names]) pairs with two bulk inserts."""
+        names = {name.lower(): name for _, tag_names in tagged for name in tag_names}
+        missing = [name for key, name in names.items() if key not in self.tag_pks]
+        if missing:
+            Tag.objects.bulk_create([Tag(name=n, slug=slugify(n)) for n in missing], ignore_conflicts=True)
+            for pk, name in Tag.objects.filter(name__in=missing).values_list("pk", "name"):
+                self.tag_pks[name.lower()] = pk
+            for key in set(names) - set(self.tag_pks):
+                # Taken by a differently cased name, or by another name with the same slug.
+                tag = Tag.objects.filter(name__iexact=names[key]).first() or Tag.objects.get(slug=slugify(names[key]))
+                self.tag_pks[key] = tag.pk
+        content_type = ContentType.objects.get_for_model(model)
+        items = {(pk, self.tag_pks[name.lower()]) for pk, tag_names in tagged for name in tag_names}
+        TaggedItem.objects.bulk_create(
+            [TaggedItem(content_type=content_type, object_id=pk, tag_id=tag_pk) for pk, tag_pk in items],
+            batch_size=self.batch_size,
+        )
+
+
+def import_world(lines, batch_size=BATCH_SIZE, replace=False):
+    """Load a world from an iterable of JSON lines in a single transaction.
+
+    Returns (world, {model name: record count}). Raises WorldFileError for bad input.
+    """
+    importer = WorldImporter(batch_size, replace)
+    with transaction.atomic():
+        counts = importer.load(lines)
+    return importer.world, counts
@@ -0,0 +1,97 @@
+"""Tag facets: per world, per model tag counts and multi-tag filters.
+
+TagCount rows are adjusted as tags are added, removed and cleared, and as
+tagged objects are deleted (see worlds.signals), so a tag cloud is one indexed
+query over TagCount. Filters by several tags are answered with a single grouped
+subquery over taggit's (content_type, object_id, tag) index.
+"""
+import functools
+import operator
+
+from django.apps import apps as global_apps
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from taggit.models import TaggedItem
+
+from .models import TagCount
+
+TAGGED_MODELS = ("place", "setting", "event", "organization", "character")
+
+
+def adjust(world_id, kind, tag_pks, delta):
+    """Add delta to the counts of some tags on objects of one kind in a world."""
+    tag_pks = list(tag_pks)
+    if not tag_pks:
+        return
+    counts = TagCount.objects.filter(world=world_id, kind=kind, tag__in=tag_pks)
+    if delta > 0:
+        TagCount.objects.bulk_create(
+            [TagCount(world_id=world_id, kind=kind, tag_id=pk, count=0) for pk in tag_pks], ignore_conflicts=True
+        )
+        counts.update(count=F("count") + delta)
+    else:
+        # Delete first: once lowered, the remaining counts could fall in range of the delete.
+        counts.filter(count__lte=-delta).delete()
+        counts.update(count=F("count") + delta)
+
+
+def tag_pks(obj):
+    """The pks of the tags on a tagged object."""
+    return list(obj.tags.order_by().values_list("pk", flat=True))
+
+
+def rebuild(world=None, apps=global_apps):
+    """Recount the tags of one world, or of every world, from the tagged items."""
+    TagCount = apps.get_model("worlds", "TagCount")
+    TaggedItem = apps.get_model("taggit", "TaggedItem")
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    counts = TagCount.objects.all() if world is None else TagCount.objects.filter(world=world)
+    counts.delete()
+    for kind in TAGGED_MODELS:
+        content_type = ContentType.objects.filter(app_label="worlds", model=kind).first()
+        if content_type is None:
+            continue
+        model = apps.get_model("worlds", kind)
+        objects = model.objects.all() if world is None else model.objects.filter(world=world)
+        rows = (
+            TaggedItem.objects.filter(content_type=content_type, object_id__in=objects.values("pk"))
+            .annotate(world=Subquery(model.objects.filter(pk=OuterRef("object_id")).order_by().values("world")[:1]))
+            .values("world", "tag")
+            .annotate(count=Count("pk"))
+            .order_by()
+        )
+        TagCount.objects.bulk_create(
+            (
+                TagCount(world_id=row["world"], kind=kind, tag_id=row["tag"], count=row["count"])
+                for row in rows.iterator()
+            ),
+            batch_size=2000,
+        )
+
+
+def tag_cloud(world, kinds=None, limit=None):
+    """The tags used in a world with their counts, most used first, as (name, slug, count) tuples."""
+    counts = TagCount.objects.filter(world=world)
+    if kinds:
+        counts = counts.filter(kind__in=kinds)
+    rows = (
+        counts.values("tag__name", "tag__slug")
+        .annotate(total=Sum("count"))
+        .order_by("-total", "tag__name")
+        .values_list("tag__name", "tag__slug", "total")
+    )
+    return list(rows[:limit])
+
+
+def tagged(world, model_name, tags, match_all=True):
+    """Queryset of a world's objects of one model carrying all (or with match_all=False, any) of tags."""
+    if model_name not in TAGGED_MODELS:
+        raise LookupError("Model %r has no tags" % model_name)
+    model = global_apps.get_model("worlds", model_name)
+    # Tags are case insensitive (TAGGIT_CASE_INSENSITIVE).
+    tags = {tag.lower() for tag in tags}
+    names = functools.reduce(operator.or_, (Q(tag__name__iexact=tag) for tag in tags))
+    items = TaggedItem.objects.filter(names, content_type=ContentType.objects.get_for_model(model))
+    if match_all:
+        items = items.values("object_id").annotate(matched=Count("tag", distinct=True)).filter(matched=len(tags))
+    return model.objects.filter(world=world, pk__in=items.order_by().values("object_id"))
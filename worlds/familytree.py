@@ -0,0 +1,127 @@
+"""Layered family tree layouts, cached per root character.
+
+A layout places the root and all its descendants in generations (the root is
+generation 0, and everyone sits one below their lowest placed parent), and
+orders each generation by a depth-first walk taking children in birth order,
+so siblings stay together under their parents. It is built from one query on
+FamilyTie, restricted to the root's descendants through Lineage, in time
+linear in the number of ties.
+
+Layouts are cached until a change to a tie or character they include is
+committed. The receivers in worlds.signals then forget the layouts rooted at the parent
+concerned and at its ancestors, the only trees that include the tie, and
+leave every other tree cached.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Character, FamilyTie, Lineage
+
+CACHE_PREFIX = "worlds:family-tree"
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _cache_key(pk):
+    return "%s:%d" % (CACHE_PREFIX, pk)
+
+
+def layout(root, root_name, ties):
+    """Lay out a tree from (parent, child, birth order, child name) rows in birth order.
+
+    Every parent must be the root or one of its descendants. Returns the
+    render payload (see family_tree()).
+    """
+    children = {}
+    names = {root: root_name}
+    waiting = {}  # child -> parents not yet placed
+    for parent, child, birth_order, name in ties:
+        children.setdefault(parent, []).append((child, birth_order))
+        names[child] = name
+        waiting[child] = waiting.get(child, 0) + 1
+
+    # Generations: longest path from the root, in topological order.
+    generation = {root: 0}
+    ready = [root]
+    while ready:
+        node = ready.pop()
+        for child, _ in children.get(node, ()):
+            generation[child] = max(generation.get(child, 0), generation[node] + 1)
+            waiting[child] -= 1
+            if not waiting[child]:
+                ready.append(child)
+    # Descendants on a cycle (bad data) never become ready; leave them out.
+    placed = {node for node in generation if node == root or not waiting[node]}
+
+    # Positions: depth-first, children in birth order.
+    rows = {}
+    position = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node in position or node not in placed:
+            continue
+        row = rows.setdefault(generation[node], [])
+        position[node] = len(row)
+        row.append(node)
+        stack.extend(child for child, _ in reversed(children.get(node, ())))
+
+    nodes = [
+        {
+            "id": "character-%d" % node,
+            "pk": node,
+            "name": names[node],
+            "generation": depth,
+            "position": position[node],
+        }
+        for depth in sorted(rows)
+        for node in rows[depth]
+    ]
+    edges = [
+        {"source": "character-%d" % parent, "target": "character-%d" % child, "birth_order": birth_order}
+        for depth in sorted(rows)
+        for parent in rows[depth]
+        for child, birth_order in children.get(parent, ())
+        if child in position
+    ]
+    return {"root": root, "generations": len(rows), "nodes": nodes, "edges": edges}
+
+
+def build_family_tree(character):
+    """Lay out the family tree below a character (instance or pk). Costs two queries."""
+    root, name = Character.objects.filter(pk=getattr(character, "pk", character)).values_list("pk", "name").get()
+    descendants = Lineage.objects.filter(ancestor=root).values("descendant")
+    ties = (
+        FamilyTie.objects.filter(Q(parent=root) | Q(parent__in=descendants))
+        .order_by("parent", "birth_order", "pk")
+        .values_list("parent", "child", "birth_order", "child__name")
+    )
+    return layout(root, name, ties)
+
+
+def family_tree(character):
+    """The cached layout of the family tree below a character (instance or pk), building it on a miss.
+
+    Returns {"root", "generations", "nodes", "edges"}. Nodes have the node ids
+    of the graph view, with their generation and position in it; edges run
+    from parent to child.
+    """
+    key = _cache_key(getattr(character, "pk", character))
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_family_tree(character)
+        cache.set(key, payload, CACHE_TIMEOUT)
+    return payload
+
+
+def forget_trees(pks):
+    """Drop the cached layouts that include some characters (their own, and their ancestors') on commit.
+
+    The ancestors are looked up at once, before the change can alter the lineage.
+    """
+    pks = {pk for pk in pks if pk is not None}
+    if not pks:
+        return
+    roots = pks | set(Lineage.objects.filter(descendant__in=pks).values_list("ancestor", flat=True))
+    keys = [_cache_key(pk) for pk in roots]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,354 @@
+"""In-memory social graph of a world.
+
+Characters, Events and Organizations are nodes. CharacterRelationship and
+FamilyTie link characters to each other, EventParticipation links characters
+to events and Honor links characters to organizations. Each world's edge
+tables are bulk loaded once into compact CSR (compressed sparse row) integer
+arrays, so graph queries never go back to the database.
+
+Changes are patched in as an overlay by the receivers in worlds.signals; once
+the overlay grows large the graph is dropped and rebuilt on next use. Graphs
+are cached per process along with the world's version (see worlds.caching),
+and reloaded once it changes, since other processes and bulk imports write
+without patching them. Versions moved on by changes this process patched in
+are adopted without reloading.
+"""
+import threading
+from array import array
+from collections import deque
+
+from django.db.models import BigIntegerField, Value
+from django.db.models.functions import Coalesce
+
+from . import caching
+from .chronology import lower_bound, upper_bound
+from .models import Character, CharacterRelationship, EventParticipation, FamilyTie, Honor
+
+NODE_KINDS = ("character", "event", "organization")
+CHARACTER, EVENT, ORGANIZATION = range(len(NODE_KINDS))
+
+EDGE_KINDS = ("relationship", "family", "participation", "honor")
+RELATIONSHIP, FAMILY, PARTICIPATION, HONOR = range(len(EDGE_KINDS))
+
+# Open ends of edges with unknown dates, so they are active at any time.
+KEY_MIN = -(2**63)
+KEY_MAX = 2**63 - 1
+
+# Patch at most this share of the frozen edges before rebuilding.
+MAX_OVERLAY_RATIO = 0.1
+MIN_OVERLAY = 1000
+
+
+def _node_code(key):
+    """Accept ("kind", pk) node keys, or a bare pk meaning a character."""
+    if isinstance(key, int):
+        return CHARACTER, key
+    kind, pk = key
+    return NODE_KINDS.index(kind), pk
+
+
+class WorldGraph:
+    """Adjacency of one world, as CSR arrays plus an overlay of later changes."""
+
+    def __init__(self, world_id, version=None):
+        self.world_id = world_id
+        self.version = version
+        self.node_kind = array("b")
+        self.node_pk = array("q")
+        self.node_index = tuple({} for _ in NODE_KINDS)
+        self.edge_u = array("q")
+        self.edge_v = array("q")
+        self.edge_kind = array("b")
+        self.edge_row = array("q")
+        self.edge_start = array("q")
+        self.edge_end = array("q")
+        self.indptr = array("q", [0])
+        self.adj = array("q")
+        self.adj_edge = array("q")
+        self.frozen_nodes = 0
+        self.frozen_edges = 0
+        # Overlay: adjacency of edges added since loading, the live edge id of every
+        # patched (kind, row), or -1 once deleted, and deleted nodes.
+        self.extra_adj = {}
+        self.current = {}
+        self.removed_nodes = set()
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    @classmethod
+    def load(cls, world_id, version=None):
+        graph = cls(world_id, version)
+        for pk in Character.objects.filter(world=world_id).values_list("pk", flat=True).iterator():
+            graph._node(CHARACTER, pk)
+        for rows, target_kind, edge_kind in graph._edge_sources():
+            for row, u, v, start, end in rows.order_by().iterator():
+                graph._edge(edge_kind, row, (CHARACTER, u), (target_kind, v), start, end)
+        graph._freeze()
+        return graph
+
+    def _edge_sources(self):
+        """(values_list of row pk, character, other end, start key, end key; other node kind; edge kind)."""
+        world = self.world_id
+        # Family ties are not Temporal, so they are always active.
+        always = Value(None, output_field=BigIntegerField())
+        return (
+            (
+                CharacterRelationship.objects.filter(from_char__world=world).values_list(
+                    "pk", "from_char", "to_char", "start_key", "end_key"
+                ),
+                CHARACTER,
+                RELATIONSHIP,
+            ),
+            (
+                FamilyTie.objects.filter(child__world=world).values_list("pk", "parent", "child", always, always),
+                CHARACTER,
+                FAMILY,
+            ),
+            (
+                # Participations without dates of their own last as long as the event.
+                EventParticipation.objects.filter(character__world=world).values_list(
+                    "pk",
+                    "character",
+                    "event",
+                    Coalesce("start_key", "event__start_key"),
+                    Coalesce("end_key", "event__end_key"),
+                ),
+                EVENT,
+                PARTICIPATION,
+            ),
+            (
+                Honor.objects.filter(character__world=world).values_list(
+                    "pk", "character", "org", "start_key", "end_key"
+                ),
+                ORGANIZATION,
+                HONOR,
+            ),
+        )
+
+    def _node(self, kind, pk):
+        index = self.node_index[kind]
+        if pk not in index:
+            index[pk] = len(self.node_pk)
+            self.node_kind.append(kind)
+            self.node_pk.append(pk)
+        return index[pk]
+
+    def _edge(self, kind, row, u, v, start, end):
+        e = len(self.edge_row)
+        self.edge_u.append(self._node(*u))
+        self.edge_v.append(self._node(*v))
+        self.edge_kind.append(kind)
+        self.edge_row.append(row)
+        self.edge_start.append(KEY_MIN if start is None else start)
+        self.edge_end.append(KEY_MAX if end is None else end)
+        return e
+
+    def _freeze(self):
+        """Lay the loaded edges out as CSR arrays, in both directions."""
+        n = len(self.node_pk)
+        degree = [0] * (n + 1)
+        for u, v in zip(self.edge_u, self.edge_v):
+            degree[u + 1] += 1
+            degree[v + 1] += 1
+        for i in range(n):
+            degree[i + 1] += degree[i]
+        self.indptr = array("q", degree)
+        fill = degree[:-1]
+        self.adj = array("q", bytes(8 * degree[-1]))
+        self.adj_edge = array("q", bytes(8 * degree[-1]))
+        for e, (u, v) in enumerate(zip(self.edge_u, self.edge_v)):
+            self.adj[fill[u]], self.adj_edge[fill[u]] = v, e
+            fill[u] += 1
+            self.adj[fill[v]], self.adj_edge[fill[v]] = u, e
+            fill[v] += 1
+        self.frozen_nodes = n
+        self.frozen_edges = len(self.edge_row)
+
+    # ------------------------------------------------------------------
+    # Incremental patches
+    # ------------------------------------------------------------------
+    def has_node(self, key):
+        kind, pk = _node_code(key)
+        return pk in self.node_index[kind]
+
+    def add_node(self, key):
+        self._node(*_node_code(key))
+
+    def upsert_edge(self, kind, row, u, v, start, end):
+        """Add an edge, replacing any earlier version of the same row."""
+        kind = EDGE_KINDS.index(kind)
+        e = self._edge(kind, row, _node_code(u), _node_code(v), start, end)
+        for a, b in ((self.edge_u[e], self.edge_v[e]), (self.edge_v[e], self.edge_u[e])):
+            self.extra_adj.setdefault(a, []).append((b, e))
+        self.current[(kind, row)] = e
+
+    def remove_edge(self, kind, row):
+        self.current[(EDGE_KINDS.index(kind), row)] = -1
+
+    def remove_node(self, key):
+        kind, pk = _node_code(key)
+        if pk in self.node_index[kind]:
+            self.removed_nodes.add(self.node_index[kind][pk])
+
+    @property
+    def stale(self):
+        """True once the overlay is big enough that a fresh load is cheaper."""
+        return len(self.current) + len(self.removed_nodes) > max(MIN_OVERLAY, MAX_OVERLAY_RATIO * self.frozen_edges)
+
+    # ------------------------------------------------------------------
+    # Traversal
+    # ------------------------------------------------------------------
+    def _filter(self, as_of, kinds):
+        window = None if as_of is None else (lower_bound(as_of), upper_bound(as_of))
+        kinds = None if kinds is None else {EDGE_KINDS.index(k) for k in kinds}
+        return window, kinds
+
+    def _neighbours(self, u, window, kinds):
+        current, removed = self.current, self.removed_nodes
+        frozen = ()
+        if u < self.frozen_nodes:
+            lo, hi = self.indptr[u], self.indptr[u + 1]
+            frozen = zip(self.adj[lo:hi], self.adj_edge[lo:hi])
+        for pairs in (frozen, self.extra_adj.get(u, ())):
+            for v, e in pairs:
+                if kinds is not None and self.edge_kind[e] not in kinds:
+                    continue
+                if window is not None and (self.edge_start[e] > window[1] or self.edge_end[e] < window[0]):
+                    continue
+                if current and current.get((self.edge_kind[e], self.edge_row[e]), e) != e:
+                    continue
+                if v in removed:
+                    continue
+                yield v, e
+
+    def _index(self, key):
+        kind, pk = _node_code(key)
+        try:
+            u = self.node_index[kind][pk]
+        except KeyError:
+            raise LookupError("%s %s is not in world %s" % (NODE_KINDS[kind], pk, self.world_id))
+        if u in self.removed_nodes:
+            raise LookupError("%s %s has been deleted" % (NODE_KINDS[kind], pk))
+        return u
+
+    def _key(self, u):
+        return (NODE_KINDS[self.node_kind[u]], self.node_pk[u])
+
+    def neighbourhood(self, node, hops=1, as_of=None, kinds=None):
+        """Map every node within hops of node to its distance, as {("kind", pk): hops}."""
+        window, kinds = self._filter(as_of, kinds)
+        source = self._index(node)
+        distance = {source: 0}
+        queue = deque([source])
+        while queue:
+            u = queue.popleft()
+            if distance[u] == hops:
+                continue
+            for v, _ in self._neighbours(u, window, kinds):
+                if v not in distance:
+                    distance[v] = distance[u] + 1
+                    queue.append(v)
+        return {self._key(u): d for u, d in distance.items()}
+
+    def shortest_path(self, source, target, as_of=None, kinds=None):
+        """The nodes on a shortest path from source to target, or None if unconnected.
+
+        Searches from both ends at once, always expanding the smaller frontier.
+        """
+        window, kinds = self._filter(as_of, kinds)
+        a, b = self._index(source), self._index(target)
+        if a == b:
+            return [self._key(a)]
+        parents = ({a: None}, {b: None})
+        frontiers = ([a], [b])
+        while frontiers[0] and frontiers[1]:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            seen, other = parents[side], parents[1 - side]
+            next_frontier = []
+            for u in frontiers[side]:
+                for v, _ in self._neighbours(u, window, kinds):
+                    if v in seen:
+                        continue
+                    seen[v] = u
+                    if v in other:
+                        return self._join(parents, v)
+                    next_frontier.append(v)
+            frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+        return None
+
+    def _join(self, parents, meeting):
+        path = []
+        u = meeting
+        while u is not None:
+            path.append(u)
+            u = parents[0][u]
+        path.reverse()
+        u = parents[1][meeting]
+        while u is not None:
+            path.append(u)
+            u = parents[1][u]
+        return [self._key(u) for u in path]
+
+    def common_neighbours(self, first, second, as_of=None, kinds=None):
+        """Nodes adjacent to both first and second."""
+        window, kinds = self._filter(as_of, kinds)
+        mine = {v for v, _ in self._neighbours(self._index(first), window, kinds)}
+        theirs = {v for v, _ in self._neighbours(self._index(second), window, kinds)}
+        return {self._key(u) for u in mine & theirs}
+
+    def edges_among(self, nodes, as_of=None, kinds=None):
+        """Edges with both ends in nodes, as (u key, v key, edge kind, row pk) tuples."""
+        window, kinds = self._filter(as_of, kinds)
+        members = {self._index(node) for node in nodes}
+        edges = []
+        for u in members:
+            for v, e in self._neighbours(u, window, kinds):
+                if v in members and u <= v:
+                    edges.append((self._key(u), self._key(v), EDGE_KINDS[self.edge_kind[e]], self.edge_row[e]))
+        return edges
+
+
+# ----------------------------------------------------------------------
+# Per-process registry
+# ----------------------------------------------------------------------
+_graphs = {}
+_lock = threading.Lock()
+
+
+def get_graph(world):
+    """Return the graph of a world (instance or pk), loading it on first use or once the world has changed."""
+    world_id = getattr(world, "pk", world)
+    # Read before loading, so changes committed meanwhile are picked up next time.
+    version = caching.world_version(world_id)
+    graph = _graphs.get(world_id)
+    if graph is None or graph.version != version:
+        with _lock:
+            graph = _graphs.get(world_id)
+            if graph is None or graph.version != version:
+                graph = _graphs[world_id] = WorldGraph.load(world_id, version)
+    return graph
+
+
+def advance(world_id, version):
+    """Keep the loaded graph of a world current at version, which it reached by a change patched into it."""
+    graph = _graphs.get(world_id)
+    if graph is not None and graph.version == version - 1:
+        graph.version = version
+
+
+def loaded_graph(world_id):
+    """The graph of a world if this process has it loaded, else None."""
+    return _graphs.get(world_id)
+
+
+def loaded_graphs():
+    return list(_graphs.values())
+
+
+def invalidate(world_id=None):
+    """Drop the cached graph of one world, or of every world."""
+    if world_id is None:
+        _graphs.clear()
+    else:
+        _graphs.pop(world_id, None)
@@ -0,0 +1,225 @@
+"""Query count, database time and wall time per view, with query budgets.
+
+InstrumentationMiddleware measures every request and files it under the
+name of the view that served it (e.g. "world_timeline", or
+"admin:worlds_event_changelist" for an admin changelist). Each measurement is
+logged to the "worlds.instrumentation" logger, with the numbers as extra
+fields for structured log handlers, and added to per-process totals that
+prometheus_text() renders for the metrics view.
+
+Views declare how many queries they may run with the query_budget decorator,
+and the QUERY_BUDGETS setting can set or override budgets by view name, which
+is how admin pages get theirs. Going over budget logs a warning, or raises
+QueryBudgetExceeded when the QUERY_BUDGET_STRICT setting is on, as it is while
+running the tests.
+
+Anything else can be measured with the measure() context manager.
+"""
+import contextlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# view name -> [requests, queries, db seconds, wall seconds, over budget]
+_totals = {}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class Measurement:
+    """Queries and timings of a block of code, on every database connection of the current thread."""
+
+    def __init__(self, label, budget=None):
+        self.label = label
+        self.budget = budget
+        self.queries = 0
+        self.db_time = 0.0
+        self.wall_time = 0.0
+        self._started = None
+        self._connections = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def start(self):
+        self._started = time.perf_counter()
+        self.resume()
+
+    def stop(self):
+        if self._started is None:
+            return
+        self.wall_time = time.perf_counter() - self._started
+        self._started = None
+        self.pause()
+
+    def pause(self):
+        """Stop counting queries for a while, e.g. while a streamed response waits for its client."""
+        for connection in self._connections:
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+        self._connections = []
+
+    def resume(self):
+        """Count queries again, on the connections of the current thread."""
+        self._connections = connections.all()
+        for connection in self._connections:
+            connection.execute_wrappers.append(self)
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget
+
+
+@contextlib.contextmanager
+def measure(label, budget=None, record=True):
+    """Measure the block, yielding its Measurement, then report it (see report())."""
+    measurement = Measurement(label, budget)
+    measurement.start()
+    try:
+        yield measurement
+    finally:
+        measurement.stop()
+    if record:
+        report(measurement)
+
+
+def report(measurement):
+    """Log a finished measurement, add it to the totals and enforce its budget."""
+    with _lock:
+        counts = _totals.setdefault(measurement.label, [0, 0, 0.0, 0.0, 0])
+        counts[0] += 1
+        counts[1] += measurement.queries
+        counts[2] += measurement.db_time
+        counts[3] += measurement.wall_time
+        counts[4] += measurement.over_budget
+    fields = {
+        "view": measurement.label,
+        "queries": measurement.queries,
+        "db_ms": round(measurement.db_time * 1000, 3),
+        "wall_ms": round(measurement.wall_time * 1000, 3),
+        "query_budget": measurement.budget,
+    }
+    logger.info(
+        "%(view)s: %(queries)d queries, %(db_ms).1f ms in the database, %(wall_ms).1f ms in all",
+        fields,
+        extra=fields,
+    )
+    if measurement.over_budget:
+        message = "%s ran %d queries, over its budget of %d" % (
+            measurement.label,
+            measurement.queries,
+            measurement.budget,
+        )
+        if getattr(settings, "QUERY_BUDGET_STRICT", False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message, extra=fields)
+
+
+def query_budget(queries):
+    """Declare the most queries a view may run per request."""
+
+    def decorator(view):
+        view.query_budget = queries
+        return view
+
+    return decorator
+
+
+def budget_of(name, view):
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    if name in budgets:
+        return budgets[name]
+    return getattr(view, "query_budget", None)
+
+
+class InstrumentationMiddleware:
+    """Measure each request under the name of its view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        measurement = Measurement("unresolved")
+        measurement.start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            measurement.stop()
+            raise
+        match = getattr(request, "resolver_match", None)
+        if match is not None:
+            measurement.label = match.view_name
+            measurement.budget = budget_of(measurement.label, match.func)
+        if response.streaming:
+            # Streamed views run most of their queries as the response is sent.
+            measurement.pause()
+            response.streaming_content = _finish_after(response.streaming_content, measurement)
+        else:
+            measurement.stop()
+            report(measurement)
+        return response
+
+
+def _finish_after(chunks, measurement):
+    # Under ASGI (see storyworlds.asgi) each chunk may be produced by a
+    # different thread, so only count queries while a chunk is being made.
+    chunks = iter(chunks)
+    try:
+        while True:
+            measurement.resume()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                measurement.pause()
+            yield chunk
+    finally:
+        measurement.stop()
+        report(measurement)
+
+
+def totals():
+    """{view name: (requests, queries, db seconds, wall seconds, requests over budget)} for this process."""
+    with _lock:
+        return {label: tuple(values) for label, values in _totals.items()}
+
+
+def reset():
+    with _lock:
+        _totals.clear()
+
+
+METRICS = (
+    ("storyworlds_view_requests_total", "counter", "Requests served."),
+    ("storyworlds_view_queries_total", "counter", "SQL queries run."),
+    ("storyworlds_view_db_seconds_total", "counter", "Time spent running SQL queries."),
+    ("storyworlds_view_seconds_total", "counter", "Time spent serving requests."),
+    ("storyworlds_view_over_budget_total", "counter", "Requests that ran more queries than their budget."),
+)
+
+
+def prometheus_text():
+    """The totals in the Prometheus text exposition format."""
+    rows = sorted(totals().items())
+    lines = []
+    for i, (name, kind, help_text) in enumerate(METRICS):
+        lines.append("# HELP %s %s" % (name, help_text))
+        lines.append("# TYPE %s %s" % (name, kind))
+        for label, values in rows:
+            escaped = label.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append('%s{view="%s"} %s' % (name, escaped, values[i]))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,62 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from worlds import benchmarks
+from worlds.synthetic import SCALES
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot paths over a synthetic world in a test database, writing the results as JSON. "
+        "With --baseline, fail if any case got slower or runs more queries than before."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--characters", default="1k", help="Number of characters, or one of %s." % ", ".join(SCALES)
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic world.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs of each case.")
+        parser.add_argument("--case", action="append", choices=sorted(benchmarks.CASES), help="Only run some cases.")
+        parser.add_argument("--output", help="File to write the results to (default: standard output).")
+        parser.add_argument("--baseline", help="Results of an earlier run to compare with.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.25, help="Slowdown allowed against the baseline, as a fraction."
+        )
+        parser.add_argument("--keepdb", action="store_true", help="Keep the test database between runs.")
+
+    def handle(self, *args, **options):
+        try:
+            characters = int(SCALES.get(options["characters"].lower(), options["characters"]))
+        except ValueError:
+            raise CommandError("Bad number of characters: %s" % options["characters"])
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as infile:
+                baseline = json.load(infile)
+
+        # Never touch the real database: work in a test one, as the test runner does.
+        setup_test_environment()
+        old_config = setup_databases(options["verbosity"], interactive=False, keepdb=options["keepdb"])
+        try:
+            report = benchmarks.run(characters, options["seed"], options["repeat"], options["case"])
+        finally:
+            teardown_databases(old_config, options["verbosity"], keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as out:
+                out.write(text + "\n")
+        else:
+            sys.stdout.write(text + "\n")
+        if baseline is not None:
+            try:
+                regressions = benchmarks.compare(report, baseline, options["tolerance"])
+            except ValueError as err:
+                raise CommandError(str(err))
+            if regressions:
+                raise CommandError("Regressions against %s:\n%s" % (options["baseline"], "\n".join(regressions)))
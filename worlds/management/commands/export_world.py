@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from worlds.exchange import export_world
+from worlds.models import World
+
+
+class Command(BaseCommand):
+    help = "Export a world as newline-delimited JSON, for import_world."
+
+    def add_arguments(self, parser):
+        parser.add_argument("world", help="Slug of the world to export.")
+        parser.add_argument("-o", "--output", help="File to write to (default: standard output).")
+
+    def handle(self, *args, **options):
+        try:
+            world = World.objects.get(slug=options["world"])
+        except World.DoesNotExist:
+            raise CommandError("Unknown world: %s" % options["world"])
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as out:
+                count = export_world(world, out)
+        else:
+            count = export_world(world, sys.stdout)
+        self.stderr.write("Exported %d records from %s" % (count, world.slug))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from worlds.exchange import WorldFileError
+from worlds.synthetic import SCALES, generate_world
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic world, for benchmarks and load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("slug", help="Slug of the world to create.")
+        parser.add_argument(
+            "--characters", default="1k", help="Number of characters, or one of %s." % ", ".join(SCALES)
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same world.")
+        parser.add_argument("--replace", action="store_true", help="Delete an existing world with the same slug.")
+
+    def handle(self, *args, **options):
+        try:
+            characters = int(SCALES.get(options["characters"].lower(), options["characters"]))
+        except ValueError:
+            raise CommandError("Bad number of characters: %s" % options["characters"])
+        try:
+            world, counts = generate_world(options["slug"], characters, options["seed"], options["replace"])
+        except WorldFileError as err:
+            raise CommandError(str(err))
+
+        for name, count in counts.items():
+            self.stdout.write("%s: %d" % (name, count))
+        self.stdout.write("Generated %s" % world.slug)
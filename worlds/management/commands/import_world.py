@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from worlds.exchange import BATCH_SIZE, WorldFileError, import_world
+
+
+class Command(BaseCommand):
+    help = "Import a world from newline-delimited JSON written by export_world."
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", nargs="?", help="File to read (default: standard input).")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per bulk insert.")
+        parser.add_argument("--replace", action="store_true", help="Delete an existing world with the same slug.")
+
+    def handle(self, *args, **options):
+        try:
+            if options["input"]:
+                with open(options["input"], encoding="utf-8") as lines:
+                    world, counts = import_world(lines, options["batch_size"], options["replace"])
+            else:
+                world, counts = import_world(sys.stdin, options["batch_size"], options["replace"])
+        except WorldFileError as err:
+            raise CommandError(str(err))
+
+        for name, count in counts.items():
+            self.stdout.write("%s: %d" % (name, count))
+        self.stdout.write("Imported %s" % world.slug)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from worlds.models import Lineage, World
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ancestor/descendant closure of FamilyTie from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("worlds", nargs="*", metavar="world", help="Slugs of the worlds to rebuild.")
+        parser.add_argument("--all", action="store_true", help="Rebuild every world.")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            worlds = World.objects.all()
+        elif options["worlds"]:
+            worlds = World.objects.filter(slug__in=options["worlds"])
+            missing = set(options["worlds"]) - {w.slug for w in worlds}
+            if missing:
+                raise CommandError("Unknown worlds: %s" % ", ".join(sorted(missing)))
+        else:
+            raise CommandError("Name at least one world, or pass --all.")
+
+        for world in worlds:
+            with transaction.atomic():
+                Lineage.objects.rebuild(world)
+            count = Lineage.objects.filter(descendant__world=world).count()
+            self.stdout.write("%s: %d lineage rows" % (world.slug, count))
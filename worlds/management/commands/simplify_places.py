@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from worlds.models import Place, PlaceOutline
+
+
+class Command(BaseCommand):
+    help = "Regenerate the simplified outlines of Places whose detailed geography changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("worlds", nargs="*", metavar="world", help="Slugs of the worlds to process.")
+        parser.add_argument("--all", action="store_true", help="Process every world.")
+        parser.add_argument("--force", action="store_true", help="Regenerate every place, not just stale ones.")
+        parser.add_argument(
+            "--loop", type=float, metavar="SECONDS", help="Keep running, checking for stale places this often."
+        )
+
+    def handle(self, *args, **options):
+        if not options["all"] and not options["worlds"]:
+            raise CommandError("Name at least one world, or pass --all.")
+        places = Place.objects.all()
+        if options["worlds"]:
+            places = places.filter(world__slug__in=options["worlds"])
+        if not options["force"]:
+            places = places.filter(outlines_stale=True)
+
+        while True:
+            count = PlaceOutline.objects.regenerate(places)
+            if count or options["verbosity"] > 1:
+                self.stdout.write("Simplified %d places" % count)
+            if not options["loop"]:
+                break
+            places = places.filter(outlines_stale=True)
+            time.sleep(options["loop"])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from worlds.models import World
+from worlds.snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Write a read-only columnar snapshot of a world, for worlds.snapshot analytics."
+
+    def add_arguments(self, parser):
+        parser.add_argument("world", help="Slug of the world to snapshot.")
+        parser.add_argument("directory", help="Directory to write the snapshot files to.")
+
+    def handle(self, *args, **options):
+        try:
+            world = World.objects.get(slug=options["world"])
+        except World.DoesNotExist:
+            raise CommandError("Unknown world: %s" % options["world"])
+
+        manifest = write_snapshot(world, options["directory"])
+        for table, info in manifest["tables"].items():
+            self.stdout.write("%s: %d rows" % (table, info["rows"]))
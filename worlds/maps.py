@@ -0,0 +1,178 @@
+"""World map tiles.
+
+Tiles use the usual web map z/x/y scheme. Each tile is a GeoJSON feature
+collection of the Places in its bounding box, found through the spatial index.
+Detailed geometries are served from the stored PlaceOutline level matching
+the zoom; zooms finer than the finest level still get that level, never the
+full geography. Places whose outlines have not been generated yet, or are
+stale since their geography changed, are simplified on the fly to the same
+level's tolerance, and cached until the place changes.
+"""
+import json
+import math
+import struct
+
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.core.cache import cache
+from django.db.models import FloatField, Func
+
+from .chronology import lower_bound, upper_bound
+from .models import Event, EventParticipation, Place, PlaceOutline
+from .timeline import PAGE_SIZE, timeline_page
+
+MAX_ZOOM = 20
+TILE_SIZE = 256
+
+CACHE_PREFIX = "worlds:place-geometry"
+CACHE_TIMEOUT = 60 * 60 * 24
+# Cached for places without geo_detail; cache.get_many() leaves out None values.
+NO_GEOMETRY = ""
+
+# Campaign map binary records: sort key, longitude, latitude, event pk, little-endian.
+CAMPAIGN_RECORD = struct.Struct("<qddq")
+CAMPAIGN_COLUMNS = ("key", "lon", "lat", "event")
+
+
+class X(Func):
+    function = "ST_X"
+    output_field = FloatField()
+
+
+class Y(Func):
+    function = "ST_Y"
+    output_field = FloatField()
+
+
+def tile_bbox(z, x, y):
+    """The (west, south, east, north) longitude/latitude bounds of a tile."""
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2**z or not 0 <= y < 2**z:
+        raise ValueError("No tile %d/%d/%d" % (z, x, y))
+    n = 2**z
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return (x / n * 360.0 - 180.0, latitude(y + 1), (x + 1) / n * 360.0 - 180.0, latitude(y))
+
+
+def tolerance(z):
+    """Simplification tolerance in degrees: about one pixel at zoom z."""
+    return 360.0 / (TILE_SIZE * 2**z)
+
+
+def outline_level(z):
+    """The coarsest PlaceOutline level detailed enough for zoom z, or the finest level past it."""
+    pixel = tolerance(z)
+    for level, level_tolerance in enumerate(PlaceOutline.TOLERANCES):
+        if level_tolerance <= pixel:
+            return level
+    return len(PlaceOutline.TOLERANCES) - 1
+
+
+def _cache_key(pk, level):
+    return "%s:%d:%d" % (CACHE_PREFIX, pk, level)
+
+
+def forget_place(pk):
+    """Drop the cached simplified geometries of a place."""
+    cache.delete_many([_cache_key(pk, level) for level in range(len(PlaceOutline.TOLERANCES))])
+
+
+def geometries(pks, z):
+    """Map place pks to GeoJSON geometry strings detailed enough for zoom z (NO_GEOMETRY without geo_detail)."""
+    level = outline_level(z)
+    # Stale outlines no longer match the place's geography until simplify_places runs.
+    outlines = PlaceOutline.objects.filter(place__in=pks, place__outlines_stale=False, level=level).order_by()
+    found = dict(outlines.values_list("place", AsGeoJSON("geometry")))
+    missing = [pk for pk in pks if pk not in found]
+    if missing:
+        found.update(simplified_geometries(missing, level))
+    return found
+
+
+def simplified_geometries(pks, level):
+    """Map place pks to GeoJSON geometry strings simplified on the fly to an outline level's tolerance."""
+    keys = {pk: _cache_key(pk, level) for pk in pks}
+    cached = cache.get_many(keys.values())
+    found = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [pk for pk in pks if pk not in found]
+    if missing:
+        fresh = {}
+        for pk, geometry in Place.objects.filter(pk__in=missing).values_list("pk", "geo_detail"):
+            if geometry is not None:
+                geometry = PlaceOutline.simplify(geometry, PlaceOutline.TOLERANCES[level])["geometry"]
+            fresh[pk] = NO_GEOMETRY if geometry is None else geometry.json
+        cache.set_many({keys[pk]: geometry for pk, geometry in fresh.items()}, CACHE_TIMEOUT)
+        found.update(fresh)
+    return found
+
+
+def tile(world, z, x, y):
+    """The GeoJSON feature collection of a world's places in tile z/x/y."""
+    places = (
+        Place.objects.filter(world=world)
+        .in_bbox(*tile_bbox(z, x, y))
+        .order_by()
+        .values_list("pk", "slug", "name", "point_location")
+    )
+    places = list(places)
+    shapes = geometries([pk for pk, _, _, _ in places], z)
+    features = []
+    for pk, slug, name, point in places:
+        geometry = shapes.get(pk) or (point.json if point is not None else None)
+        features.append(
+            {
+                "type": "Feature",
+                "id": pk,
+                "geometry": json.loads(geometry) if geometry else None,
+                "properties": {"slug": slug, "name": name},
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}
+
+
+# ----------------------------------------------------------------------
+# Campaign maps
+# ----------------------------------------------------------------------
+def campaign_queryset(world, character=None, start=None, end=None):
+    """(start_key, lon, lat, event pk) of located events in chronological order, in one joined query.
+
+    With a character, only events they took part in. start and end are partial
+    dates bounding the time window.
+    """
+    events = Event.objects.filter(world=world, start_key__isnull=False, place__point_location__isnull=False)
+    if character is not None:
+        events = events.filter(pk__in=EventParticipation.objects.filter(character=character).values("event"))
+    if start is not None:
+        events = events.filter(end_key__gte=lower_bound(start))
+    if end is not None:
+        events = events.filter(start_key__lte=upper_bound(end))
+    return events.order_by("start_key", "pk").values_list(
+        "start_key", X("place__point_location"), Y("place__point_location"), "pk"
+    )
+
+
+def _campaign_pages(queryset):
+    cursor = None
+    while True:
+        rows, cursor = timeline_page(queryset, cursor, PAGE_SIZE, cursor_of=lambda row: (row[0], row[3]))
+        if rows:
+            yield rows
+        if cursor is None:
+            return
+
+
+def stream_campaign_json(queryset):
+    """Generate {"columns": [...], "rows": [[key, lon, lat, event], ...]} in chunks."""
+    yield '{"columns":%s,"rows":[' % json.dumps(CAMPAIGN_COLUMNS)
+    separator = ""
+    for rows in _campaign_pages(queryset):
+        yield separator + ",".join(json.dumps(row) for row in rows)
+        separator = ","
+    yield "]}"
+
+
+def stream_campaign_binary(queryset):
+    """Generate packed CAMPAIGN_RECORD structs, one per event."""
+    for rows in _campaign_pages(queryset):
+        yield b"".join(CAMPAIGN_RECORD.pack(*row) for row in rows)
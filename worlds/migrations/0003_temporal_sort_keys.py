@@ -0,0 +1,255 @@
+# Generated by Django 2.2.18 on 2026-10-17 02:21
+
+from django.db import migrations, models
+
+from worlds.chronology import sort_keys
+
+TEMPORAL_MODELS = (
+    'Character', 'CharacterRelationship', 'Event', 'EventParticipation', 'Honor', 'Organization', 'Title',
+)
+
+
+def populate_sort_keys(apps, schema_editor):
+    for name in TEMPORAL_MODELS:
+        model = apps.get_model('worlds', name)
+        changed = []
+        for obj in model.objects.iterator():
+            obj.start_key, obj.end_key = sort_keys(
+                obj.time_type,
+                (obj.start_year, obj.start_month, obj.start_day, obj.start_time),
+                (obj.end_year, obj.end_month, obj.end_day, obj.end_time),
+            )
+            changed.append(obj)
+            if len(changed) >= 1000:
+                model.objects.bulk_update(changed, ['start_key', 'end_key'])
+                changed = []
+        model.objects.bulk_update(changed, ['start_key', 'end_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('worlds', '0002_auto_20190616_1107'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='characterrelationship',
+            options={'ordering': ['start_key', 'end_key'], 'verbose_name': 'characterrelationship', 'verbose_name_plural': 'characterrelationships'},
+        ),
+        migrations.AlterModelOptions(
+            name='event',
+            options={'ordering': ['start_key', 'end_key'], 'verbose_name': 'event', 'verbose_name_plural': 'events'},
+        ),
+        migrations.AlterModelOptions(
+            name='eventparticipation',
+            options={'ordering': ['start_key', 'end_key'], 'verbose_name': 'event_participation', 'verbose_name_plural': 'event_participations'},
+        ),
+        migrations.AlterModelOptions(
+            name='honor',
+            options={'ordering': ['start_key', 'end_key'], 'verbose_name': 'honor', 'verbose_name_plural': 'honors'},
+        ),
+        migrations.AlterModelOptions(
+            name='organization',
+            options={'ordering': ['start_key', 'end_key'], 'verbose_name': 'organization', 'verbose_name_plural': 'organizations'},
+        ),
+        migrations.AlterModelOptions(
+            name='title',
+            options={'ordering': ['start_key', 'end_key'], 'verbose_name': 'title', 'verbose_name_plural': 'titles'},
+        ),
+        migrations.RemoveIndex(
+            model_name='character',
+            name='worlds_char_start_y_b26ec2_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='character',
+            name='worlds_char_end_yea_5f1918_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='characterrelationship',
+            name='worlds_char_start_y_55d5e9_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='characterrelationship',
+            name='worlds_char_end_yea_43db77_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='worlds_even_start_y_48afad_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='worlds_even_end_yea_d8fca2_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='eventparticipation',
+            name='worlds_even_start_y_4d556e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='eventparticipation',
+            name='worlds_even_end_yea_a1a396_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='honor',
+            name='worlds_hono_start_y_88b800_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='honor',
+            name='worlds_hono_end_yea_4430e8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='organization',
+            name='worlds_orga_start_y_a6b637_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='organization',
+            name='worlds_orga_end_yea_0e5c58_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='title',
+            name='worlds_titl_start_y_36d726_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='title',
+            name='worlds_titl_end_yea_f27925_idx',
+        ),
+        migrations.AddField(
+            model_name='character',
+            name='end_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='end key'),
+        ),
+        migrations.AddField(
+            model_name='character',
+            name='start_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='start key'),
+        ),
+        migrations.AddField(
+            model_name='characterrelationship',
+            name='end_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='end key'),
+        ),
+        migrations.AddField(
+            model_name='characterrelationship',
+            name='start_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='start key'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='end_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='end key'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='start_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='start key'),
+        ),
+        migrations.AddField(
+            model_name='eventparticipation',
+            name='end_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='end key'),
+        ),
+        migrations.AddField(
+            model_name='eventparticipation',
+            name='start_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='start key'),
+        ),
+        migrations.AddField(
+            model_name='honor',
+            name='end_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='end key'),
+        ),
+        migrations.AddField(
+            model_name='honor',
+            name='start_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='start key'),
+        ),
+        migrations.AddField(
+            model_name='organization',
+            name='end_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='end key'),
+        ),
+        migrations.AddField(
+            model_name='organization',
+            name='start_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='start key'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='end_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='end key'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='start_key',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='start key'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['start_key', 'end_key'], name='worlds_char_start_k_c89987_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['end_key'], name='worlds_char_end_key_f478fc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['world', 'start_key', 'end_key'], name='worlds_char_world_i_f60b89_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='characterrelationship',
+            index=models.Index(fields=['start_key', 'end_key'], name='worlds_char_start_k_e2f3d3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='characterrelationship',
+            index=models.Index(fields=['end_key'], name='worlds_char_end_key_c25d5b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['start_key', 'end_key'], name='worlds_even_start_k_4f0d06_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['end_key'], name='worlds_even_end_key_a85305_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['world', 'start_key', 'end_key'], name='worlds_even_world_i_77319a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventparticipation',
+            index=models.Index(fields=['start_key', 'end_key'], name='worlds_even_start_k_44c4f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventparticipation',
+            index=models.Index(fields=['end_key'], name='worlds_even_end_key_5e7c41_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='honor',
+            index=models.Index(fields=['start_key', 'end_key'], name='worlds_hono_start_k_e220b8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='honor',
+            index=models.Index(fields=['end_key'], name='worlds_hono_end_key_aa8cc7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organization',
+            index=models.Index(fields=['start_key', 'end_key'], name='worlds_orga_start_k_b83b20_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organization',
+            index=models.Index(fields=['end_key'], name='worlds_orga_end_key_cbdc7d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organization',
+            index=models.Index(fields=['world', 'start_key', 'end_key'], name='worlds_orga_world_i_e459e5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['start_key', 'end_key'], name='worlds_titl_start_k_7cc17e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['end_key'], name='worlds_titl_end_key_ac21cb_idx'),
+        ),
+        migrations.RunPython(populate_sort_keys, migrations.RunPython.noop),
+    ]
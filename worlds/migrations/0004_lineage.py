@@ -0,0 +1,46 @@
+# Generated by Django 2.2.18 on 2026-10-17 02:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from worlds.models import LineageQuerySet
+
+
+def build_lineage(apps, schema_editor):
+    Lineage = apps.get_model('worlds', 'Lineage')
+    World = apps.get_model('worlds', 'World')
+    for world_id in World.objects.values_list('pk', flat=True):
+        LineageQuerySet(model=Lineage).rebuild(world_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('worlds', '0003_temporal_sort_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Lineage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(verbose_name='depth')),
+                ('paths', models.PositiveIntegerField(default=1, verbose_name='paths')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='worlds.Character')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='worlds.Character')),
+            ],
+            options={
+                'verbose_name': 'lineage',
+                'verbose_name_plural': 'lineages',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='lineage',
+            index=models.Index(fields=['descendant', 'depth', 'ancestor'], name='worlds_line_descend_41550e_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='lineage',
+            constraint=models.UniqueConstraint(fields=('ancestor', 'depth', 'descendant'), name='worlds_lineage_path'),
+        ),
+        migrations.RunPython(build_lineage, migrations.RunPython.noop),
+    ]
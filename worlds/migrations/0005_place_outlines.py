@@ -0,0 +1,45 @@
+# Generated by Django 2.2.18 on 2026-10-17 02:30
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def mark_outlines_stale(apps, schema_editor):
+    Place = apps.get_model('worlds', 'Place')
+    Place.objects.filter(geo_detail__isnull=False).update(outlines_stale=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('worlds', '0004_lineage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='outlines_stale',
+            field=models.BooleanField(default=False, editable=False, verbose_name='outlines stale'),
+        ),
+        migrations.CreateModel(
+            name='PlaceOutline',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField(verbose_name='level')),
+                ('tolerance', models.FloatField(verbose_name='tolerance')),
+                ('geometry', django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, null=True, srid=4326, verbose_name='geometry')),
+                ('vertices', models.PositiveIntegerField(default=0, verbose_name='vertices')),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outlines', to='worlds.Place')),
+            ],
+            options={
+                'verbose_name': 'place outline',
+                'verbose_name_plural': 'place outlines',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='placeoutline',
+            constraint=models.UniqueConstraint(fields=('place', 'level'), name='worlds_placeoutline_level'),
+        ),
+        migrations.RunPython(mark_outlines_stale, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.18 on 2026-10-17 02:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from worlds import search
+
+
+def build_search_entries(apps, schema_editor):
+    search.reindex(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("worlds", "0005_place_outlines"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchEntry",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("kind", models.CharField(max_length=20, verbose_name="kind")),
+                ("object_id", models.PositiveIntegerField(verbose_name="object id")),
+                ("name", models.TextField(verbose_name="name")),
+                ("body", models.TextField(blank=True, verbose_name="body")),
+                ("tags", models.TextField(blank=True, verbose_name="tags")),
+                (
+                    "world",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to="worlds.World"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "search entry",
+                "verbose_name_plural": "search entries",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="searchentry",
+            index=models.Index(fields=["world", "kind"], name="worlds_sear_world_i_8306d3_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="searchentry",
+            constraint=models.UniqueConstraint(fields=("kind", "object_id"), name="worlds_searchentry_object"),
+        ),
+        migrations.RunPython(search.create_index, search.drop_index),
+        migrations.RunPython(build_search_entries, migrations.RunPython.noop),
+    ]
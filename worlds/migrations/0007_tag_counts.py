@@ -0,0 +1,52 @@
+# Generated by Django 2.2.18 on 2026-10-17 02:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from worlds import facets
+
+
+def count_tags(apps, schema_editor):
+    facets.rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("taggit", "0003_taggeditem_add_unique_index"),
+        ("worlds", "0006_search_entries"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TagCount",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("kind", models.CharField(max_length=20, verbose_name="kind")),
+                ("count", models.PositiveIntegerField(default=0, verbose_name="count")),
+                (
+                    "tag",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to="taggit.Tag"),
+                ),
+                (
+                    "world",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to="worlds.World"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "tag count",
+                "verbose_name_plural": "tag counts",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="tagcount",
+            index=models.Index(fields=["world", "count"], name="worlds_tagc_world_i_3fa866_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="tagcount",
+            constraint=models.UniqueConstraint(fields=("world", "kind", "tag"), name="worlds_tagcount_tag"),
+        ),
+        migrations.RunPython(count_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 2.2.18 on 2026-10-17 02:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_known_keys(apps, schema_editor):
+    Event = apps.get_model("worlds", "Event")
+    Event.objects.update(estimated_key=models.F("start_key"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("worlds", "0007_tag_counts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DateConstraint",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("after", "after"), ("before", "before"), ("circa", "circa")],
+                        max_length=10,
+                        verbose_name="kind",
+                    ),
+                ),
+                ("year", models.IntegerField(blank=True, null=True, verbose_name="year")),
+                ("margin", models.PositiveIntegerField(default=0, verbose_name="margin (years)")),
+            ],
+            options={
+                "verbose_name": "date constraint",
+                "verbose_name_plural": "date constraints",
+            },
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="estimated_key",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="estimated key"),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["world", "estimated_key"], name="worlds_even_world_i_e22c38_idx"),
+        ),
+        migrations.AddField(
+            model_name="dateconstraint",
+            name="event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, related_name="date_constraints", to="worlds.Event"
+            ),
+        ),
+        migrations.AddField(
+            model_name="dateconstraint",
+            name="other",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="worlds.Event",
+                verbose_name="other event",
+            ),
+        ),
+        migrations.RunPython(copy_known_keys, migrations.RunPython.noop),
+    ]
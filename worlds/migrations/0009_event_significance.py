@@ -0,0 +1,65 @@
+# Generated by Django 2.2.18 on 2026-10-17 02:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from worlds import significance
+
+
+def build_event_buckets(apps, schema_editor):
+    for world_id in apps.get_model("worlds", "World").objects.values_list("pk", flat=True):
+        significance.rebuild(world_id, apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("worlds", "0008_date_constraints"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventBucket",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("level", models.PositiveSmallIntegerField(verbose_name="level")),
+                ("bucket", models.BigIntegerField(verbose_name="bucket")),
+                ("rank", models.PositiveSmallIntegerField(verbose_name="rank")),
+            ],
+            options={
+                "verbose_name": "event bucket",
+                "verbose_name_plural": "event buckets",
+            },
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="significance",
+            field=models.PositiveSmallIntegerField(default=0, verbose_name="significance"),
+        ),
+        migrations.AddField(
+            model_name="eventparticipation",
+            name="significance",
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name="significance"),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["world", "significance"], name="worlds_even_world_i_2cd03b_idx"),
+        ),
+        migrations.AddField(
+            model_name="eventbucket",
+            name="event",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to="worlds.Event"),
+        ),
+        migrations.AddField(
+            model_name="eventbucket",
+            name="world",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to="worlds.World"),
+        ),
+        migrations.AddConstraint(
+            model_name="eventbucket",
+            constraint=models.UniqueConstraint(
+                fields=("world", "level", "bucket", "rank"), name="worlds_eventbucket_rank"
+            ),
+        ),
+        migrations.RunPython(build_event_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,1148 @@
+# Generated by Django 2.2.18 on 2026-10-17 02:43
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.expressions
+
+from worlds.chronology import date_bounds, normalize_dates
+
+TEMPORAL_MODELS = (
+    "Character",
+    "CharacterRelationship",
+    "Event",
+    "EventParticipation",
+    "Honor",
+    "Organization",
+    "Title",
+)
+TEMPORAL_FIELDS = (
+    "time_type",
+    "start_year",
+    "start_month",
+    "start_day",
+    "start_time",
+    "end_year",
+    "end_month",
+    "end_day",
+    "end_time",
+)
+SORT_KEY_FIELDS = ("start_key", "start_latest", "end_earliest", "end_key")
+
+
+def repair_dates(apps, schema_editor):
+    """Bring existing rows within the new constraints and fill in the new bounds."""
+    for name in TEMPORAL_MODELS:
+        model = apps.get_model("worlds", name)
+        changed = []
+        for obj in model.objects.only(*TEMPORAL_FIELDS).iterator():
+            values = normalize_dates({f: getattr(obj, f) for f in TEMPORAL_FIELDS}, repair=True)
+            for field, value in values.items():
+                setattr(obj, field, value)
+            bounds = date_bounds(
+                values["time_type"],
+                [values[f] for f in TEMPORAL_FIELDS[1:5]],
+                [values[f] for f in TEMPORAL_FIELDS[5:]],
+            )
+            for field, value in zip(SORT_KEY_FIELDS, bounds):
+                setattr(obj, field, value)
+            changed.append(obj)
+            if len(changed) >= 1000:
+                model.objects.bulk_update(changed, TEMPORAL_FIELDS + SORT_KEY_FIELDS)
+                changed = []
+        model.objects.bulk_update(changed, TEMPORAL_FIELDS + SORT_KEY_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("worlds", "0009_event_significance"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="character",
+            name="end_earliest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="end earliest"),
+        ),
+        migrations.AddField(
+            model_name="character",
+            name="start_latest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="start latest"),
+        ),
+        migrations.AddField(
+            model_name="characterrelationship",
+            name="end_earliest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="end earliest"),
+        ),
+        migrations.AddField(
+            model_name="characterrelationship",
+            name="start_latest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="start latest"),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="end_earliest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="end earliest"),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="start_latest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="start latest"),
+        ),
+        migrations.AddField(
+            model_name="eventparticipation",
+            name="end_earliest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="end earliest"),
+        ),
+        migrations.AddField(
+            model_name="eventparticipation",
+            name="start_latest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="start latest"),
+        ),
+        migrations.AddField(
+            model_name="honor",
+            name="end_earliest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="end earliest"),
+        ),
+        migrations.AddField(
+            model_name="honor",
+            name="start_latest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="start latest"),
+        ),
+        migrations.AddField(
+            model_name="organization",
+            name="end_earliest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="end earliest"),
+        ),
+        migrations.AddField(
+            model_name="organization",
+            name="start_latest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="start latest"),
+        ),
+        migrations.AddField(
+            model_name="title",
+            name="end_earliest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="end earliest"),
+        ),
+        migrations.AddField(
+            model_name="title",
+            name="start_latest",
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name="start latest"),
+        ),
+        migrations.AlterField(
+            model_name="character",
+            name="end_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="end day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="character",
+            name="end_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="end month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="character",
+            name="start_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="start day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="character",
+            name="start_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="start month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="characterrelationship",
+            name="end_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="end day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="characterrelationship",
+            name="end_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="end month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="characterrelationship",
+            name="start_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="start day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="characterrelationship",
+            name="start_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="start month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="event",
+            name="end_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="end day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="event",
+            name="end_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="end month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="event",
+            name="start_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="start day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="event",
+            name="start_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="start month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="eventparticipation",
+            name="end_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="end day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="eventparticipation",
+            name="end_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="end month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="eventparticipation",
+            name="start_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="start day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="eventparticipation",
+            name="start_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="start month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="honor",
+            name="end_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="end day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="honor",
+            name="end_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="end month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="honor",
+            name="start_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="start day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="honor",
+            name="start_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="start month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="organization",
+            name="end_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="end day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="organization",
+            name="end_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="end month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="organization",
+            name="start_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="start day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="organization",
+            name="start_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="start month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="title",
+            name="end_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="end day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="title",
+            name="end_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="end month",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="title",
+            name="start_day",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)],
+                verbose_name="start day",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="title",
+            name="start_month",
+            field=models.IntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)],
+                verbose_name="start month",
+            ),
+        ),
+        migrations.RunPython(repair_dates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="character",
+            constraint=models.CheckConstraint(
+                check=models.Q(time_type__in=("span", "instant")), name="worlds_character_time_type"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="character",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_month__isnull", True),
+                        models.Q(("start_month__gte", 1), ("start_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_month__isnull", True),
+                        models.Q(("end_month__gte", 1), ("end_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                ),
+                name="worlds_character_months",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="character",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_day__isnull", True),
+                        models.Q(("start_day__gte", 1), ("start_day__lte", 31)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_day__isnull", True), models.Q(("end_day__gte", 1), ("end_day__lte", 31)), _connector="OR"
+                    ),
+                ),
+                name="worlds_character_days",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="character",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("start_month__isnull", True), ("start_year__isnull", False), _connector="OR"),
+                    models.Q(("start_day__isnull", True), ("start_month__isnull", False), _connector="OR"),
+                    models.Q(("start_time__isnull", True), ("start_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_character_start_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="character",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("end_month__isnull", True), ("end_year__isnull", False), _connector="OR"),
+                    models.Q(("end_day__isnull", True), ("end_month__isnull", False), _connector="OR"),
+                    models.Q(("end_time__isnull", True), ("end_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_character_end_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="character",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("time_type", "span"),
+                    models.Q(
+                        models.Q(
+                            ("end_year", django.db.models.expressions.F("start_year")),
+                            models.Q(("end_year__isnull", True), ("start_year__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_month", django.db.models.expressions.F("start_month")),
+                            models.Q(("end_month__isnull", True), ("start_month__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_day", django.db.models.expressions.F("start_day")),
+                            models.Q(("end_day__isnull", True), ("start_day__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_time", django.db.models.expressions.F("start_time")),
+                            models.Q(("end_time__isnull", True), ("start_time__isnull", True)),
+                            _connector="OR",
+                        ),
+                    ),
+                    _connector="OR",
+                ),
+                name="worlds_character_instant_end",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="character",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("end_key__isnull", True),
+                    ("end_key__gte", django.db.models.expressions.F("start_key")),
+                    _connector="OR",
+                ),
+                name="worlds_character_end_after_start",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="characterrelationship",
+            constraint=models.CheckConstraint(
+                check=models.Q(time_type__in=("span", "instant")), name="worlds_characterrelationship_time_type"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="characterrelationship",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_month__isnull", True),
+                        models.Q(("start_month__gte", 1), ("start_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_month__isnull", True),
+                        models.Q(("end_month__gte", 1), ("end_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                ),
+                name="worlds_characterrelationship_months",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="characterrelationship",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_day__isnull", True),
+                        models.Q(("start_day__gte", 1), ("start_day__lte", 31)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_day__isnull", True), models.Q(("end_day__gte", 1), ("end_day__lte", 31)), _connector="OR"
+                    ),
+                ),
+                name="worlds_characterrelationship_days",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="characterrelationship",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("start_month__isnull", True), ("start_year__isnull", False), _connector="OR"),
+                    models.Q(("start_day__isnull", True), ("start_month__isnull", False), _connector="OR"),
+                    models.Q(("start_time__isnull", True), ("start_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_characterrelationship_start_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="characterrelationship",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("end_month__isnull", True), ("end_year__isnull", False), _connector="OR"),
+                    models.Q(("end_day__isnull", True), ("end_month__isnull", False), _connector="OR"),
+                    models.Q(("end_time__isnull", True), ("end_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_characterrelationship_end_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="characterrelationship",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("time_type", "span"),
+                    models.Q(
+                        models.Q(
+                            ("end_year", django.db.models.expressions.F("start_year")),
+                            models.Q(("end_year__isnull", True), ("start_year__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_month", django.db.models.expressions.F("start_month")),
+                            models.Q(("end_month__isnull", True), ("start_month__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_day", django.db.models.expressions.F("start_day")),
+                            models.Q(("end_day__isnull", True), ("start_day__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_time", django.db.models.expressions.F("start_time")),
+                            models.Q(("end_time__isnull", True), ("start_time__isnull", True)),
+                            _connector="OR",
+                        ),
+                    ),
+                    _connector="OR",
+                ),
+                name="worlds_characterrelationship_instant_end",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="characterrelationship",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("end_key__isnull", True),
+                    ("end_key__gte", django.db.models.expressions.F("start_key")),
+                    _connector="OR",
+                ),
+                name="worlds_characterrelationship_end_after_start",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="event",
+            constraint=models.CheckConstraint(
+                check=models.Q(time_type__in=("span", "instant")), name="worlds_event_time_type"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="event",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_month__isnull", True),
+                        models.Q(("start_month__gte", 1), ("start_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_month__isnull", True),
+                        models.Q(("end_month__gte", 1), ("end_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                ),
+                name="worlds_event_months",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="event",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_day__isnull", True),
+                        models.Q(("start_day__gte", 1), ("start_day__lte", 31)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_day__isnull", True), models.Q(("end_day__gte", 1), ("end_day__lte", 31)), _connector="OR"
+                    ),
+                ),
+                name="worlds_event_days",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="event",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("start_month__isnull", True), ("start_year__isnull", False), _connector="OR"),
+                    models.Q(("start_day__isnull", True), ("start_month__isnull", False), _connector="OR"),
+                    models.Q(("start_time__isnull", True), ("start_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_event_start_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="event",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("end_month__isnull", True), ("end_year__isnull", False), _connector="OR"),
+                    models.Q(("end_day__isnull", True), ("end_month__isnull", False), _connector="OR"),
+                    models.Q(("end_time__isnull", True), ("end_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_event_end_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="event",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("time_type", "span"),
+                    models.Q(
+                        models.Q(
+                            ("end_year", django.db.models.expressions.F("start_year")),
+                            models.Q(("end_year__isnull", True), ("start_year__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_month", django.db.models.expressions.F("start_month")),
+                            models.Q(("end_month__isnull", True), ("start_month__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_day", django.db.models.expressions.F("start_day")),
+                            models.Q(("end_day__isnull", True), ("start_day__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_time", django.db.models.expressions.F("start_time")),
+                            models.Q(("end_time__isnull", True), ("start_time__isnull", True)),
+                            _connector="OR",
+                        ),
+                    ),
+                    _connector="OR",
+                ),
+                name="worlds_event_instant_end",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="event",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("end_key__isnull", True),
+                    ("end_key__gte", django.db.models.expressions.F("start_key")),
+                    _connector="OR",
+                ),
+                name="worlds_event_end_after_start",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="eventparticipation",
+            constraint=models.CheckConstraint(
+                check=models.Q(time_type__in=("span", "instant")), name="worlds_eventparticipation_time_type"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="eventparticipation",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_month__isnull", True),
+                        models.Q(("start_month__gte", 1), ("start_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_month__isnull", True),
+                        models.Q(("end_month__gte", 1), ("end_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                ),
+                name="worlds_eventparticipation_months",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="eventparticipation",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_day__isnull", True),
+                        models.Q(("start_day__gte", 1), ("start_day__lte", 31)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_day__isnull", True), models.Q(("end_day__gte", 1), ("end_day__lte", 31)), _connector="OR"
+                    ),
+                ),
+                name="worlds_eventparticipation_days",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="eventparticipation",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("start_month__isnull", True), ("start_year__isnull", False), _connector="OR"),
+                    models.Q(("start_day__isnull", True), ("start_month__isnull", False), _connector="OR"),
+                    models.Q(("start_time__isnull", True), ("start_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_eventparticipation_start_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="eventparticipation",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("end_month__isnull", True), ("end_year__isnull", False), _connector="OR"),
+                    models.Q(("end_day__isnull", True), ("end_month__isnull", False), _connector="OR"),
+                    models.Q(("end_time__isnull", True), ("end_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_eventparticipation_end_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="eventparticipation",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("time_type", "span"),
+                    models.Q(
+                        models.Q(
+                            ("end_year", django.db.models.expressions.F("start_year")),
+                            models.Q(("end_year__isnull", True), ("start_year__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_month", django.db.models.expressions.F("start_month")),
+                            models.Q(("end_month__isnull", True), ("start_month__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_day", django.db.models.expressions.F("start_day")),
+                            models.Q(("end_day__isnull", True), ("start_day__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_time", django.db.models.expressions.F("start_time")),
+                            models.Q(("end_time__isnull", True), ("start_time__isnull", True)),
+                            _connector="OR",
+                        ),
+                    ),
+                    _connector="OR",
+                ),
+                name="worlds_eventparticipation_instant_end",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="eventparticipation",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("end_key__isnull", True),
+                    ("end_key__gte", django.db.models.expressions.F("start_key")),
+                    _connector="OR",
+                ),
+                name="worlds_eventparticipation_end_after_start",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="honor",
+            constraint=models.CheckConstraint(
+                check=models.Q(time_type__in=("span", "instant")), name="worlds_honor_time_type"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="honor",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_month__isnull", True),
+                        models.Q(("start_month__gte", 1), ("start_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_month__isnull", True),
+                        models.Q(("end_month__gte", 1), ("end_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                ),
+                name="worlds_honor_months",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="honor",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_day__isnull", True),
+                        models.Q(("start_day__gte", 1), ("start_day__lte", 31)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_day__isnull", True), models.Q(("end_day__gte", 1), ("end_day__lte", 31)), _connector="OR"
+                    ),
+                ),
+                name="worlds_honor_days",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="honor",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("start_month__isnull", True), ("start_year__isnull", False), _connector="OR"),
+                    models.Q(("start_day__isnull", True), ("start_month__isnull", False), _connector="OR"),
+                    models.Q(("start_time__isnull", True), ("start_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_honor_start_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="honor",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("end_month__isnull", True), ("end_year__isnull", False), _connector="OR"),
+                    models.Q(("end_day__isnull", True), ("end_month__isnull", False), _connector="OR"),
+                    models.Q(("end_time__isnull", True), ("end_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_honor_end_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="honor",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("time_type", "span"),
+                    models.Q(
+                        models.Q(
+                            ("end_year", django.db.models.expressions.F("start_year")),
+                            models.Q(("end_year__isnull", True), ("start_year__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_month", django.db.models.expressions.F("start_month")),
+                            models.Q(("end_month__isnull", True), ("start_month__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_day", django.db.models.expressions.F("start_day")),
+                            models.Q(("end_day__isnull", True), ("start_day__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_time", django.db.models.expressions.F("start_time")),
+                            models.Q(("end_time__isnull", True), ("start_time__isnull", True)),
+                            _connector="OR",
+                        ),
+                    ),
+                    _connector="OR",
+                ),
+                name="worlds_honor_instant_end",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="honor",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("end_key__isnull", True),
+                    ("end_key__gte", django.db.models.expressions.F("start_key")),
+                    _connector="OR",
+                ),
+                name="worlds_honor_end_after_start",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="organization",
+            constraint=models.CheckConstraint(
+                check=models.Q(time_type__in=("span", "instant")), name="worlds_organization_time_type"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="organization",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_month__isnull", True),
+                        models.Q(("start_month__gte", 1), ("start_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_month__isnull", True),
+                        models.Q(("end_month__gte", 1), ("end_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                ),
+                name="worlds_organization_months",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="organization",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_day__isnull", True),
+                        models.Q(("start_day__gte", 1), ("start_day__lte", 31)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_day__isnull", True), models.Q(("end_day__gte", 1), ("end_day__lte", 31)), _connector="OR"
+                    ),
+                ),
+                name="worlds_organization_days",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="organization",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("start_month__isnull", True), ("start_year__isnull", False), _connector="OR"),
+                    models.Q(("start_day__isnull", True), ("start_month__isnull", False), _connector="OR"),
+                    models.Q(("start_time__isnull", True), ("start_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_organization_start_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="organization",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("end_month__isnull", True), ("end_year__isnull", False), _connector="OR"),
+                    models.Q(("end_day__isnull", True), ("end_month__isnull", False), _connector="OR"),
+                    models.Q(("end_time__isnull", True), ("end_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_organization_end_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="organization",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("time_type", "span"),
+                    models.Q(
+                        models.Q(
+                            ("end_year", django.db.models.expressions.F("start_year")),
+                            models.Q(("end_year__isnull", True), ("start_year__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_month", django.db.models.expressions.F("start_month")),
+                            models.Q(("end_month__isnull", True), ("start_month__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_day", django.db.models.expressions.F("start_day")),
+                            models.Q(("end_day__isnull", True), ("start_day__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_time", django.db.models.expressions.F("start_time")),
+                            models.Q(("end_time__isnull", True), ("start_time__isnull", True)),
+                            _connector="OR",
+                        ),
+                    ),
+                    _connector="OR",
+                ),
+                name="worlds_organization_instant_end",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="organization",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("end_key__isnull", True),
+                    ("end_key__gte", django.db.models.expressions.F("start_key")),
+                    _connector="OR",
+                ),
+                name="worlds_organization_end_after_start",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="title",
+            constraint=models.CheckConstraint(
+                check=models.Q(time_type__in=("span", "instant")), name="worlds_title_time_type"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="title",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_month__isnull", True),
+                        models.Q(("start_month__gte", 1), ("start_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_month__isnull", True),
+                        models.Q(("end_month__gte", 1), ("end_month__lte", 12)),
+                        _connector="OR",
+                    ),
+                ),
+                name="worlds_title_months",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="title",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("start_day__isnull", True),
+                        models.Q(("start_day__gte", 1), ("start_day__lte", 31)),
+                        _connector="OR",
+                    ),
+                    models.Q(
+                        ("end_day__isnull", True), models.Q(("end_day__gte", 1), ("end_day__lte", 31)), _connector="OR"
+                    ),
+                ),
+                name="worlds_title_days",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="title",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("start_month__isnull", True), ("start_year__isnull", False), _connector="OR"),
+                    models.Q(("start_day__isnull", True), ("start_month__isnull", False), _connector="OR"),
+                    models.Q(("start_time__isnull", True), ("start_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_title_start_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="title",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(("end_month__isnull", True), ("end_year__isnull", False), _connector="OR"),
+                    models.Q(("end_day__isnull", True), ("end_month__isnull", False), _connector="OR"),
+                    models.Q(("end_time__isnull", True), ("end_day__isnull", False), _connector="OR"),
+                ),
+                name="worlds_title_end_precision",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="title",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("time_type", "span"),
+                    models.Q(
+                        models.Q(
+                            ("end_year", django.db.models.expressions.F("start_year")),
+                            models.Q(("end_year__isnull", True), ("start_year__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_month", django.db.models.expressions.F("start_month")),
+                            models.Q(("end_month__isnull", True), ("start_month__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_day", django.db.models.expressions.F("start_day")),
+                            models.Q(("end_day__isnull", True), ("start_day__isnull", True)),
+                            _connector="OR",
+                        ),
+                        models.Q(
+                            ("end_time", django.db.models.expressions.F("start_time")),
+                            models.Q(("end_time__isnull", True), ("start_time__isnull", True)),
+                            _connector="OR",
+                        ),
+                    ),
+                    _connector="OR",
+                ),
+                name="worlds_title_instant_end",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="title",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("end_key__isnull", True),
+                    ("end_key__gte", django.db.models.expressions.F("start_key")),
+                    _connector="OR",
+                ),
+                name="worlds_title_end_after_start",
+            ),
+        ),
+    ]
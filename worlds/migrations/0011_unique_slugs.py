@@ -0,0 +1,83 @@
+# Generated by Django 2.2.18 on 2026-10-17 02:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+SLUGGED_MODELS = ("Character", "Event", "Organization", "Place", "Setting", "World")
+
+
+def deduplicate_slugs(apps, schema_editor):
+    """Give every object but the first of a repeated slug a new one, suffixed with its pk."""
+    for name in SLUGGED_MODELS:
+        model = apps.get_model("worlds", name)
+        scope = () if name == "World" else ("world",)
+        repeated = model.objects.values(*scope, "slug").annotate(count=Count("pk")).filter(count__gt=1).order_by()
+        for group in repeated:
+            group.pop("count")
+            for obj in model.objects.filter(**group).order_by("pk")[1:]:
+                suffix = "-%d" % obj.pk
+                slug = obj.slug[: 255 - len(suffix)] + suffix
+                while model.objects.filter(**dict(group, slug=slug)).exists():
+                    slug = slug[: 255 - len(suffix)] + suffix
+                model.objects.filter(pk=obj.pk).update(slug=slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("worlds", "0010_temporal_constraints"),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="character",
+            name="slug",
+            field=models.SlugField(db_index=False, max_length=255, verbose_name="slug"),
+        ),
+        migrations.AlterField(
+            model_name="event",
+            name="slug",
+            field=models.SlugField(db_index=False, max_length=255, verbose_name="slug"),
+        ),
+        migrations.AlterField(
+            model_name="organization",
+            name="slug",
+            field=models.SlugField(db_index=False, max_length=255, verbose_name="slug"),
+        ),
+        migrations.AlterField(
+            model_name="place",
+            name="slug",
+            field=models.SlugField(db_index=False, max_length=255, verbose_name="slug"),
+        ),
+        migrations.AlterField(
+            model_name="setting",
+            name="slug",
+            field=models.SlugField(db_index=False, max_length=255, verbose_name="slug"),
+        ),
+        migrations.AlterField(
+            model_name="world",
+            name="slug",
+            field=models.SlugField(max_length=255, unique=True, verbose_name="slug"),
+        ),
+        migrations.AddConstraint(
+            model_name="character",
+            constraint=models.UniqueConstraint(fields=("world", "slug"), name="worlds_character_unique_slug"),
+        ),
+        migrations.AddConstraint(
+            model_name="event",
+            constraint=models.UniqueConstraint(fields=("world", "slug"), name="worlds_event_unique_slug"),
+        ),
+        migrations.AddConstraint(
+            model_name="organization",
+            constraint=models.UniqueConstraint(fields=("world", "slug"), name="worlds_organization_unique_slug"),
+        ),
+        migrations.AddConstraint(
+            model_name="place",
+            constraint=models.UniqueConstraint(fields=("world", "slug"), name="worlds_place_unique_slug"),
+        ),
+        migrations.AddConstraint(
+            model_name="setting",
+            constraint=models.UniqueConstraint(fields=("world", "slug"), name="worlds_setting_unique_slug"),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+from worlds.chronology import OPEN_END
+
+TEMPORAL_MODELS = (
+    "Character",
+    "CharacterRelationship",
+    "Event",
+    "EventParticipation",
+    "Honor",
+    "Organization",
+    "Title",
+)
+
+
+def open_unknown_ends(apps, schema_editor):
+    """Spans with an unknown end used to close at the end of their start date."""
+    for name in TEMPORAL_MODELS:
+        model = apps.get_model("worlds", name)
+        model.objects.filter(time_type="span", start_year__isnull=False, end_year__isnull=True).update(
+            end_key=OPEN_END
+        )
+
+
+def close_unknown_ends(apps, schema_editor):
+    for name in TEMPORAL_MODELS:
+        model = apps.get_model("worlds", name)
+        model.objects.filter(time_type="span", start_year__isnull=False, end_year__isnull=True).update(
+            end_key=models.F("start_latest")
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("worlds", "0011_unique_slugs"),
+    ]
+
+    operations = [
+        migrations.RunPython(open_unknown_ends, close_unknown_ends),
+    ]
@@ -1,19 +1,126 @@
+import math
+
 from django.contrib.gis.db import models as geomodels
-from django.db import models
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.contrib.gis.measure import D
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import connection, connections, models, transaction
+from django.db.models import DEFERRED, F, Q
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
 from taggit.managers import TaggableManager
 
+from . import caching
+from .chronology import TIME_TYPES, date_bounds, lower_bound, normalize_dates, upper_bound
+
+TEMPORAL_START_FIELDS = ("start_year", "start_month", "start_day", "start_time")
+TEMPORAL_END_FIELDS = ("end_year", "end_month", "end_day", "end_time")
+TEMPORAL_FIELDS = ("time_type",) + TEMPORAL_START_FIELDS + TEMPORAL_END_FIELDS
+MONTH_VALIDATORS = [MinValueValidator(1), MaxValueValidator(12)]
+DAY_VALIDATORS = [MinValueValidator(1), MaxValueValidator(31)]
+SORT_KEY_FIELDS = ("start_key", "start_latest", "end_earliest", "end_key")
+
 
 # ------------------------------------------------------------------------------
 # Start by defining the handful of models that practically everything will use.
 # ------------------------------------------------------------------------------
+class TemporalQuerySet(models.QuerySet):
+    """Timeline queries served by the packed start_key/end_key columns.
+
+    Dates passed in may be a year, a (year, month, day, time) tuple or a date.
+    Partial dates cover their whole range, so ``overlapping(1200, 1250)`` means
+    from the start of 1200 through the end of 1250.
+    """
+
+    def overlapping(self, start, end=None, certain=False):
+        """Rows whose span touches the window from start through end (inclusive).
+
+        By default rows that may touch it, given their uncertain dates; with
+        certain, only rows that touch it whatever their unknown components are.
+        """
+        if end is None:
+            end = start
+        if certain:
+            return self.filter(start_latest__lte=upper_bound(end), end_earliest__gte=lower_bound(start))
+        return self.filter(start_key__lte=upper_bound(end), end_key__gte=lower_bound(start))
+
+    def before(self, when):
+        """Rows that ended before when began."""
+        return self.filter(end_key__lt=lower_bound(when))
+
+    def after(self, when):
+        """Rows that began after when ended."""
+        return self.filter(start_key__gt=upper_bound(when))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create bypasses save(), so keep the sort keys in sync here.
+        objs = list(objs)
+        for obj in objs:
+            obj.set_sort_keys()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if set(fields) & set(TEMPORAL_FIELDS):
+            for obj in objs:
+                obj.set_sort_keys()
+            fields += [f for f in SORT_KEY_FIELDS if f not in fields]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        if not set(kwargs) & set(TEMPORAL_FIELDS):
+            return super().update(**kwargs)
+        # The filter may no longer match once dates change, so capture the rows first.
+        pks = list(self.values_list("pk", flat=True))
+        if any(hasattr(value, "resolve_expression") for value in kwargs.values()):
+            # Expressions can only be evaluated by the database; normalize afterwards.
+            rows = super().update(**kwargs)
+            for i in range(0, len(pks), 500):
+                self.model._default_manager.filter(pk__in=pks[i : i + 500]).refresh_sort_keys()
+            return rows
+        # Apply the new values in Python, so rows are normalized before the
+        # database checks its constraints.
+        others = {field: value for field, value in kwargs.items() if field not in TEMPORAL_FIELDS}
+        for i in range(0, len(pks), 500):
+            objs = list(self.model._default_manager.filter(pk__in=pks[i : i + 500]).only(*TEMPORAL_FIELDS))
+            for obj in objs:
+                for field, value in kwargs.items():
+                    setattr(obj, field, value)
+            self.bulk_update(objs, TEMPORAL_FIELDS)
+            if others:
+                self.model._default_manager.filter(pk__in=pks[i : i + 500]).update(**others)
+        return len(pks)
+
+    update.alters_data = True
+
+    def refresh_sort_keys(self, batch_size=1000):
+        """Recompute the stored date bounds from the date columns for every row."""
+        rows = self.order_by("pk").values_list("pk", *TEMPORAL_FIELDS, *SORT_KEY_FIELDS)
+        last_pk = None
+        while True:
+            batch = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            changed = []
+            for values in batch:
+                keys = date_bounds(values[1], values[2:6], values[6:10])
+                if keys != tuple(values[-len(SORT_KEY_FIELDS) :]):
+                    changed.append(self.model(pk=values[0], **dict(zip(SORT_KEY_FIELDS, keys))))
+            if changed:
+                self.bulk_update(changed, SORT_KEY_FIELDS)
+
+    refresh_sort_keys.alters_data = True
+
+
 class Temporal(models.Model):
     """Temporal is an abstract base class for things that can be placed on a timeline.
     """
 
-    # An Instant will have only a start date. Spans have a start and end.
+    # An Instant will have only a start date, mirrored into its end. Spans have a start and end.
     time_type = models.TextField(_("Time type"), choices=(("span", "Span"), ("instant", "Instant")), default="span")
 
     # NOTE: Timeline.js breaks time down into separate hr, min, sec, ms fields.
@@ -21,32 +128,94 @@ class Temporal(models.Model):
     # Date fields are broken out to make it easier to enter e.g. just a year.
     # Dates are optional. Missing dates are treated as "unknown".
     start_year = models.IntegerField(_("start year"), blank=True, null=True)
-    start_month = models.IntegerField(_("start month"), blank=True, null=True)
-    start_day = models.IntegerField(_("start day"), blank=True, null=True)
+    start_month = models.IntegerField(_("start month"), blank=True, null=True, validators=MONTH_VALIDATORS)
+    start_day = models.IntegerField(_("start day"), blank=True, null=True, validators=DAY_VALIDATORS)
     start_time = models.TimeField(_("start time"), auto_now=False, auto_now_add=False, blank=True, null=True)
 
     end_year = models.IntegerField(_("end year"), blank=True, null=True)
-    end_month = models.IntegerField(_("end month"), blank=True, null=True)
-    end_day = models.IntegerField(_("end day"), blank=True, null=True)
+    end_month = models.IntegerField(_("end month"), blank=True, null=True, validators=MONTH_VALIDATORS)
+    end_day = models.IntegerField(_("end day"), blank=True, null=True, validators=DAY_VALIDATORS)
     end_time = models.TimeField(_("end time"), auto_now=False, auto_now_add=False, blank=True, null=True)
 
+    # Denormalized, sortable packing of the date fields above (see worlds.chronology).
+    # start_key and start_latest are the earliest and latest moments the start could
+    # be, end_earliest and end_key those of the end; end_key is chronology.OPEN_END
+    # when the end is unknown. All are null when the start year is unknown.
+    start_key = models.BigIntegerField(_("start key"), blank=True, null=True, editable=False)
+    start_latest = models.BigIntegerField(_("start latest"), blank=True, null=True, editable=False)
+    end_earliest = models.BigIntegerField(_("end earliest"), blank=True, null=True, editable=False)
+    end_key = models.BigIntegerField(_("end key"), blank=True, null=True, editable=False)
+
+    objects = TemporalQuerySet.as_manager()
+
+    # Lookup path from a row to its World, for world-scoped queries on any Temporal model.
+    world_path = "world"
+
     class Meta:
         abstract = True
-        indexes = [
-            models.Index(fields=["start_year", "start_month", "start_day", "start_time"]),
-            models.Index(fields=["end_year", "end_month", "end_day", "end_time"]),
-        ]
+        indexes = [models.Index(fields=["start_key", "end_key"]), models.Index(fields=["end_key"])]
         # Ordering does not accept index names, only column names
-        ordering = [
-            "start_year",
-            "start_month",
-            "start_day",
-            "start_time",
-            "end_year",
-            "end_month",
-            "end_day",
-            "end_time",
-        ]
+        ordering = ["start_key", "end_key"]
+
+    def set_sort_keys(self):
+        """Normalize the date fields (see chronology.normalize_dates) and recompute the stored bounds."""
+        for field, value in normalize_dates({f: getattr(self, f) for f in TEMPORAL_FIELDS}).items():
+            setattr(self, field, value)
+        bounds = date_bounds(
+            self.time_type,
+            [getattr(self, f) for f in TEMPORAL_START_FIELDS],
+            [getattr(self, f) for f in TEMPORAL_END_FIELDS],
+        )
+        for field, value in zip(SORT_KEY_FIELDS, bounds):
+            setattr(self, field, value)
+
+    def clean(self):
+        super().clean()
+        self.set_sort_keys()
+        if self.end_key is not None and self.end_key < self.start_key:
+            raise ValidationError(_("The end date cannot be before the start date."))
+
+    def save(self, *args, **kwargs):
+        self.set_sort_keys()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and set(update_fields) & set(TEMPORAL_FIELDS):
+            kwargs["update_fields"] = set(update_fields) | set(TEMPORAL_FIELDS) | set(SORT_KEY_FIELDS)
+        super().save(*args, **kwargs)
+
+
+def temporal_constraints(prefix):
+    """Database checks keeping a concrete Temporal model's date fields well formed.
+
+    Constraint names must be unique per database and Django 2.2 cannot derive
+    them from the model on an abstract base, so each model passes a prefix.
+    """
+
+    def precision(side):
+        year, month, day, time = ("%s_%s" % (side, part) for part in ("year", "month", "day", "time"))
+        return (
+            (Q(**{month + "__isnull": True}) | Q(**{year + "__isnull": False}))
+            & (Q(**{day + "__isnull": True}) | Q(**{month + "__isnull": False}))
+            & (Q(**{time + "__isnull": True}) | Q(**{day + "__isnull": False}))
+        )
+
+    def in_range(field, high):
+        return Q(**{field + "__isnull": True}) | Q(**{field + "__gte": 1, field + "__lte": high})
+
+    def mirrored(part):
+        start, end = "start_" + part, "end_" + part
+        return Q(**{end: F(start)}) | Q(**{start + "__isnull": True, end + "__isnull": True})
+
+    checks = {
+        "time_type": Q(time_type__in=TIME_TYPES),
+        "months": in_range("start_month", 12) & in_range("end_month", 12),
+        "days": in_range("start_day", 31) & in_range("end_day", 31),
+        "start_precision": precision("start"),
+        "end_precision": precision("end"),
+        "instant_end": Q(time_type="span")
+        | (mirrored("year") & mirrored("month") & mirrored("day") & mirrored("time")),
+        "end_after_start": Q(end_key__isnull=True) | Q(end_key__gte=F("start_key")),
+    }
+    return [models.CheckConstraint(check=check, name="%s_%s" % (prefix, name)) for name, check in checks.items()]
 
 
 class Reference(models.Model):
@@ -72,7 +241,7 @@ class World(models.Model):
     """
 
     name = models.CharField(_("name"), max_length=255)
-    slug = models.SlugField(_("slug"), max_length=255)
+    slug = models.SlugField(_("slug"), max_length=255, unique=True)
 
     class Meta:
         verbose_name = _("world")
@@ -85,19 +254,68 @@ class World(models.Model):
         return reverse("world_detail", kwargs={"slug": self.slug})
 
 
+class PlaceQuerySet(models.QuerySet):
+    """Map queries on Places, prefiltered through the spatial index.
+
+    Coordinates are WGS84 longitude/latitude. A Place matches through either its
+    point_location or its geo_detail.
+    """
+
+    GEOMETRY_FIELDS = ("point_location", "geo_detail")
+    METERS_PER_DEGREE = 111320.0
+
+    def in_bbox(self, xmin, ymin, xmax, ymax):
+        """Places whose geometry's bounding box overlaps the given box."""
+        if getattr(connections[self.db].ops, "spatialite", False):
+            # SpatiaLite only consults its R*Tree when queried through the SpatialIndex table.
+            table = self.model._meta.db_table
+            lookup = (
+                "SELECT ROWID FROM SpatialIndex WHERE f_table_name = %s AND f_geometry_column = %s "
+                "AND search_frame = BuildMbr(%s, %s, %s, %s, 4326)"
+            )
+            where = " OR ".join('"%s"."id" IN (%s)' % (table, lookup) for _ in self.GEOMETRY_FIELDS)
+            params = []
+            for field in self.GEOMETRY_FIELDS:
+                params += [table, field, xmin, ymin, xmax, ymax]
+            return self.extra(where=["(%s)" % where], params=params)
+        box = Polygon.from_bbox((xmin, ymin, xmax, ymax))
+        box.srid = 4326
+        return self.filter(models.Q(point_location__bboverlaps=box) | models.Q(geo_detail__bboverlaps=box))
+
+    def within_radius(self, point, meters):
+        """Places whose point_location lies within meters of point."""
+        lat_span = meters / self.METERS_PER_DEGREE
+        lon_span = min(180.0, lat_span / max(math.cos(math.radians(point.y)), 1e-6))
+        candidates = self.in_bbox(point.x - lon_span, point.y - lat_span, point.x + lon_span, point.y + lat_span)
+        return candidates.filter(point_location__distance_lte=(point, D(m=meters)))
+
+    def intersecting(self, geometry):
+        """Places whose point or detailed geography intersects geometry."""
+        candidates = self.in_bbox(*geometry.extent)
+        return candidates.filter(
+            models.Q(point_location__intersects=geometry) | models.Q(geo_detail__intersects=geometry)
+        )
+
+
 # TODO Add geographic framework
 class Place(geomodels.Model):
 
     world = models.ForeignKey("worlds.world", on_delete=models.CASCADE)
     name = models.CharField(_("name"), max_length=255)
-    slug = models.SlugField(_("slug"), max_length=255)
+    # Indexed by the (world, slug) unique constraint.
+    slug = models.SlugField(_("slug"), max_length=255, db_index=False)
     notes = models.TextField(_("notes"), blank=True, null=True)
     tags = TaggableManager(blank=True)
 
     point_location = geomodels.PointField(_("point location"), blank=True, null=True)
     geo_detail = geomodels.MultiPolygonField(_("detailed geography"), blank=True, null=True)
+    # Set when geo_detail changes; the simplify_places command regenerates the outlines.
+    outlines_stale = models.BooleanField(_("outlines stale"), default=False, editable=False)
+
+    objects = PlaceQuerySet.as_manager()
 
     class Meta:
+        constraints = [models.UniqueConstraint(fields=["world", "slug"], name="worlds_place_unique_slug")]
         verbose_name = _("place")
         verbose_name_plural = _("places")
 
@@ -107,16 +325,106 @@ class Place(geomodels.Model):
     def get_absolute_url(self):
         return reverse("place_detail", kwargs={"slug": self.slug})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored geography, so saves can tell whether the outlines need regenerating.
+        instance._stored_geo_detail = instance.__dict__.get("geo_detail", DEFERRED)
+        return instance
+
+    def save(self, *args, **kwargs):
+        if "geo_detail" in self.__dict__:
+            stored = getattr(self, "_stored_geo_detail", None)
+            if stored is DEFERRED or self.geo_detail != stored:
+                self.outlines_stale = True
+                self._stored_geo_detail = self.geo_detail
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "geo_detail" in update_fields:
+            kwargs["update_fields"] = set(update_fields) | {"outlines_stale"}
+        super().save(*args, **kwargs)
+
+
+class PlaceOutlineQuerySet(models.QuerySet):
+    def regenerate(self, places, batch_size=100):
+        """Recompute the outlines of the given Place queryset, batch_size places per transaction.
+
+        Returns the number of places processed.
+        """
+        rows = places.order_by("pk").values_list("pk", "geo_detail", "world")
+        last_pk = 0
+        count = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return count
+            last_pk = batch[-1][0]
+            count += len(batch)
+            outlines = [
+                self.model(place_id=pk, level=level, tolerance=tol, **self.model.simplify(geometry, tol))
+                for pk, geometry, _ in batch
+                if geometry is not None
+                for level, tol in enumerate(self.model.TOLERANCES)
+            ]
+            with transaction.atomic():
+                pks = [pk for pk, _, _ in batch]
+                self.filter(place__in=pks).delete()
+                self.bulk_create(outlines)
+                Place.objects.filter(pk__in=pks).update(outlines_stale=False)
+            for world_id in {world_id for _, _, world_id in batch}:
+                caching.bump_on_commit(world_id)
+
+    regenerate.alters_data = True
+
+
+class PlaceOutline(geomodels.Model):
+    """A simplified copy of a Place's detailed geography, at one level of detail.
+
+    Maps pick the coarsest level that still looks exact at their zoom, rather than
+    shipping every vertex of a coastline.
+    """
+
+    # Simplification tolerance of each level, in degrees. Level 0 is the coarsest.
+    TOLERANCES = (0.1, 0.01, 0.001, 0.0001)
+
+    place = models.ForeignKey("worlds.Place", on_delete=models.CASCADE, related_name="outlines")
+    level = models.PositiveSmallIntegerField(_("level"))
+    tolerance = models.FloatField(_("tolerance"))
+    geometry = geomodels.MultiPolygonField(_("geometry"), blank=True, null=True)
+    vertices = models.PositiveIntegerField(_("vertices"), default=0)
+
+    objects = PlaceOutlineQuerySet.as_manager()
+    world_path = "place__world"
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["place", "level"], name="worlds_placeoutline_level")]
+        verbose_name = _("place outline")
+        verbose_name_plural = _("place outlines")
+
+    def __str__(self):
+        return "%s (level %d)" % (self.place_id, self.level)
+
+    @staticmethod
+    def simplify(geometry, tolerance):
+        """Field values for geometry simplified to tolerance, kept a MultiPolygon."""
+        simple = geometry.simplify(tolerance, preserve_topology=True)
+        if simple.empty:
+            return {"geometry": None, "vertices": 0}
+        if simple.geom_type == "Polygon":
+            simple = MultiPolygon(simple, srid=simple.srid)
+        return {"geometry": simple, "vertices": simple.num_coords}
+
 
 class Setting(models.Model):
 
     world = models.ForeignKey("worlds.World", on_delete=models.CASCADE)
     name = models.CharField(_("name"), max_length=255)
-    slug = models.SlugField(_("slug"), max_length=255)
+    # Indexed by the (world, slug) unique constraint.
+    slug = models.SlugField(_("slug"), max_length=255, db_index=False)
     notes = models.TextField(_("notes"), blank=True, null=True)
     tags = TaggableManager(blank=True)
 
     class Meta:
+        constraints = [models.UniqueConstraint(fields=["world", "slug"], name="worlds_setting_unique_slug")]
         verbose_name = _("setting")
         verbose_name_plural = _("settings")
 
@@ -132,20 +440,42 @@ class Event(Temporal):
 
     world = models.ForeignKey("worlds.World", on_delete=models.CASCADE)
     name = models.CharField(_("name"), max_length=255)
-    slug = models.SlugField(_("slug"), max_length=255)
+    # Indexed by the (world, slug) unique constraint.
+    slug = models.SlugField(_("slug"), max_length=255, db_index=False)
     notes = models.TextField(_("notes"), blank=True, null=True)
     tags = TaggableManager(blank=True)
 
     participants = models.ManyToManyField("worlds.Character", through="worlds.EventParticipation", blank=True)
     place = models.ForeignKey("worlds.Place", on_delete=models.CASCADE, blank=True, null=True)
 
+    # start_key where the date is known, otherwise an estimate from the event's
+    # DateConstraints, or null without either (see worlds.dating).
+    estimated_key = models.BigIntegerField(_("estimated key"), blank=True, null=True, editable=False)
+    # Zoomed out timelines show only the most significant events (see worlds.significance).
+    significance = models.PositiveSmallIntegerField(_("significance"), default=0)
+
     class Meta(Temporal.Meta):
+        constraints = temporal_constraints("worlds_event") + [
+            models.UniqueConstraint(fields=["world", "slug"], name="worlds_event_unique_slug")
+        ]
+        indexes = Temporal.Meta.indexes + [
+            models.Index(fields=["world", "start_key", "end_key"]),
+            models.Index(fields=["world", "estimated_key"]),
+            models.Index(fields=["world", "significance"]),
+        ]
         verbose_name = _("event")
         verbose_name_plural = _("events")
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember where the event sat in the significance buckets, to update them when it moves.
+        instance._stored_bucket_entry = (instance.__dict__.get("start_key"), instance.__dict__.get("significance"))
+        return instance
+
     def get_absolute_url(self):
         return reverse("event_detail", kwargs={"pk": self.pk})
 
@@ -158,11 +488,16 @@ class Organization(Temporal):
 
     world = models.ForeignKey("worlds.World", on_delete=models.CASCADE)
     name = models.CharField(_("name"), max_length=255)
-    slug = models.SlugField(_("slug"), max_length=255)
+    # Indexed by the (world, slug) unique constraint.
+    slug = models.SlugField(_("slug"), max_length=255, db_index=False)
     notes = models.TextField(_("notes"), blank=True, null=True)
     tags = TaggableManager(blank=True)
 
     class Meta(Temporal.Meta):
+        constraints = temporal_constraints("worlds_organization") + [
+            models.UniqueConstraint(fields=["world", "slug"], name="worlds_organization_unique_slug")
+        ]
+        indexes = Temporal.Meta.indexes + [models.Index(fields=["world", "start_key", "end_key"])]
         verbose_name = _("organization")
         verbose_name_plural = _("organizations")
 
@@ -183,6 +518,8 @@ class FamilyTie(models.Model):
     child = models.ForeignKey("worlds.Character", on_delete=models.CASCADE, related_name="+")
     birth_order = models.IntegerField(_("birth order"), default=0)
 
+    world_path = "parent__world"
+
     class Meta:
         ordering = ("birth_order",)
         verbose_name = _("familytie")
@@ -191,11 +528,19 @@ class FamilyTie(models.Model):
     def __str__(self):
         return self.parent.name + " -> " + self.child.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored edge so the Lineage closure can tell when it moves.
+        instance._stored_edge = (instance.parent_id, instance.child_id)
+        return instance
+
 
 class Character(Temporal):
     world = models.ForeignKey("worlds.World", on_delete=models.CASCADE)
     name = models.CharField(_("name"), max_length=255)
-    slug = models.SlugField(_("slug"), max_length=255)
+    # Indexed by the (world, slug) unique constraint.
+    slug = models.SlugField(_("slug"), max_length=255, db_index=False)
     notes = models.TextField(_("notes"), blank=True, null=True)
     tags = TaggableManager(blank=True)
 
@@ -220,7 +565,11 @@ class Character(Temporal):
     # events through EventParticipation created from other side of relationship
 
     class Meta(Temporal.Meta):
+        constraints = temporal_constraints("worlds_character") + [
+            models.UniqueConstraint(fields=["world", "slug"], name="worlds_character_unique_slug")
+        ]
         ordering = ["name"]
+        indexes = Temporal.Meta.indexes + [models.Index(fields=["world", "start_key", "end_key"])]
         verbose_name = _("character")
         verbose_name_plural = _("characters")
 
@@ -230,6 +579,131 @@ class Character(Temporal):
     def get_absolute_url(self):
         return reverse("character_detail", kwargs={"slug": self.slug})
 
+    def ancestors(self, max_depth=None):
+        """Characters this one descends from, at most max_depth generations back."""
+        links = Lineage.objects.filter(descendant=self)
+        if max_depth is not None:
+            links = links.filter(depth__lte=max_depth)
+        return Character.objects.filter(pk__in=links.values("ancestor"))
+
+    def descendants(self, max_depth=None):
+        """Characters descending from this one, at most max_depth generations down."""
+        links = Lineage.objects.filter(ancestor=self)
+        if max_depth is not None:
+            links = links.filter(depth__lte=max_depth)
+        return Character.objects.filter(pk__in=links.values("descendant"))
+
+
+class LineageQuerySet(models.QuerySet):
+    """Maintenance of the FamilyTie closure, done in SQL so no tree is walked in Python."""
+
+    # Guards the recursive rebuild against cycles in bad data.
+    MAX_DEPTH = 1000
+
+    # The ancestors of a tie's parent and the descendants of its child, each with the
+    # depth and number of paths from its end of the tie; parameters: parent, parent, child, child.
+    TIE_ENDS = """
+            WITH up (ancestor, depth, paths) AS (
+                SELECT %s, 0, 1 UNION ALL SELECT ancestor_id, depth, paths FROM {table} WHERE descendant_id = %s
+            ), down (descendant, depth, paths) AS (
+                SELECT %s, 0, 1 UNION ALL SELECT descendant_id, depth, paths FROM {table} WHERE ancestor_id = %s
+            )
+    """
+
+    def _execute(self, sql, params):
+        table = self.model._meta.db_table
+        tie_table = FamilyTie._meta.db_table
+        char_table = Character._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(table=table, ties=tie_table, characters=char_table), params)
+
+    def add_tie(self, parent_id, child_id):
+        """Record every path through a new parent -> child tie."""
+        self._execute(
+            self.TIE_ENDS
+            + """
+            INSERT INTO {table} (ancestor_id, descendant_id, depth, paths)
+            SELECT up.ancestor, down.descendant, up.depth + down.depth + 1, SUM(up.paths * down.paths)
+            FROM up CROSS JOIN down WHERE 1 = 1
+            GROUP BY up.ancestor, down.descendant, up.depth + down.depth + 1
+            ON CONFLICT (ancestor_id, depth, descendant_id) DO UPDATE SET paths = {table}.paths + excluded.paths
+            """,
+            [parent_id, parent_id, child_id, child_id],
+        )
+
+    def remove_tie(self, parent_id, child_id):
+        """Forget every path through a parent -> child tie, keeping pairs still linked another way."""
+        self._execute(
+            self.TIE_ENDS
+            + """
+            UPDATE {table} SET paths = paths - COALESCE((
+                SELECT SUM(up.paths * down.paths) FROM up CROSS JOIN down
+                WHERE up.ancestor = {table}.ancestor_id AND down.descendant = {table}.descendant_id
+                AND up.depth + down.depth + 1 = {table}.depth
+            ), 0)
+            WHERE ancestor_id IN (SELECT ancestor FROM up) AND descendant_id IN (SELECT descendant FROM down)
+            """,
+            [parent_id, parent_id, child_id, child_id],
+        )
+        # Only pairs the update touched can have run out of paths; paths itself is not indexed.
+        self._execute(
+            self.TIE_ENDS
+            + """
+            DELETE FROM {table} WHERE paths <= 0
+            AND ancestor_id IN (SELECT ancestor FROM up) AND descendant_id IN (SELECT descendant FROM down)
+            """,
+            [parent_id, parent_id, child_id, child_id],
+        )
+
+    def rebuild(self, world):
+        """Recompute the closure of one world's family tree from scratch."""
+        world_id = getattr(world, "pk", world)
+        self.filter(descendant__world=world_id).delete()
+        self._execute(
+            """
+            WITH RECURSIVE ties (parent, child) AS (
+                SELECT t.parent_id, t.child_id FROM {ties} t
+                INNER JOIN {characters} c ON c.id = t.child_id WHERE c.world_id = %s
+            ), walk (ancestor, descendant, depth) AS (
+                SELECT parent, child, 1 FROM ties
+                UNION ALL
+                SELECT walk.ancestor, ties.child, walk.depth + 1 FROM walk
+                INNER JOIN ties ON ties.parent = walk.descendant WHERE walk.depth < %s
+            )
+            INSERT INTO {table} (ancestor_id, descendant_id, depth, paths)
+            SELECT ancestor, descendant, depth, COUNT(*) FROM walk GROUP BY ancestor, descendant, depth
+            """,
+            [world_id, self.MAX_DEPTH],
+        )
+
+    rebuild.alters_data = True
+
+
+class Lineage(models.Model):
+    """Lineage is the transitive closure of FamilyTie, one row per ancestor, descendant and depth.
+
+    It is maintained from FamilyTie saves and deletes (see worlds.signals), so family
+    trees of any depth are a single indexed query. Since a pair may be linked by more
+    than one route of the same depth, paths counts them; a row goes away only when
+    the last route through it does.
+    """
+
+    ancestor = models.ForeignKey("worlds.Character", on_delete=models.CASCADE, related_name="+")
+    descendant = models.ForeignKey("worlds.Character", on_delete=models.CASCADE, related_name="+")
+    depth = models.PositiveIntegerField(_("depth"))
+    paths = models.PositiveIntegerField(_("paths"), default=1)
+
+    objects = LineageQuerySet.as_manager()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["ancestor", "depth", "descendant"], name="worlds_lineage_path")]
+        indexes = [models.Index(fields=["descendant", "depth", "ancestor"])]
+        verbose_name = _("lineage")
+        verbose_name_plural = _("lineages")
+
+    def __str__(self):
+        return "%s -> %s (%d)" % (self.ancestor_id, self.descendant_id, self.depth)
+
 
 class Title(Temporal):
     """Title is a fief bestowed on a character."""
@@ -238,7 +712,10 @@ class Title(Temporal):
     place = models.ForeignKey("worlds.Place", on_delete=models.CASCADE)
     rank = models.CharField(_("rank"), max_length=50)
 
+    world_path = "character__world"
+
     class Meta(Temporal.Meta):
+        constraints = temporal_constraints("worlds_title")
         verbose_name = _("title")
         verbose_name_plural = _("titles")
 
@@ -254,7 +731,10 @@ class Honor(Temporal):
     character = models.ForeignKey("worlds.Character", on_delete=models.CASCADE)
     org = models.ForeignKey("worlds.Organization", related_name="members", on_delete=models.CASCADE)
 
+    world_path = "character__world"
+
     class Meta(Temporal.Meta):
+        constraints = temporal_constraints("worlds_honor")
         verbose_name = _("honor")
         verbose_name_plural = _("honors")
 
@@ -271,8 +751,13 @@ class EventParticipation(Temporal):
     character = models.ForeignKey("worlds.Character", on_delete=models.CASCADE)
     event = models.ForeignKey("worlds.Event", on_delete=models.CASCADE)
     role = models.CharField(_("role"), max_length=15, blank=True, default="participant")
+    # How much the event matters to this character, if different from the event's significance.
+    significance = models.PositiveSmallIntegerField(_("significance"), blank=True, null=True)
+
+    world_path = "character__world"
 
     class Meta(Temporal.Meta):
+        constraints = temporal_constraints("worlds_eventparticipation")
         verbose_name = _("event_participation")
         verbose_name_plural = _("event_participations")
 
@@ -290,6 +775,135 @@ class CharacterRelationship(Temporal):
     rel = models.CharField(_("relation"), max_length=50)
     rev = models.CharField(_("reverse relation"), max_length=50)
 
+    world_path = "from_char__world"
+
     class Meta(Temporal.Meta):
+        constraints = temporal_constraints("worlds_characterrelationship")
         verbose_name = _("characterrelationship")
         verbose_name_plural = _("characterrelationships")
+
+
+class SearchEntry(models.Model):
+    """SearchEntry holds the searchable text of one world entity: its name, notes and tags.
+
+    Entries are kept in sync from saves, deletes and tag changes (see worlds.signals)
+    and indexed by the database's full-text engine (see worlds.search).
+    """
+
+    world = models.ForeignKey("worlds.World", on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(_("kind"), max_length=20)
+    object_id = models.PositiveIntegerField(_("object id"))
+    name = models.TextField(_("name"))
+    body = models.TextField(_("body"), blank=True)
+    tags = models.TextField(_("tags"), blank=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["kind", "object_id"], name="worlds_searchentry_object")]
+        indexes = [models.Index(fields=["world", "kind"])]
+        verbose_name = _("search entry")
+        verbose_name_plural = _("search entries")
+
+    def __str__(self):
+        return "%s %d: %s" % (self.kind, self.object_id, self.name)
+
+
+class TagCount(models.Model):
+    """TagCount is the number of objects of one kind in a world carrying a tag.
+
+    Counts are kept up to date from tag changes and deletes (see worlds.signals),
+    so tag clouds and facets never have to scan taggit's tagged items.
+    """
+
+    world = models.ForeignKey("worlds.World", on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(_("kind"), max_length=20)
+    tag = models.ForeignKey("taggit.Tag", on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField(_("count"), default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["world", "kind", "tag"], name="worlds_tagcount_tag")]
+        indexes = [models.Index(fields=["world", "count"])]
+        verbose_name = _("tag count")
+        verbose_name_plural = _("tag counts")
+
+    def __str__(self):
+        return "%s %s: %d" % (self.kind, self.tag_id, self.count)
+
+
+class DateConstraint(models.Model):
+    """DateConstraint records what is known about an event's date when the date itself is not.
+
+    An event may start after or before another event, or around a year give or
+    take a margin. worlds.dating turns the constraints into Event.estimated_key.
+    """
+
+    AFTER = "after"
+    BEFORE = "before"
+    CIRCA = "circa"
+    KINDS = ((AFTER, _("after")), (BEFORE, _("before")), (CIRCA, _("circa")))
+
+    event = models.ForeignKey("worlds.Event", on_delete=models.CASCADE, related_name="date_constraints")
+    kind = models.CharField(_("kind"), max_length=10, choices=KINDS)
+    other = models.ForeignKey(
+        "worlds.Event",
+        on_delete=models.CASCADE,
+        related_name="+",
+        blank=True,
+        null=True,
+        verbose_name=_("other event"),
+    )
+    year = models.IntegerField(_("year"), blank=True, null=True)
+    margin = models.PositiveIntegerField(_("margin (years)"), default=0)
+
+    world_path = "event__world"
+
+    class Meta:
+        verbose_name = _("date constraint")
+        verbose_name_plural = _("date constraints")
+
+    def __str__(self):
+        if self.kind == self.CIRCA:
+            return "circa %s ± %d" % (self.year, self.margin)
+        return "%s %s" % (self.kind, self.other_id)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored events, so a save can re-solve the component they leave too.
+        instance._stored_events = (instance.event_id, instance.other_id)
+        return instance
+
+    def clean(self):
+        if self.kind == self.CIRCA:
+            if self.year is None:
+                raise ValidationError({"year": _("A circa constraint needs a year.")})
+        elif self.other_id is None:
+            raise ValidationError({"other": _("This constraint needs another event.")})
+        elif self.other_id == self.event_id:
+            raise ValidationError({"other": _("An event cannot be dated relative to itself.")})
+        elif self.event_id is not None and self.other.world_id != self.event.world_id:
+            raise ValidationError({"other": _("The other event must be in the same world.")})
+
+
+class EventBucket(models.Model):
+    """EventBucket ranks the most significant events of one span of time, at one zoom level.
+
+    Level 0 divides time into the widest spans. Only the top few events of each
+    span are kept (see worlds.significance), so a zoomed out timeline reads a
+    bounded number of rows however many events the world holds.
+    """
+
+    world = models.ForeignKey("worlds.World", on_delete=models.CASCADE, related_name="+")
+    level = models.PositiveSmallIntegerField(_("level"))
+    bucket = models.BigIntegerField(_("bucket"))
+    rank = models.PositiveSmallIntegerField(_("rank"))
+    event = models.ForeignKey("worlds.Event", on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["world", "level", "bucket", "rank"], name="worlds_eventbucket_rank")
+        ]
+        verbose_name = _("event bucket")
+        verbose_name_plural = _("event buckets")
+
+    def __str__(self):
+        return "%d/%d #%d: %s" % (self.level, self.bucket, self.rank, self.event_id)
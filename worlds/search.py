@@ -0,0 +1,232 @@
+"""World-scoped full-text search over names, notes and tags.
+
+Each searchable entity has one SearchEntry row. On SQLite (SpatiaLite) an FTS5
+external-content table mirrors the entries through triggers; on PostgreSQL
+(PostGIS) a GIN index covers the weighted tsvector of each entry. Other
+databases fall back to substring matching. Both engines rank names above tags
+above notes, and match every search word as a prefix.
+"""
+import re
+
+from django.apps import apps as global_apps
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_MODELS = ("place", "setting", "event", "organization", "character")
+BATCH_SIZE = 2000
+
+FTS_TABLE = "worlds_searchentry_fts"
+# bm25 weights of the name, body and tags columns.
+FTS_WEIGHTS = (10.0, 1.0, 5.0)
+
+PG_INDEX = "worlds_searchentry_vector"
+PG_VECTOR = (
+    "setweight(to_tsvector('simple', name), 'A')"
+    " || setweight(to_tsvector('simple', tags), 'B')"
+    " || setweight(to_tsvector('simple', body), 'C')"
+)
+
+CREATE_SQL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE {fts} USING fts5(name, body, tags, content='{table}', content_rowid='id')",
+        "CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN"
+        " INSERT INTO {fts}(rowid, name, body, tags) VALUES (new.id, new.name, new.body, new.tags); END",
+        "CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN"
+        " INSERT INTO {fts}({fts}, rowid, name, body, tags) VALUES ('delete', old.id, old.name, old.body, old.tags);"
+        " END",
+        "CREATE TRIGGER {fts}_update AFTER UPDATE ON {table} BEGIN"
+        " INSERT INTO {fts}({fts}, rowid, name, body, tags) VALUES ('delete', old.id, old.name, old.body, old.tags);"
+        " INSERT INTO {fts}(rowid, name, body, tags) VALUES (new.id, new.name, new.body, new.tags); END",
+        "INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ],
+    "postgresql": ["CREATE INDEX {index} ON {table} USING GIN (({vector}))"],
+}
+DROP_SQL = {
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS {fts}_insert",
+        "DROP TRIGGER IF EXISTS {fts}_delete",
+        "DROP TRIGGER IF EXISTS {fts}_update",
+        "DROP TABLE IF EXISTS {fts}",
+    ],
+    "postgresql": ["DROP INDEX IF EXISTS {index}"],
+}
+
+
+def _run(statements, apps, schema_editor):
+    table = apps.get_model("worlds", "SearchEntry")._meta.db_table
+    for sql in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql.format(fts=FTS_TABLE, table=table, index=PG_INDEX, vector=PG_VECTOR), params=None)
+
+
+def create_index(apps, schema_editor):
+    """Migration operation creating the database's full-text index over SearchEntry."""
+    _run(CREATE_SQL, apps, schema_editor)
+
+
+def drop_index(apps, schema_editor):
+    _run(DROP_SQL, apps, schema_editor)
+
+
+# ----------------------------------------------------------------------
+# Indexing
+# ----------------------------------------------------------------------
+def _tags_by_object(model, pks, apps):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    TaggedItem = apps.get_model("taggit", "TaggedItem")
+    content_type = ContentType.objects.filter(app_label="worlds", model=model._meta.model_name).first()
+    tags = {}
+    if content_type is not None:
+        rows = TaggedItem.objects.filter(content_type=content_type, object_id__in=pks).order_by("tag__name")
+        for object_id, name in rows.values_list("object_id", "tag__name"):
+            tags.setdefault(object_id, []).append(name)
+    return tags
+
+
+def _index_rows(model, rows, apps):
+    """Replace the entries of the (pk, world, name, notes) rows of model."""
+    SearchEntry = apps.get_model("worlds", "SearchEntry")
+    kind = model._meta.model_name
+    pks = [row[0] for row in rows]
+    tags = _tags_by_object(model, pks, apps)
+    SearchEntry.objects.filter(kind=kind, object_id__in=pks).delete()
+    SearchEntry.objects.bulk_create(
+        SearchEntry(
+            world_id=world,
+            kind=kind,
+            object_id=pk,
+            name=name,
+            body=notes or "",
+            tags=" ".join(tags.get(pk, ())),
+        )
+        for pk, world, name, notes in rows
+    )
+
+
+def index_objects(model, pks, apps=global_apps):
+    """Bring the search entries of some objects of a searchable model up to date."""
+    rows = list(model.objects.filter(pk__in=pks).values_list("pk", "world", "name", "notes"))
+    _index_rows(model, rows, apps)
+
+
+def remove_objects(model, pks, apps=global_apps):
+    apps.get_model("worlds", "SearchEntry").objects.filter(kind=model._meta.model_name, object_id__in=pks).delete()
+
+
+def reindex(world=None, batch_size=BATCH_SIZE, apps=global_apps):
+    """Rebuild the search entries of one world, or of every world."""
+    SearchEntry = apps.get_model("worlds", "SearchEntry")
+    entries = SearchEntry.objects.all() if world is None else SearchEntry.objects.filter(world=world)
+    entries.delete()
+    for name in SEARCH_MODELS:
+        model = apps.get_model("worlds", name)
+        objects = model.objects.all() if world is None else model.objects.filter(world=world)
+        rows = objects.order_by("pk").values_list("pk", "world", "name", "notes")
+        last_pk = 0
+        while True:
+            page = list(rows.filter(pk__gt=last_pk)[:batch_size])
+            if not page:
+                break
+            last_pk = page[-1][0]
+            _index_rows(model, page, apps)
+
+
+# ----------------------------------------------------------------------
+# Searching
+# ----------------------------------------------------------------------
+def terms(query):
+    """The words of a search, stripped of any query syntax."""
+    return re.findall(r"\w+", query.lower())
+
+
+def _match(vendor, words):
+    """The full-text query matching every word as a prefix."""
+    if vendor == "sqlite":
+        return " ".join('"%s"*' % word for word in words)
+    return " & ".join("%s:*" % word for word in words)
+
+
+def _search_sql(vendor, words, world, kinds, limit):
+    """(sql, params) of a ranked search, or None when the database has no full-text index."""
+    table = global_apps.get_model("worlds", "SearchEntry")._meta.db_table
+    if vendor == "sqlite":
+        select = (
+            "SELECT e.kind, e.object_id, e.name, -bm25({fts}, %s, %s, %s) AS score"
+            " FROM {fts} JOIN {table} e ON e.id = {fts}.rowid WHERE {fts} MATCH %s"
+        )
+        params = list(FTS_WEIGHTS) + [_match(vendor, words)]
+    elif vendor == "postgresql":
+        select = (
+            "SELECT e.kind, e.object_id, e.name, ts_rank({vector}, q) AS score"
+            " FROM {table} e, to_tsquery('simple', %s) q WHERE {vector} @@ q"
+        )
+        params = [_match(vendor, words)]
+    else:
+        return None
+    sql = select.format(fts=FTS_TABLE, table=table, vector=PG_VECTOR)
+    if world is not None:
+        sql += " AND e.world_id = %s"
+        params.append(world)
+    if kinds:
+        sql += " AND e.kind IN (%s)" % ", ".join(["%s"] * len(kinds))
+        params.extend(kinds)
+    sql += " ORDER BY score DESC, e.id"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql, params
+
+
+def search(query, world=None, kinds=None, limit=None):
+    """Rank the entities matching every word of query, best first.
+
+    Returns a list of {"kind", "pk", "name", "score"} dicts, optionally restricted
+    to one world (instance or pk) and to some kinds of entity (model names).
+    """
+    words = terms(query)
+    if not words:
+        return []
+    world = getattr(world, "pk", world)
+    found = _search_sql(connection.vendor, words, world, kinds, limit)
+    if found is not None:
+        with connection.cursor() as cursor:
+            cursor.execute(*found)
+            rows = cursor.fetchall()
+    else:
+        entries = matching_entries(query, world, kinds)
+        rows = [row + (0.0,) for row in entries.order_by("name").values_list("kind", "object_id", "name")[:limit]]
+    return [{"kind": kind, "pk": pk, "name": name, "score": score} for kind, pk, name, score in rows]
+
+
+# The ids of the entries matching a full-text query, per database.
+MATCH_SQL = {
+    "sqlite": "SELECT rowid FROM {fts} WHERE {fts} MATCH %s",
+    "postgresql": "SELECT id FROM {table} WHERE {vector} @@ to_tsquery('simple', %s)",
+}
+
+
+def matching_entries(query, world=None, kinds=None):
+    """Unranked queryset of the search entries matching every word of query.
+
+    Unlike search(), nothing is fetched: the queryset can be used as a subquery.
+    """
+    entries = global_apps.get_model("worlds", "SearchEntry").objects.all()
+    words = terms(query)
+    if not words:
+        return entries.none()
+    if world is not None:
+        entries = entries.filter(world=getattr(world, "pk", world))
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    vendor = connection.vendor
+    if vendor in MATCH_SQL:
+        sql = MATCH_SQL[vendor].format(fts=FTS_TABLE, table=entries.model._meta.db_table, vector=PG_VECTOR)
+        return entries.filter(id__in=RawSQL(sql, [_match(vendor, words)]))
+    for word in words:
+        entries = entries.filter(Q(name__icontains=word) | Q(body__icontains=word) | Q(tags__icontains=word))
+    return entries
+
+
+def matching_pks(model, query):
+    """Subquery of the pks of the objects of model matching query."""
+    return matching_entries(query, kinds=[model._meta.model_name]).values("object_id")
@@ -0,0 +1,381 @@
+"""Signal receivers keeping denormalized world data in sync with its sources."""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from taggit.models import TaggedItem
+
+from . import caching, dating, familytree, facets, graph, maps, search, significance, slugs, timeline
+from .models import (
+    Character,
+    CharacterRelationship,
+    DateConstraint,
+    Event,
+    EventParticipation,
+    FamilyTie,
+    Honor,
+    Lineage,
+    Organization,
+    Place,
+    PlaceOutline,
+    Setting,
+    Title,
+    World,
+)
+
+
+# ======================================================================
+# Family tree closure
+# ======================================================================
+@receiver(pre_save, sender=FamilyTie)
+@receiver(pre_delete, sender=FamilyTie)
+def note_stored_tie(sender, instance, **kwargs):
+    # Ties built rather than loaded, like FamilyTie(pk=...), do not know their stored edge yet.
+    if instance.pk is not None and not hasattr(instance, "_stored_edge"):
+        stored = sender.objects.filter(pk=instance.pk).values_list("parent", "child").first()
+        if stored is not None:
+            instance._stored_edge = stored
+
+
+@receiver(post_save, sender=FamilyTie)
+def add_tie_to_lineage(sender, instance, created, **kwargs):
+    edge = (instance.parent_id, instance.child_id)
+    stored = getattr(instance, "_stored_edge", None)
+    if not created and stored == edge:
+        return  # Only the birth order changed.
+    if not created and stored is not None:
+        Lineage.objects.remove_tie(*stored)
+    Lineage.objects.add_tie(*edge)
+    instance._stored_edge = edge
+
+
+@receiver(pre_delete, sender=FamilyTie)
+def remove_tie_from_lineage(sender, instance, **kwargs):
+    # Done before the delete, while the closure through this tie is still intact,
+    # even when the delete cascades from a Character.
+    Lineage.objects.remove_tie(*getattr(instance, "_stored_edge", (instance.parent_id, instance.child_id)))
+
+
+# ======================================================================
+# Family tree layouts
+# ======================================================================
+# Both before the change, while the lineage still reaches every tree that
+# includes the tie or character.
+@receiver(pre_save, sender=FamilyTie)
+def forget_tie_family_trees(sender, instance, **kwargs):
+    # A tie may be re-sorted or moved; the trees of its old parent change too.
+    stored = getattr(instance, "_stored_edge", None)
+    familytree.forget_trees([instance.parent_id, stored[0] if stored else None])
+
+
+@receiver(pre_delete, sender=FamilyTie)
+def forget_deleted_tie_family_trees(sender, instance, **kwargs):
+    familytree.forget_trees([getattr(instance, "_stored_edge", (instance.parent_id,))[0]])
+
+
+@receiver(pre_save, sender=Character)
+@receiver(pre_delete, sender=Character)
+def forget_character_family_trees(sender, instance, **kwargs):
+    # Trees show names, so a rename changes the trees the character is in.
+    if not instance._state.adding:
+        familytree.forget_trees([instance.pk])
+
+
+# ======================================================================
+# Social graph overlays
+# ======================================================================
+# Edge kind and character end of each graph edge model.
+GRAPH_EDGES = {
+    CharacterRelationship: ("relationship", "from_char_id"),
+    FamilyTie: ("family", "parent_id"),
+    EventParticipation: ("participation", "character_id"),
+    Honor: ("honor", "character_id"),
+}
+
+
+def _patch_graphs(node, patch):
+    """Once committed, apply patch to every loaded graph containing node, dropping graphs that grow stale."""
+
+    def apply():
+        for world_graph in graph.loaded_graphs():
+            if world_graph.has_node(node):
+                patch(world_graph)
+                if world_graph.stale:
+                    graph.invalidate(world_graph.world_id)
+
+    transaction.on_commit(apply)
+
+
+def _other_end(instance):
+    """(other node, start key, end key) of a graph edge row."""
+    if isinstance(instance, CharacterRelationship):
+        return instance.to_char_id, instance.start_key, instance.end_key
+    if isinstance(instance, FamilyTie):
+        return instance.child_id, None, None
+    if isinstance(instance, Honor):
+        return ("organization", instance.org_id), instance.start_key, instance.end_key
+    if instance.start_key is None:
+        # Participations without dates of their own last as long as the event.
+        return ("event", instance.event_id), instance.event.start_key, instance.event.end_key
+    return ("event", instance.event_id), instance.start_key, instance.end_key
+
+
+@receiver(post_save, sender=CharacterRelationship)
+@receiver(post_save, sender=FamilyTie)
+@receiver(post_save, sender=EventParticipation)
+@receiver(post_save, sender=Honor)
+def patch_graph_edge(sender, instance, **kwargs):
+    kind, attr = GRAPH_EDGES[sender]
+    character, row = getattr(instance, attr), instance.pk
+    other, start, end = _other_end(instance)
+    _patch_graphs(character, lambda g: g.upsert_edge(kind, row, character, other, start, end))
+
+
+@receiver(post_delete, sender=CharacterRelationship)
+@receiver(post_delete, sender=FamilyTie)
+@receiver(post_delete, sender=EventParticipation)
+@receiver(post_delete, sender=Honor)
+def remove_graph_edge(sender, instance, **kwargs):
+    kind, attr = GRAPH_EDGES[sender]
+    row = instance.pk
+    _patch_graphs(getattr(instance, attr), lambda g: g.remove_edge(kind, row))
+
+
+@receiver(post_save, sender=Character)
+def add_graph_node(sender, instance, created, **kwargs):
+    if not created:
+        return
+    world_id, pk = instance.world_id, instance.pk
+
+    def apply():
+        world_graph = graph.loaded_graph(world_id)
+        if world_graph is not None:
+            world_graph.add_node(pk)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Character)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Organization)
+def remove_graph_node(sender, instance, **kwargs):
+    node = (sender._meta.model_name, instance.pk)
+    _patch_graphs(node, lambda g: g.remove_node(node))
+
+
+# ======================================================================
+# Map tiles
+# ======================================================================
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+def forget_place_geometry(sender, instance, **kwargs):
+    maps.forget_place(instance.pk)
+
+
+# ======================================================================
+# Character timelines
+# ======================================================================
+@receiver(pre_save, sender=EventParticipation)
+@receiver(pre_save, sender=Title)
+@receiver(pre_save, sender=Honor)
+def forget_previous_character_timeline(sender, instance, **kwargs):
+    # The row may be moving to another character, whose old timeline still lists it.
+    if not instance._state.adding:
+        timeline.forget_characters(sender.objects.filter(pk=instance.pk).values_list("character", flat=True))
+
+
+@receiver(post_save, sender=EventParticipation)
+@receiver(post_save, sender=Title)
+@receiver(post_save, sender=Honor)
+@receiver(post_delete, sender=EventParticipation)
+@receiver(post_delete, sender=Title)
+@receiver(post_delete, sender=Honor)
+def forget_character_timeline(sender, instance, **kwargs):
+    timeline.forget_characters([instance.character_id])
+
+
+# Deleting events, places and organizations cascades to the rows above, so only
+# their edits need handling here.
+@receiver(post_save, sender=Event)
+def forget_event_timelines(sender, instance, created, **kwargs):
+    if not created:
+        timeline.forget_characters(
+            EventParticipation.objects.filter(event=instance).values_list("character", flat=True)
+        )
+
+
+@receiver(post_save, sender=Place)
+def forget_place_timelines(sender, instance, created, **kwargs):
+    if not created:
+        timeline.forget_characters(
+            list(Title.objects.filter(place=instance).values_list("character", flat=True))
+            + list(EventParticipation.objects.filter(event__place=instance).values_list("character", flat=True))
+        )
+
+
+@receiver(post_save, sender=Organization)
+def forget_organization_timelines(sender, instance, created, **kwargs):
+    if not created:
+        timeline.forget_characters(Honor.objects.filter(org=instance).values_list("character", flat=True))
+
+
+# ======================================================================
+# Full-text search
+# ======================================================================
+@receiver(post_save, sender=Place)
+@receiver(post_save, sender=Setting)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Organization)
+@receiver(post_save, sender=Character)
+def index_for_search(sender, instance, **kwargs):
+    search.index_objects(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Place)
+@receiver(post_delete, sender=Setting)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Organization)
+@receiver(post_delete, sender=Character)
+def remove_from_search(sender, instance, **kwargs):
+    search.remove_objects(sender, [instance.pk])
+
+
+@receiver(m2m_changed, sender=TaggedItem)
+def reindex_tags_for_search(sender, instance, action, **kwargs):
+    # Tags are saved after the object itself, so its entry is refreshed again here.
+    if action in ("post_add", "post_remove", "post_clear") and instance._meta.model_name in search.SEARCH_MODELS:
+        search.index_objects(type(instance), [instance.pk])
+
+
+# ======================================================================
+# Tag counts
+# ======================================================================
+@receiver(m2m_changed, sender=TaggedItem)
+def count_tag_changes(sender, instance, action, pk_set, **kwargs):
+    kind = instance._meta.model_name
+    if kind not in facets.TAGGED_MODELS:
+        return
+    if action == "post_add":
+        facets.adjust(instance.world_id, kind, pk_set, 1)
+    elif action == "post_remove":
+        facets.adjust(instance.world_id, kind, pk_set, -1)
+    elif action == "pre_clear":
+        instance._cleared_tags = facets.tag_pks(instance)
+    elif action == "post_clear":
+        facets.adjust(instance.world_id, kind, instance.__dict__.pop("_cleared_tags", ()), -1)
+
+
+@receiver(pre_delete, sender=Place)
+@receiver(pre_delete, sender=Setting)
+@receiver(pre_delete, sender=Event)
+@receiver(pre_delete, sender=Organization)
+@receiver(pre_delete, sender=Character)
+def uncount_deleted_tags(sender, instance, **kwargs):
+    # The tagged items go with the object, without m2m_changed signals.
+    facets.adjust(instance.world_id, sender._meta.model_name, facets.tag_pks(instance), -1)
+
+
+# ======================================================================
+# Slug resolution
+# ======================================================================
+@receiver(post_save, sender=World)
+@receiver(post_save, sender=Place)
+@receiver(post_save, sender=Setting)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Organization)
+@receiver(post_save, sender=Character)
+@receiver(post_delete, sender=World)
+@receiver(post_delete, sender=Place)
+@receiver(post_delete, sender=Setting)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Organization)
+@receiver(post_delete, sender=Character)
+def forget_slug(sender, instance, **kwargs):
+    # The slug may have changed; it is resolved again on next use.
+    slugs.forget(sender._meta.model_name, instance.pk)
+
+
+# ======================================================================
+# Response cache versions
+# ======================================================================
+@receiver(post_save, sender=Place)
+@receiver(post_save, sender=PlaceOutline)
+@receiver(post_save, sender=Setting)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Organization)
+@receiver(post_save, sender=Character)
+@receiver(post_save, sender=FamilyTie)
+@receiver(post_save, sender=Title)
+@receiver(post_save, sender=Honor)
+@receiver(post_save, sender=EventParticipation)
+@receiver(post_save, sender=CharacterRelationship)
+@receiver(post_save, sender=DateConstraint)
+@receiver(post_delete, sender=Place)
+@receiver(post_delete, sender=PlaceOutline)
+@receiver(post_delete, sender=Setting)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Organization)
+@receiver(post_delete, sender=Character)
+@receiver(post_delete, sender=FamilyTie)
+@receiver(post_delete, sender=Title)
+@receiver(post_delete, sender=Honor)
+@receiver(post_delete, sender=EventParticipation)
+@receiver(post_delete, sender=CharacterRelationship)
+@receiver(post_delete, sender=DateConstraint)
+def bump_world_version(sender, instance, **kwargs):
+    world_id = caching.world_id_of(instance)
+    if world_id is None:
+        return
+    if sender not in GRAPH_EDGES and sender is not Character:
+        caching.bump_on_commit(world_id)
+        return
+
+    def apply():
+        # Runs after the overlay receivers above have patched the change into the loaded graph.
+        graph.advance(world_id, caching.bump(world_id))
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=World)
+@receiver(post_delete, sender=World)
+def bump_world(sender, instance, **kwargs):
+    caching.bump_on_commit(instance.pk)
+
+
+# ======================================================================
+# Estimated event dates
+# ======================================================================
+@receiver(post_save, sender=Event)
+def estimate_event_dates(sender, instance, **kwargs):
+    dating.resolve([instance.pk])
+
+
+@receiver(post_save, sender=DateConstraint)
+@receiver(post_delete, sender=DateConstraint)
+def estimate_constrained_dates(sender, instance, **kwargs):
+    events = {instance.event_id, instance.other_id, *getattr(instance, "_stored_events", ())}
+    instance._stored_events = (instance.event_id, instance.other_id)
+    dating.resolve([pk for pk in events if pk is not None])
+
+
+# ======================================================================
+# Significance buckets
+# ======================================================================
+@receiver(post_save, sender=Event)
+def rank_event(sender, instance, created, **kwargs):
+    entry = (instance.start_key, instance.significance)
+    if created or getattr(instance, "_stored_bucket_entry", None) != entry:
+        significance.rerank(instance.world_id, instance.pk, *entry)
+    instance._stored_bucket_entry = entry
+
+
+@receiver(pre_delete, sender=Event)
+def note_event_ranks(sender, instance, **kwargs):
+    # The bucket rows go with the event, so note where it ranked before they do.
+    instance._ranked_buckets = significance.ranked_buckets(instance.pk)
+
+
+@receiver(post_delete, sender=Event)
+def unrank_event(sender, instance, **kwargs):
+    for level, bucket in instance.__dict__.pop("_ranked_buckets", ()):
+        significance.refill(instance.world_id, level, bucket)
@@ -0,0 +1,152 @@
+"""Level-of-detail index of events by significance.
+
+Time is cut into buckets at several zoom levels, from ten thousand years wide
+down to a single year. For each bucket, EventBucket keeps the ranks of the
+MAX_PER_BUCKET most significant events starting in it (ties go to the earlier
+event). A zoomed out timeline asks for the top few events per bucket, so it
+reads at most buckets times that many rows, however crowded the world is.
+
+When an event's start or significance changes, or it is deleted (see
+worlds.signals), only the buckets whose top it enters, leaves or moves within
+are refilled. Buckets are rebuilt wholesale after bulk loads.
+"""
+import functools
+import operator
+
+from django.apps import apps as global_apps
+from django.db.models import Q
+
+from .chronology import YEAR_SPAN, lower_bound, upper_bound
+
+# Bucket width of each zoom level, in years. Level 0 is the most zoomed out.
+LEVEL_YEARS = (10000, 1000, 100, 10, 1)
+MAX_PER_BUCKET = 25
+BATCH_SIZE = 2000
+
+
+def bucket_width(level):
+    return LEVEL_YEARS[level] * YEAR_SPAN
+
+
+def _order(significance, start_key, pk):
+    return (-significance, start_key, pk)
+
+
+def refill(world_id, level, bucket, apps=global_apps):
+    """Recompute the ranking of one bucket."""
+    Event = apps.get_model("worlds", "Event")
+    EventBucket = apps.get_model("worlds", "EventBucket")
+    low = bucket * bucket_width(level)
+    top = (
+        Event.objects.filter(world=world_id, start_key__gte=low, start_key__lt=low + bucket_width(level))
+        .order_by("-significance", "start_key", "pk")
+        .values_list("pk", flat=True)[:MAX_PER_BUCKET]
+    )
+    EventBucket.objects.filter(world=world_id, level=level, bucket=bucket).delete()
+    EventBucket.objects.bulk_create(
+        EventBucket(world_id=world_id, level=level, bucket=bucket, rank=rank, event_id=pk)
+        for rank, pk in enumerate(top)
+    )
+
+
+def rerank(world_id, pk, start_key, significance):
+    """Refill the buckets whose top an event has entered, left or moved within, after it changed.
+
+    start_key and significance are the event's new values. Buckets where the
+    event ranks, wherever it was before, are refilled, as are the buckets it
+    now starts in if it outranks their last entry or they are not full. Other
+    buckets keep their ranking, so most changes cost this one query.
+    """
+    EventBucket = global_apps.get_model("worlds", "EventBucket")
+    here = set()
+    if start_key is not None:
+        here = {(level, start_key // bucket_width(level)) for level in range(len(LEVEL_YEARS))}
+    wanted = Q(event=pk)
+    if here:
+        wanted |= Q(rank=MAX_PER_BUCKET - 1) & functools.reduce(
+            operator.or_, (Q(level=level, bucket=bucket) for level, bucket in here)
+        )
+    rows = EventBucket.objects.filter(wanted, world=world_id)
+    stale = set()
+    last = {}
+    for level, bucket, event, last_key, last_significance in rows.values_list(
+        "level", "bucket", "event", "event__start_key", "event__significance"
+    ):
+        if event == pk:
+            stale.add((level, bucket))
+        else:
+            last[(level, bucket)] = _order(last_significance, last_key, event)
+    for entry in here:
+        if entry not in last or _order(significance, start_key, pk) < last[entry]:
+            stale.add(entry)
+    for level, bucket in sorted(stale):
+        refill(world_id, level, bucket)
+
+
+def ranked_buckets(pk):
+    """The (level, bucket) pairs where an event ranks."""
+    EventBucket = global_apps.get_model("worlds", "EventBucket")
+    return list(EventBucket.objects.filter(event=pk).values_list("level", "bucket"))
+
+
+def rebuild(world, apps=global_apps):
+    """Recompute every bucket of a world (instance or pk) in one pass over its events."""
+    Event = apps.get_model("worlds", "Event")
+    EventBucket = apps.get_model("worlds", "EventBucket")
+    world_id = getattr(world, "pk", world)
+    EventBucket.objects.filter(world=world_id).delete()
+    pending = []
+    # Per level: the bucket being filled and its candidates.
+    current = [(None, []) for _ in LEVEL_YEARS]
+
+    def flush(level):
+        bucket, candidates = current[level]
+        candidates.sort()
+        pending.extend(
+            EventBucket(world_id=world_id, level=level, bucket=bucket, rank=rank, event_id=candidate[-1])
+            for rank, candidate in enumerate(candidates[:MAX_PER_BUCKET])
+        )
+
+    rows = (
+        Event.objects.filter(world=world_id, start_key__isnull=False)
+        .order_by("start_key", "pk")
+        .values_list("pk", "start_key", "significance")
+    )
+    for pk, start_key, significance in rows.iterator():
+        for level in range(len(LEVEL_YEARS)):
+            bucket = start_key // bucket_width(level)
+            if bucket != current[level][0]:
+                if current[level][0] is not None:
+                    flush(level)
+                current[level] = (bucket, [])
+            candidates = current[level][1]
+            candidates.append(_order(significance, start_key, pk))
+            if len(candidates) > 4 * MAX_PER_BUCKET:
+                # Trim as we go, so crowded buckets need not be held whole.
+                candidates.sort()
+                del candidates[MAX_PER_BUCKET:]
+        if len(pending) >= BATCH_SIZE:
+            EventBucket.objects.bulk_create(pending, batch_size=BATCH_SIZE)
+            pending.clear()
+    for level in range(len(LEVEL_YEARS)):
+        if current[level][0] is not None:
+            flush(level)
+    EventBucket.objects.bulk_create(pending, batch_size=BATCH_SIZE)
+
+
+def top_events(world, level, per_bucket, start=None, end=None):
+    """Subquery of the pks of the per_bucket most significant events of each bucket at a zoom level.
+
+    start and end are partial dates limiting the buckets read.
+    """
+    if not 0 <= level < len(LEVEL_YEARS):
+        raise ValueError("zoom must be between 0 and %d" % (len(LEVEL_YEARS) - 1))
+    if not 1 <= per_bucket <= MAX_PER_BUCKET:
+        raise ValueError("per_bucket must be between 1 and %d" % MAX_PER_BUCKET)
+    EventBucket = global_apps.get_model("worlds", "EventBucket")
+    buckets = EventBucket.objects.filter(world=world, level=level, rank__lt=per_bucket)
+    if start is not None:
+        buckets = buckets.filter(bucket__gte=lower_bound(start) // bucket_width(level))
+    if end is not None:
+        buckets = buckets.filter(bucket__lte=upper_bound(end) // bucket_width(level))
+    return buckets.values("event")
@@ -0,0 +1,85 @@
+"""Slug to pk resolution, cached in process.
+
+Worlds have globally unique slugs; places, settings, events, organizations
+and characters have slugs unique within their world. resolve() maps a slug
+to a pk through an LRU cache of MAX_ENTRIES entries, so a hit is a dict
+lookup with no query.
+
+The receivers in worlds.signals forget an object's entry when it is saved
+or deleted, which covers renames in this process. Other processes keep their
+entry until it is TTL seconds old, so a rename takes at most that long to be
+seen everywhere. Misses are not cached, so new objects resolve at once.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.apps import apps
+from django.http import Http404
+
+SLUGGED_MODELS = ("world", "place", "setting", "event", "organization", "character")
+MAX_ENTRIES = 10000
+TTL = 300
+
+_lock = threading.Lock()
+# (model name, world pk, slug) -> (pk, expiry time), least recently used first.
+_entries = OrderedDict()
+# (model name, pk) -> key in _entries, to forget an object without knowing its old slug.
+_keys = {}
+
+
+def _key(model_name, slug, world):
+    if model_name not in SLUGGED_MODELS:
+        raise LookupError("Model %r has no slugs" % model_name)
+    if model_name == "world":
+        return (model_name, None, slug)
+    if world is None:
+        raise ValueError("A world is needed to resolve %s slugs" % model_name)
+    return (model_name, getattr(world, "pk", world), slug)
+
+
+def resolve(model_name, slug, world=None):
+    """The pk of the object of a model with a slug (in world, an instance or pk), or None."""
+    key = _key(model_name, slug, world)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[1] > now:
+            _entries.move_to_end(key)
+            return entry[0]
+    lookup = {"slug": slug} if key[1] is None else {"slug": slug, "world": key[1]}
+    pk = apps.get_model("worlds", model_name).objects.filter(**lookup).values_list("pk", flat=True).first()
+    if pk is not None:
+        with _lock:
+            _forget(model_name, pk)
+            _entries[key] = (pk, now + TTL)
+            _keys[(model_name, pk)] = key
+            while len(_entries) > MAX_ENTRIES:
+                (old_model, _, _), (old_pk, _) = _entries.popitem(last=False)
+                _keys.pop((old_model, old_pk), None)
+    return pk
+
+
+def resolve_or_404(model_name, slug, world=None):
+    pk = resolve(model_name, slug, world)
+    if pk is None:
+        raise Http404("No %s matches the given slug." % model_name)
+    return pk
+
+
+def _forget(model_name, pk):
+    key = _keys.pop((model_name, pk), None)
+    if key is not None:
+        _entries.pop(key, None)
+
+
+def forget(model_name, pk):
+    """Drop the cached slug of an object, after it is renamed or deleted."""
+    with _lock:
+        _forget(model_name, pk)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _keys.clear()
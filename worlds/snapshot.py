@@ -0,0 +1,202 @@
+"""Read-only columnar snapshots of a world, for analytics.
+
+A snapshot is a directory holding one NumPy ``.npy`` file per column plus a
+``manifest.json``. Every table keeps its rows in pk order. Foreign keys are
+stored as row numbers in the target table (-1 for none), and Temporal
+start_key/end_key columns are stored with NULL_KEY standing in for unknown
+dates (and chronology.OPEN_END for unknown ends, as in the database).
+Columns are memory-mapped on read, so dashboards share the operating
+system's page cache instead of querying the database.
+
+The helpers at the bottom answer the usual questions (events per decade per
+place, lifespans, membership over time) with vectorized operations.
+"""
+import datetime
+import json
+import os
+from array import array
+
+import numpy as np
+from django.apps import apps
+
+from .chronology import OPEN_END, YEAR_SPAN
+
+FORMAT_VERSION = 1
+NULL_KEY = np.iinfo(np.int64).min
+NULL_ROW = -1
+BATCH_SIZE = 5000
+
+KEYS = ("start_key", "end_key")
+# Per table: plain int64 columns, {foreign key: target table}, and whether to keep names.
+TABLES = (
+    ("place", (), {}, True),
+    ("organization", KEYS, {}, True),
+    ("character", KEYS, {}, True),
+    ("event", KEYS + ("significance",), {"place": "place"}, True),
+    ("familytie", (), {"parent": "character", "child": "character"}, False),
+    ("eventparticipation", KEYS, {"character": "character", "event": "event"}, False),
+    ("characterrelationship", KEYS, {"from_char": "character", "to_char": "character"}, False),
+    ("title", KEYS, {"character": "character", "place": "place"}, False),
+    ("honor", KEYS, {"character": "character", "org": "organization"}, False),
+)
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+def write_snapshot(world, directory):
+    """Write a snapshot of world into directory, creating it if needed. Returns the manifest."""
+    os.makedirs(directory, exist_ok=True)
+    manifest = {
+        "format": FORMAT_VERSION,
+        "world": {"pk": world.pk, "slug": world.slug, "name": world.name},
+        "created": datetime.datetime.utcnow().isoformat() + "Z",
+        "null_key": int(NULL_KEY),
+        "open_end": OPEN_END,
+        "year_span": YEAR_SPAN,
+        "tables": {},
+    }
+    row_of = {}  # table -> {pk: row number}
+    for table, columns, fks, named in TABLES:
+        model = apps.get_model("worlds", table)
+        fields = ("pk",) + columns + tuple(fks)
+        rows = (
+            model.objects.filter(**{getattr(model, "world_path", "world"): world})
+            .order_by("pk")
+            .values_list(*fields, *(("name",) if named else ()))
+        )
+        data = {field: array("q") for field in fields}
+        names = []
+        last_pk = 0
+        while True:
+            page = list(rows.filter(pk__gt=last_pk)[:BATCH_SIZE])
+            if not page:
+                break
+            last_pk = page[-1][0]
+            for row in page:
+                for field, value in zip(fields, row):
+                    if field in fks:
+                        # References outside the world are left out like missing ones.
+                        value = row_of[fks[field]].get(value, NULL_ROW)
+                    elif value is None:
+                        value = NULL_KEY
+                    data[field].append(value)
+                if named:
+                    names.append(row[-1])
+        row_of[table] = {pk: i for i, pk in enumerate(data["pk"])}
+        for field, values in data.items():
+            np.save(os.path.join(directory, "%s.%s.npy" % (table, field)), np.frombuffer(values, dtype=np.int64))
+        if named:
+            with open(os.path.join(directory, "%s.names.json" % table), "w", encoding="utf-8") as out:
+                json.dump(names, out)
+        manifest["tables"][table] = {"rows": len(data["pk"]), "columns": list(fields), "references": fks}
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as out:
+        json.dump(manifest, out, indent=2)
+    return manifest
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+class Snapshot:
+    """A snapshot directory opened for reading. Columns are memory-mapped on first use."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as manifest:
+            self.manifest = json.load(manifest)
+        if self.manifest["format"] != FORMAT_VERSION:
+            raise ValueError("Unsupported snapshot format %r" % self.manifest["format"])
+        self._columns = {}
+
+    def rows(self, table):
+        return self.manifest["tables"][table]["rows"]
+
+    def column(self, table, field):
+        """A read-only int64 array of one column."""
+        key = (table, field)
+        if key not in self._columns:
+            if field not in self.manifest["tables"][table]["columns"]:
+                raise KeyError("%s has no column %r" % (table, field))
+            path = os.path.join(self.directory, "%s.%s.npy" % (table, field))
+            self._columns[key] = np.load(path, mmap_mode="r")
+        return self._columns[key]
+
+    def names(self, table):
+        """The names of a table's rows, in row order."""
+        with open(os.path.join(self.directory, "%s.names.json" % table), encoding="utf-8") as names:
+            return json.load(names)
+
+
+# ----------------------------------------------------------------------
+# Queries
+# ----------------------------------------------------------------------
+def years(keys):
+    """Years of an array of sort keys, as a masked array hiding unknown dates and open ends."""
+    keys = np.asarray(keys)
+    return np.ma.masked_array(keys // YEAR_SPAN, mask=(keys == NULL_KEY) | (keys == OPEN_END))
+
+
+def histogram(snapshot, table, field="start_key", width=10, group_by=None):
+    """Count a table's rows per width-year bucket of a key column, optionally per foreign key.
+
+    Returns (first bucket's year, counts), where counts has one entry per bucket,
+    or one row per target row of group_by. Rows with unknown dates, or without
+    the group_by reference, are left out.
+    """
+    buckets = years(snapshot.column(table, field)) // width
+    keep = ~np.ma.getmaskarray(buckets)
+    if group_by is not None:
+        groups = np.asarray(snapshot.column(table, group_by))
+        keep &= groups != NULL_ROW
+    buckets = np.asarray(buckets)[keep]
+    size = None if group_by is None else snapshot.rows(_target(snapshot, table, group_by))
+    if not buckets.size:
+        return 0, np.zeros(0 if size is None else (size, 0), int)
+    first = buckets.min()
+    offsets = buckets - first
+    if size is None:
+        return int(first * width), np.bincount(offsets)
+    span = int(offsets.max()) + 1
+    counts = np.bincount(groups[keep] * span + offsets, minlength=size * span)
+    return int(first * width), counts.reshape(size, span)
+
+
+def _target(snapshot, table, field):
+    return snapshot.manifest["tables"][table]["references"][field]
+
+
+def group_count(snapshot, table, by):
+    """Number of rows of a table per target row of the foreign key column by."""
+    groups = np.asarray(snapshot.column(table, by))
+    return np.bincount(groups[groups != NULL_ROW], minlength=snapshot.rows(_target(snapshot, table, by)))
+
+
+def lifespans(snapshot, table="character"):
+    """Lengths in years of the rows whose start and end are both known."""
+    start, end = years(snapshot.column(table, "start_key")), years(snapshot.column(table, "end_key"))
+    return (end - start).compressed()
+
+
+def active_per_bucket(snapshot, table, width=10, where=None):
+    """How many rows of a table are current in each width-year bucket, e.g. honors for membership.
+
+    where is an optional boolean mask selecting rows (for instance, one
+    organization's honors). Rows with an unknown end count through the last
+    bucket. Returns (first bucket's year, counts).
+    """
+    start = years(snapshot.column(table, "start_key")) // width
+    end = years(snapshot.column(table, "end_key")) // width
+    open_end = np.asarray(snapshot.column(table, "end_key")) == OPEN_END
+    keep = ~np.ma.getmaskarray(start) & (~np.ma.getmaskarray(end) | open_end)
+    if where is not None:
+        keep &= where
+    start, end, open_end = np.asarray(start)[keep], np.asarray(end)[keep], open_end[keep]
+    if not start.size:
+        return 0, np.zeros(0, int)
+    first = start.min()
+    end[open_end] = max(start.max(), end[~open_end].max(initial=start.max()))
+    change = np.zeros(int(end.max() - first) + 2, int)
+    np.add.at(change, start - first, 1)
+    np.add.at(change, end - first + 1, -1)
+    return int(first * width), np.cumsum(change)[:-1]
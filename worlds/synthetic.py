@@ -0,0 +1,183 @@
+"""Deterministic synthetic worlds, for benchmarks and load testing.
+
+generate_records() yields a world in the worlds.exchange record format, so a
+synthetic world is loaded through the same bulk import as a real one, and its
+derived data (lineage, search, facets, ...) is built the same way. The same
+seed and size always give the same world.
+
+Sizes are given as a number of characters; every other model scales with it
+(see RATIOS). Characters are born in GENERATIONS successive generations, and
+everyone after the first has one or two parents in the generation before.
+"""
+import json
+import random
+
+from .exchange import import_world
+
+GENERATIONS = 8
+GENERATION_YEARS = 25
+FIRST_YEAR = 1000
+# Rows of each model per character.
+RATIOS = {
+    "place": 0.1,
+    "organization": 0.02,
+    "event": 0.5,
+    "eventparticipation": 1.0,
+    "characterrelationship": 0.25,
+    "title": 0.1,
+    "honor": 0.2,
+}
+TAGS = ("war", "trade", "magic", "royal", "faith", "sea", "mountain", "exile", "plague", "harvest")
+RANKS = ("Baron", "Count", "Duke", "King")
+ROLES = ("participant", "leader", "witness", "victim")
+RELATIONS = (("friend", "friend"), ("rival", "rival"), ("mentor", "student"), ("spouse", "spouse"))
+SCALES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+
+def _count(characters, model):
+    return max(1, int(characters * RATIOS[model]))
+
+
+def _tags(rng):
+    return rng.sample(TAGS, rng.randint(0, 3))
+
+
+def _date(rng, prefix, year):
+    """Date fields for a year, with month and day known some of the time."""
+    month = rng.randint(1, 12) if rng.random() < 0.6 else None
+    day = rng.randint(1, 28) if month is not None and rng.random() < 0.5 else None
+    return {prefix + "_year": year, prefix + "_month": month, prefix + "_day": day}
+
+
+def _span(rng, start, end):
+    record = {"time_type": "span"}
+    record.update(_date(rng, "start", start))
+    # Only the year of an end in the start's year, so it cannot fall before the start.
+    record.update(_date(rng, "end", end) if end > start else {"end_year": end})
+    return record
+
+
+def _square(lon, lat, size):
+    corners = [(lon, lat), (lon + size, lat), (lon + size, lat + size), (lon, lat + size), (lon, lat)]
+    return "SRID=4326;MULTIPOLYGON(((%s)))" % ",".join("%.6f %.6f" % corner for corner in corners)
+
+
+def generate_records(slug, characters, seed=0):
+    """Yield the records of a synthetic world with the given number of characters."""
+    rng = random.Random(seed)
+    yield {"model": "world", "name": "Synthetic %s" % slug, "slug": slug}
+
+    places = _count(characters, "place")
+    for i in range(places):
+        lon, lat = rng.uniform(-170, 169), rng.uniform(-80, 79)
+        yield {
+            "model": "place",
+            "name": "Place %d" % i,
+            "slug": "place-%d" % i,
+            "notes": "A %s place." % rng.choice(TAGS),
+            "point_location": "SRID=4326;POINT(%.6f %.6f)" % (lon + 0.5, lat + 0.5),
+            "geo_detail": _square(lon, lat, rng.uniform(0.01, 1)),
+            "tags": _tags(rng),
+        }
+
+    last_year = FIRST_YEAR + GENERATIONS * GENERATION_YEARS + 80
+    organizations = _count(characters, "organization")
+    for i in range(organizations):
+        start = rng.randint(FIRST_YEAR, last_year - 50)
+        record = {"model": "organization", "name": "Order %d" % i, "slug": "order-%d" % i, "tags": _tags(rng)}
+        record.update(_span(rng, start, start + rng.randint(10, 300)))
+        yield record
+
+    # Characters: generation g holds the characters i with i * GENERATIONS // characters == g.
+    births = []
+    for i in range(characters):
+        generation = i * GENERATIONS // characters
+        born = FIRST_YEAR + generation * GENERATION_YEARS + rng.randint(0, 10)
+        died = born + rng.randint(20, 80)
+        births.append((born, died))
+        record = {
+            "model": "character",
+            "name": "Character %d" % i,
+            "slug": "character-%d" % i,
+            "notes": "Born in generation %d." % generation,
+            "tags": _tags(rng),
+        }
+        record.update(_span(rng, born, died))
+        yield record
+
+    events = _count(characters, "event")
+    for i in range(events):
+        year = rng.randint(FIRST_YEAR, last_year)
+        record = {
+            "model": "event",
+            "name": "Event %d" % i,
+            "slug": "event-%d" % i,
+            "notes": "The %s of %d." % (rng.choice(TAGS), year),
+            "significance": rng.choice((0, 0, 0, 1, 2, 5, 10, 50)),
+            "place": "place-%d" % rng.randrange(places) if rng.random() < 0.8 else None,
+            "time_type": "instant",
+            "tags": _tags(rng),
+        }
+        record.update(_date(rng, "start", year))
+        yield record
+
+    def generation_bounds(generation):
+        return -(-generation * characters // GENERATIONS), -(-(generation + 1) * characters // GENERATIONS)
+
+    for i in range(characters):
+        generation = i * GENERATIONS // characters
+        if generation == 0:
+            continue
+        first, last = generation_bounds(generation - 1)
+        parents = sorted({rng.randrange(first, last) for _ in range(rng.randint(1, 2))})
+        for parent in parents:
+            yield {
+                "model": "familytie",
+                "birth_order": i,
+                "parent": "character-%d" % parent,
+                "child": "character-%d" % i,
+            }
+
+    for i in range(_count(characters, "eventparticipation")):
+        yield {
+            "model": "eventparticipation",
+            "role": rng.choice(ROLES),
+            "time_type": "span",
+            "character": "character-%d" % rng.randrange(characters),
+            "event": "event-%d" % rng.randrange(events),
+        }
+
+    for i in range(_count(characters, "characterrelationship")):
+        a = rng.randrange(characters)
+        # Relate characters of about the same age.
+        b = min(characters - 1, max(0, a + rng.randint(-50, 50)))
+        rel, rev = rng.choice(RELATIONS)
+        start = max(births[a][0], births[b][0]) + rng.randint(0, 20)
+        record = {"model": "characterrelationship", "rel": rel, "rev": rev}
+        record.update(_span(rng, start, max(start, min(births[a][1], births[b][1]))))
+        record.update(from_char="character-%d" % a, to_char="character-%d" % b)
+        yield record
+
+    for i in range(_count(characters, "title")):
+        holder = rng.randrange(characters)
+        born, died = births[holder]
+        start = rng.randint(born, died)
+        record = {"model": "title", "rank": rng.choice(RANKS)}
+        record.update(_span(rng, start, rng.randint(start, died)))
+        record.update(character="character-%d" % holder, place="place-%d" % rng.randrange(places))
+        yield record
+
+    for i in range(_count(characters, "honor")):
+        member = rng.randrange(characters)
+        born, died = births[member]
+        start = rng.randint(born, died)
+        record = {"model": "honor"}
+        record.update(_span(rng, start, rng.randint(start, died)))
+        record.update(character="character-%d" % member, org="order-%d" % rng.randrange(organizations))
+        yield record
+
+
+def generate_world(slug, characters, seed=0, replace=False):
+    """Generate and import a synthetic world. Returns (world, {model name: record count})."""
+    lines = (json.dumps(record) for record in generate_records(slug, characters, seed))
+    return import_world(lines, replace=replace)
@@ -1,3 +1,1295 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, QuerySet
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from storyworlds import asgi
+
+from . import (
+    asof,
+    benchmarks,
+    caching,
+    connections,
+    dating,
+    deltas,
+    exchange,
+    facets,
+    familytree,
+    graph,
+    instrumentation,
+    maps,
+    search,
+    significance,
+    slugs,
+    snapshot,
+    timeline,
+    views,
+)
+from .models import (
+    Character,
+    CharacterRelationship,
+    DateConstraint,
+    Event,
+    EventBucket,
+    EventParticipation,
+    FamilyTie,
+    Honor,
+    Lineage,
+    Organization,
+    Place,
+    PlaceOutline,
+    Reference,
+    Setting,
+    TagCount,
+    Title,
+    World,
+)
+from .chronology import OPEN_END, date_bounds, lower_bound, pack_date, parse_partial_date, unpack_date, upper_bound
+from .synthetic import GENERATIONS, generate_records, generate_world
+
+
+class ChronologyTests(SimpleTestCase):
+    def test_partial_dates_sort_within_their_range(self):
+        year = (lower_bound(1200), upper_bound(1200))
+        march = (lower_bound((1200, 3)), upper_bound((1200, 3)))
+        day = pack_date(1200, 3, 15, datetime.time(12, 30))
+        self.assertLess(year[0], march[0])
+        self.assertLess(march[0], day)
+        self.assertLess(day, march[1])
+        self.assertLess(march[1], year[1])
+        self.assertLess(year[1], lower_bound(1201))
+        # A day without a month cannot be placed.
+        self.assertEqual(pack_date(1200, None, 15), pack_date(1200))
+
+    def test_bce_years(self):
+        self.assertLess(upper_bound(-50), lower_bound(-49))
+        self.assertLess(upper_bound(-1), lower_bound(0))
+        self.assertEqual(unpack_date(pack_date(-50, 3, 15)), (-50, 3, 15, None))
+
+    def test_round_trip(self):
+        when = (1200, 3, 15, datetime.time(12, 30, 5))
+        self.assertEqual(unpack_date(pack_date(*when)), when)
+        self.assertEqual(unpack_date(lower_bound(1200)), (1200, None, None, None))
+        self.assertEqual(unpack_date(upper_bound((1200, 3))), (1200, 3, None, None))
+        self.assertEqual(parse_partial_date("-50-03"), (-50, 3, None))
+        with self.assertRaises(ValueError):
+            parse_partial_date("1200-13")
+
+    def test_bounds(self):
+        self.assertEqual(
+            date_bounds("span", (1200, None, None, None), (1210, 5, None, None)),
+            (lower_bound(1200), upper_bound(1200), lower_bound((1210, 5)), upper_bound((1210, 5))),
+        )
+        self.assertEqual(
+            date_bounds("instant", (1200, None, None, None), (None, None, None, None)),
+            (lower_bound(1200), upper_bound(1200), lower_bound(1200), upper_bound(1200)),
+        )
+        # An unknown end may be as early as the start, or never come.
+        self.assertEqual(
+            date_bounds("span", (1200, None, None, None), (None, None, None, None)),
+            (lower_bound(1200), upper_bound(1200), lower_bound(1200), OPEN_END),
+        )
+        self.assertEqual(date_bounds("span", (None,) * 4, (1210, None, None, None)), (None,) * 4)
+
+
+class TemporalRangeTests(TestCase):
+    def setUp(self):
+        world = World.objects.create(name="Testworld", slug="testworld")
+        self.events = {
+            name: Event.objects.create(world=world, name=name, slug=name.lower(), **dates)
+            for name, dates in (
+                ("Closed", {"start_year": 1200, "end_year": 1210}),
+                ("Open", {"start_year": 1205}),
+                ("Instant", {"time_type": "instant", "start_year": 1207, "start_month": 6}),
+                ("Undated", {}),
+            )
+        }
+
+    def names(self, queryset):
+        return sorted(event.name for event in queryset)
+
+    def test_overlapping(self):
+        self.assertEqual(self.names(Event.objects.overlapping(1190, 1199)), [])
+        self.assertEqual(self.names(Event.objects.overlapping(1207)), ["Closed", "Instant", "Open"])
+        self.assertEqual(self.names(Event.objects.overlapping(1300)), ["Open"])
+        self.assertEqual(self.names(Event.objects.overlapping(1208, 1300)), ["Closed", "Open"])
+
+    def test_certain(self):
+        self.assertEqual(self.names(Event.objects.overlapping(1205, certain=True)), ["Closed", "Open"])
+        # An open end may come at once, so the span is only certain at its start.
+        self.assertEqual(self.names(Event.objects.overlapping(1206, certain=True)), ["Closed"])
+
+    def test_before_and_after(self):
+        self.assertEqual(self.names(Event.objects.before(1211)), ["Closed", "Instant"])
+        self.assertEqual(self.names(Event.objects.after(1204)), ["Instant", "Open"])
+
+    def test_keys_stored(self):
+        event = self.events["Open"]
+        self.assertEqual(event.end_key, OPEN_END)
+        event.end_year = 1206
+        event.save()
+        event.refresh_from_db()
+        self.assertEqual(event.end_key, upper_bound(1206))
+
+
+class WorldTimelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        slugs.clear()
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        # Several events share each start year, so pages must break ties by pk.
+        self.events = [
+            Event.objects.create(
+                world=self.world, name="Event %d" % i, slug="event-%d" % i, start_year=1000 + i // 3, significance=i
+            )
+            for i in range(8)
+        ]
+        Event.objects.create(world=self.world, name="Undated", slug="undated")
+
+    def page_through(self, **params):
+        """The unique ids of every slide, following the next cursors two slides at a time."""
+        url = reverse("world_timeline", args=[self.world.slug])
+        params["limit"] = 2
+        seen = []
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            document = json.loads(b"".join(response.streaming_content))
+            self.assertLessEqual(len(document["events"]), 2)
+            self.assertEqual(document["title"]["text"]["headline"], "Testworld")
+            seen.extend(slide["unique_id"] for slide in document["events"])
+            if document["next"] is None:
+                return seen
+            params["after"] = document["next"]
+
+    def test_pages(self):
+        self.assertEqual(self.page_through(), ["event-%d" % event.pk for event in self.events])
+
+    def test_zoomed_pages(self):
+        # All the events fall in one bucket at the widest zoom, which keeps the five most significant.
+        self.assertEqual(self.page_through(zoom=0, per_bucket=5), ["event-%d" % event.pk for event in self.events[3:]])
+
+
+class AdminQueryCountTests(TestCase):
+    """Admin changelists must cost a fixed number of queries, however many rows they show."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        cls.world = World.objects.create(name="Testworld", slug="testworld")
+        cls.root = Character.objects.create(world=cls.world, name="Root", slug="root")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def add_rows(self, count):
+        """Add count rows of every model with an admin."""
+        first = Character.objects.count()
+        for i in range(first, first + count):
+            slug = "thing-%d" % i
+            place = Place.objects.create(world=self.world, name="Place %d" % i, slug=slug)
+            org = Organization.objects.create(world=self.world, name="Org %d" % i, slug=slug)
+            event = Event.objects.create(world=self.world, name="Event %d" % i, slug=slug, place=place, start_year=i)
+            child = Character.objects.create(world=self.world, name="Character %d" % i, slug=slug)
+            Setting.objects.create(world=self.world, name="Setting %d" % i, slug=slug)
+            World.objects.create(name="World %d" % i, slug=slug)
+            Reference.objects.create(url="https://example.com/%d" % i, cite="Reference %d" % i)
+            FamilyTie.objects.create(parent=self.root, child=child, birth_order=i)
+            EventParticipation.objects.create(character=child, event=event)
+            Title.objects.create(character=child, place=place, rank="Count")
+            Honor.objects.create(character=child, org=org)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_changelists(self):
+        for model in (
+            Character,
+            Event,
+            EventParticipation,
+            FamilyTie,
+            Organization,
+            Place,
+            Reference,
+            Setting,
+            World,
+        ):
+            with self.subTest(model=model.__name__):
+                url = reverse("admin:worlds_%s_changelist" % model._meta.model_name)
+                self.add_rows(2)
+                few = self.count_queries(url)
+                self.add_rows(20)
+                self.assertEqual(self.count_queries(url), few)
+
+    def test_place_save_keeps_outlines(self):
+        place = Place.objects.create(
+            world=self.world,
+            name="Marsh",
+            slug="marsh",
+            geo_detail=MultiPolygon(Polygon(((0, 0), (0, 1), (1, 1), (0, 0)))),
+        )
+        Place.objects.filter(pk=place.pk).update(outlines_stale=False)
+        url = reverse("admin:worlds_place_change", args=(place.pk,))
+        form = self.client.get(url).context["adminform"].form
+        data = {name: form[name].value() for name in form.fields if form[name].value() is not None}
+        data["geo_detail"] = place.geo_detail.wkt
+        data["name"] = "Great Marsh"
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        place.refresh_from_db()
+        self.assertEqual(place.name, "Great Marsh")
+        self.assertFalse(place.outlines_stale)
+        data["geo_detail"] = MultiPolygon(Polygon(((0, 0), (0, 2), (2, 2), (0, 0)))).wkt
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        place.refresh_from_db()
+        self.assertTrue(place.outlines_stale)
+
+
+class LineageTests(TestCase):
+    def setUp(self):
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        # A diamond: the root reaches the heir through both of its children.
+        self.people = {
+            name: Character.objects.create(world=self.world, name=name, slug=name.lower())
+            for name in ("Root", "Left", "Right", "Heir", "Grandchild")
+        }
+        self.ties = {
+            (parent, child): FamilyTie.objects.create(parent=self.people[parent], child=self.people[child])
+            for parent, child in (
+                ("Root", "Left"),
+                ("Root", "Right"),
+                ("Left", "Heir"),
+                ("Right", "Heir"),
+                ("Heir", "Grandchild"),
+            )
+        }
+
+    def closure(self):
+        names = {person.pk: name for name, person in self.people.items()}
+        return {
+            (names[ancestor], names[descendant], depth, paths)
+            for ancestor, descendant, depth, paths in Lineage.objects.values_list(
+                "ancestor", "descendant", "depth", "paths"
+            )
+        }
+
+    def assertMatchesRebuild(self):
+        closure = self.closure()
+        Lineage.objects.rebuild(self.world)
+        self.assertEqual(closure, self.closure())
+
+    def test_diamond(self):
+        closure = self.closure()
+        self.assertIn(("Root", "Heir", 2, 2), closure)
+        self.assertIn(("Root", "Grandchild", 3, 2), closure)
+        self.assertIn(("Left", "Grandchild", 2, 1), closure)
+        self.assertEqual(len(closure), 9)
+        self.assertMatchesRebuild()
+        self.assertEqual(
+            sorted(c.name for c in self.people["Root"].descendants(max_depth=2)), ["Heir", "Left", "Right"]
+        )
+        self.assertEqual(
+            sorted(c.name for c in self.people["Grandchild"].ancestors()), ["Heir", "Left", "Right", "Root"]
+        )
+
+    def test_remove_one_of_two_paths(self):
+        self.ties[("Left", "Heir")].delete()
+        closure = self.closure()
+        self.assertIn(("Root", "Heir", 2, 1), closure)
+        self.assertIn(("Root", "Grandchild", 3, 1), closure)
+        self.assertNotIn("Heir", {descendant for ancestor, descendant, _, _ in closure if ancestor == "Left"})
+        self.assertMatchesRebuild()
+
+        self.ties[("Right", "Heir")].delete()
+        self.assertEqual(Character.objects.get(name="Grandchild").ancestors().get().name, "Heir")
+        self.assertFalse(self.people["Root"].descendants().filter(name__in=["Heir", "Grandchild"]).exists())
+        self.assertMatchesRebuild()
+
+    def test_move_tie(self):
+        tie = self.ties[("Heir", "Grandchild")]
+        tie.parent = self.people["Left"]
+        tie.save()
+        self.assertIn(("Root", "Grandchild", 2, 1), self.closure())
+        self.assertNotIn("Heir", {c.name for c in self.people["Grandchild"].ancestors()})
+        self.assertMatchesRebuild()
+
+    def test_save_unloaded_tie(self):
+        tie = self.ties[("Heir", "Grandchild")]
+        closure = self.closure()
+        FamilyTie(pk=tie.pk, parent=self.people["Heir"], child=self.people["Grandchild"], birth_order=2).save()
+        self.assertEqual(self.closure(), closure)
+        FamilyTie(pk=tie.pk, parent=self.people["Left"], child=self.people["Grandchild"]).save()
+        self.assertNotIn("Heir", {c.name for c in self.people["Grandchild"].ancestors()})
+        self.assertMatchesRebuild()
+
+    def test_delete_character_with_descendants(self):
+        self.people.pop("Left").delete()
+        closure = self.closure()
+        self.assertIn(("Root", "Heir", 2, 1), closure)
+        self.assertIn(("Root", "Grandchild", 3, 1), closure)
+        self.assertMatchesRebuild()
+
+
+class GraphTests(TransactionTestCase):
+    # Overlay patches are applied on commit, which TestCase never gets to.
+
+    def setUp(self):
+        graph.invalidate()
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        self.people = {
+            name: Character.objects.create(world=self.world, name=name, slug=name.lower())
+            for name in ("Queen", "Prince", "Knight", "Squire", "Hermit")
+        }
+        self.tie = FamilyTie.objects.create(parent=self.people["Queen"], child=self.people["Prince"])
+        self.oath = CharacterRelationship.objects.create(
+            from_char=self.people["Knight"],
+            to_char=self.people["Prince"],
+            rel="liege",
+            rev="vassal",
+            start_year=1200,
+            end_year=1220,
+        )
+        FamilyTie.objects.create(parent=self.people["Knight"], child=self.people["Squire"])
+        self.battle = Event.objects.create(world=self.world, name="Battle", slug="battle", start_year=1210)
+        EventParticipation.objects.create(character=self.people["Queen"], event=self.battle)
+
+    def key(self, name):
+        return ("character", self.people[name].pk)
+
+    def test_neighbourhood(self):
+        world_graph = graph.get_graph(self.world)
+        self.assertEqual(
+            world_graph.neighbourhood(self.people["Prince"].pk, hops=1),
+            {self.key("Prince"): 0, self.key("Queen"): 1, self.key("Knight"): 1},
+        )
+        two_hops = world_graph.neighbourhood(self.people["Prince"].pk, hops=2)
+        self.assertEqual(two_hops[("event", self.battle.pk)], 2)
+        self.assertEqual(two_hops[self.key("Squire")], 2)
+        self.assertNotIn(self.key("Hermit"), two_hops)
+        # The oath only holds from 1200 to 1220.
+        self.assertNotIn(self.key("Knight"), world_graph.neighbourhood(self.people["Prince"].pk, as_of=1230))
+        self.assertEqual(
+            set(world_graph.neighbourhood(self.people["Prince"].pk, kinds=["family"])),
+            {self.key("Prince"), self.key("Queen")},
+        )
+
+    def test_shortest_path(self):
+        world_graph = graph.get_graph(self.world)
+        self.assertEqual(
+            world_graph.shortest_path(self.people["Queen"].pk, self.people["Squire"].pk),
+            [self.key("Queen"), self.key("Prince"), self.key("Knight"), self.key("Squire")],
+        )
+        self.assertIsNone(world_graph.shortest_path(self.people["Queen"].pk, self.people["Squire"].pk, as_of=1230))
+        self.assertIsNone(world_graph.shortest_path(self.people["Queen"].pk, self.people["Hermit"].pk))
+        with self.assertRaises(LookupError):
+            world_graph.shortest_path(self.people["Queen"].pk, -1)
+
+    def test_patched_after_edits(self):
+        world_graph = graph.get_graph(self.world)
+        self.tie.parent = self.people["Hermit"]
+        self.tie.save()
+        self.oath.end_year = 1240
+        self.oath.save()
+        page = Character.objects.create(world=self.world, name="Page", slug="page")
+        FamilyTie.objects.create(parent=self.people["Hermit"], child=page)
+        # Patched in place rather than reloaded.
+        self.assertIs(graph.get_graph(self.world), world_graph)
+        self.assertEqual(
+            world_graph.neighbourhood(self.people["Prince"].pk, as_of=1230),
+            {self.key("Prince"): 0, self.key("Hermit"): 1, self.key("Knight"): 1},
+        )
+        self.assertEqual(world_graph.neighbourhood(page.pk), {("character", page.pk): 0, self.key("Hermit"): 1})
+
+        self.oath.delete()
+        self.people["Hermit"].delete()
+        self.assertEqual(world_graph.neighbourhood(self.people["Prince"].pk), {self.key("Prince"): 0})
+
+    def test_reloaded_after_unpatched_writes(self):
+        world_graph = graph.get_graph(self.world)
+        # Bulk writes send no signals, like writes from other processes.
+        FamilyTie.objects.bulk_create([FamilyTie(parent=self.people["Hermit"], child=self.people["Squire"])])
+        caching.bump(self.world.pk)
+        reloaded = graph.get_graph(self.world)
+        self.assertIsNot(reloaded, world_graph)
+        self.assertIn(self.key("Hermit"), reloaded.neighbourhood(self.people["Squire"].pk))
+
+
+class ExchangeTests(TestCase):
+    def setUp(self):
+        world = World.objects.create(name="Testworld", slug="testworld")
+        keep = Place.objects.create(world=world, name="Keep", slug="keep", point_location=Point(1.5, 2.5))
+        queen = Character.objects.create(world=world, name="Queen", slug="queen", start_year=-20, start_month=4)
+        prince = Character.objects.create(world=world, name="Prince", slug="prince", notes="Heir")
+        queen.tags.add("Royal", "Founder")
+        prince.tags.add("royal")
+        FamilyTie.objects.create(parent=queen, child=prince, birth_order=1)
+        coronation = Event.objects.create(
+            world=world,
+            name="Coronation",
+            slug="coronation",
+            place=keep,
+            time_type="instant",
+            start_year=1,
+            start_month=1,
+            start_day=1,
+            start_time=datetime.time(12, 0),
+        )
+        feast = Event.objects.create(world=world, name="Feast", slug="feast")
+        DateConstraint.objects.create(event=feast, kind=DateConstraint.AFTER, other=coronation)
+        EventParticipation.objects.create(character=prince, event=coronation, role="heir")
+        Title.objects.create(character=queen, place=keep, rank="Queen", start_year=1)
+        self.world = world
+
+    def export(self, world):
+        out = io.StringIO()
+        exchange.export_world(world, out)
+        return out.getvalue().splitlines()
+
+    def test_round_trip(self):
+        lines = self.export(self.world)
+        self.assertEqual(len(lines), 10)
+        world, counts = exchange.import_world(lines, batch_size=1, replace=True)
+        self.assertEqual(World.objects.filter(slug="testworld").count(), 1)
+        self.assertEqual(counts["character"], 2)
+        self.assertEqual(self.export(world), lines)
+
+        # Derived data is rebuilt for the new rows.
+        prince = Character.objects.get(world=world, slug="prince")
+        self.assertEqual([c.name for c in prince.ancestors()], ["Queen"])
+        self.assertEqual(Place.objects.get(world=world).point_location.coords, (1.5, 2.5))
+        self.assertEqual(Event.objects.get(world=world, slug="coronation").start_time, datetime.time(12, 0))
+        self.assertIsNotNone(Event.objects.get(world=world, slug="feast").estimated_key)
+
+    def test_bad_files(self):
+        lines = self.export(self.world)
+        for bad in (
+            ["not json"],
+            lines[1:],
+            lines + [lines[0]],
+            [lines[0], '{"model": "dragon"}'],
+            ['{"model": "world", "name": "Nameless"}'] + lines[1:],
+            ['{"model": "world", "slug": "testworld"}'] + lines[1:],
+        ):
+            with self.assertRaises(exchange.WorldFileError):
+                exchange.import_world(bad, replace=True)
+        with self.assertRaises(exchange.WorldFileError):
+            exchange.import_world(lines)
+        # Failed imports leave the existing world alone.
+        self.assertEqual(self.export(World.objects.get(slug="testworld")), lines)
+
+
+class MapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        # A square with a notch far finer than any outline level.
+        self.isle = Place.objects.create(
+            world=self.world,
+            name="Isle",
+            slug="isle",
+            point_location=Point(0.5, 0.5),
+            geo_detail=MultiPolygon(Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0.5, 0.000001), (0, 0)))),
+        )
+        self.town = Place.objects.create(world=self.world, name="Town", slug="town", point_location=Point(10, 10))
+
+    def names(self, places):
+        return set(places.values_list("name", flat=True))
+
+    def test_in_bbox(self):
+        places = Place.objects.filter(world=self.world)
+        # The isle's point lies outside, its geography inside.
+        self.assertEqual(self.names(places.in_bbox(-1, -1, 0.2, 0.2)), {"Isle"})
+        self.assertEqual(self.names(places.in_bbox(9, 9, 11, 11)), {"Town"})
+        self.assertEqual(self.names(places.in_bbox(2, 2, 3, 3)), set())
+
+    def test_within_radius(self):
+        places = Place.objects.filter(world=self.world)
+        # About 11 km east of the town.
+        self.assertEqual(self.names(places.within_radius(Point(10.1, 10, srid=4326), 20000)), {"Town"})
+        self.assertEqual(self.names(places.within_radius(Point(10.1, 10, srid=4326), 5000)), set())
+
+    def test_intersecting(self):
+        places = Place.objects.filter(world=self.world)
+        self.assertEqual(self.names(places.intersecting(Polygon.from_bbox((0.9, 0.9, 2, 2)))), {"Isle"})
+        self.assertEqual(self.names(places.intersecting(Polygon.from_bbox((1.5, 1.5, 2, 2)))), set())
+        self.assertEqual(self.names(places.intersecting(Polygon.from_bbox((9, 9, 11, 11)))), {"Town"})
+
+    def test_tile(self):
+        url = reverse("world_tile", kwargs={"slug": "testworld", "z": 0, "x": 0, "y": 0})
+        features = {f["properties"]["name"]: f for f in self.client.get(url).json()["features"]}
+        self.assertEqual(features["Isle"]["geometry"]["type"], "MultiPolygon")
+        # Without geography, places are drawn at their point.
+        self.assertEqual(features["Town"]["geometry"], {"type": "Point", "coordinates": [10.0, 10.0]})
+        # The far north-west tile at zoom 2 holds neither.
+        self.assertEqual(maps.tile(self.world, 2, 0, 0)["features"], [])
+        url = reverse("world_tile", kwargs={"slug": "testworld", "z": 1, "x": 2, "y": 0})
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_outline_level(self):
+        # Each zoom gets the coarsest level whose tolerance is within a pixel.
+        self.assertEqual([maps.outline_level(z) for z in (0, 3, 4, 8, 12)], [0, 0, 1, 2, 3])
+
+    def test_regenerate(self):
+        self.assertTrue(Place.objects.get(pk=self.isle.pk).outlines_stale)
+        self.assertFalse(Place.objects.get(pk=self.town.pk).outlines_stale)
+        self.assertEqual(PlaceOutline.objects.regenerate(Place.objects.filter(world=self.world), batch_size=1), 2)
+        self.assertEqual(
+            list(PlaceOutline.objects.order_by("level").values_list("place", "level", "vertices")),
+            [(self.isle.pk, 0, 5), (self.isle.pk, 1, 5), (self.isle.pk, 2, 5), (self.isle.pk, 3, 5)],
+        )
+        isle = Place.objects.get(pk=self.isle.pk)
+        self.assertFalse(isle.outlines_stale)
+
+        # Saving anything but the geography keeps the outlines.
+        isle.name = "Green Isle"
+        isle.save()
+        isle.save(update_fields=["name"])
+        self.assertFalse(Place.objects.get(pk=self.isle.pk).outlines_stale)
+
+        # Until simplify_places catches up, tiles simplify the new geography themselves.
+        isle.geo_detail = MultiPolygon(Polygon(((0, 0), (0, 2), (2, 2), (2, 0), (0, 0))))
+        isle.save(update_fields=["geo_detail"])
+        self.assertTrue(Place.objects.get(pk=self.isle.pk).outlines_stale)
+        geometry = json.loads(maps.geometries([self.isle.pk], 0)[self.isle.pk])
+        self.assertIn([2.0, 2.0], geometry["coordinates"][0][0])
+
+        call_command("simplify_places", "testworld", stdout=io.StringIO())
+        self.assertFalse(Place.objects.get(pk=self.isle.pk).outlines_stale)
+        outline = PlaceOutline.objects.get(place=self.isle, level=0)
+        self.assertEqual(outline.geometry.extent, (0.0, 0.0, 2.0, 2.0))
+
+    def test_fine_zooms(self):
+        self.assertEqual(maps.outline_level(maps.MAX_ZOOM), len(PlaceOutline.TOLERANCES) - 1)
+        geometry = json.loads(maps.geometries([self.isle.pk], maps.MAX_ZOOM)[self.isle.pk])
+        self.assertEqual(len(geometry["coordinates"][0][0]), 5)
+
+    def test_missing_geometry_cached(self):
+        self.assertEqual(maps.geometries([self.town.pk], 3), {self.town.pk: maps.NO_GEOMETRY})
+        with self.assertNumQueries(1):
+            self.assertEqual(maps.geometries([self.town.pk], 3), {self.town.pk: maps.NO_GEOMETRY})
+
+
+class CampaignTests(TestCase):
+    def setUp(self):
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        isle = Place.objects.create(world=self.world, name="Isle", slug="isle", point_location=Point(0.5, 0.5))
+        town = Place.objects.create(world=self.world, name="Town", slug="town", point_location=Point(10, 10))
+        unmapped = Place.objects.create(world=self.world, name="Nowhere", slug="nowhere")
+        self.events = {}
+        for name, place, start_year, end_year in (
+            ("Market", town, 1002, None),
+            ("Raid", town, 1001, 1001),
+            ("Landing", isle, 1000, 1000),
+            ("Rumour", None, 1001, None),
+            ("Wandering", unmapped, 1001, None),
+            ("Exile", town, None, None),
+        ):
+            self.events[name] = Event.objects.create(
+                world=self.world,
+                name=name,
+                slug=name.lower(),
+                place=place,
+                start_year=start_year,
+                end_year=end_year,
+            )
+        self.hero = Character.objects.create(world=self.world, name="Hero", slug="hero")
+        for name in ("Landing", "Raid"):
+            EventParticipation.objects.create(character=self.hero, event=self.events[name])
+
+    def rows(self, *names):
+        return [
+            [self.events[name].start_key, lon, lat, self.events[name].pk]
+            for name, lon, lat in (
+                ("Landing", 0.5, 0.5),
+                ("Raid", 10.0, 10.0),
+                ("Market", 10.0, 10.0),
+            )
+            if name in names
+        ]
+
+    def test_campaign_queryset(self):
+        with self.assertNumQueries(1):
+            rows = [list(row) for row in maps.campaign_queryset(self.world)]
+        self.assertEqual(rows, self.rows("Landing", "Raid", "Market"))
+        rows = [list(row) for row in maps.campaign_queryset(self.world, character=self.hero)]
+        self.assertEqual(rows, self.rows("Landing", "Raid"))
+        # Landing ended, and Market began, outside the window.
+        rows = [list(row) for row in maps.campaign_queryset(self.world, start=(1001,), end=(1001,))]
+        self.assertEqual(rows, self.rows("Raid"))
+
+    def get(self, **params):
+        url = reverse("world_campaign", kwargs={"slug": "testworld"})
+        # One event per page, so the streams span several pages.
+        with mock.patch.object(maps, "PAGE_SIZE", 1):
+            return self.client.get(url, params)
+
+    def test_stream_json(self):
+        response = self.get()
+        body = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(
+            body, {"columns": list(maps.CAMPAIGN_COLUMNS), "rows": self.rows("Landing", "Raid", "Market")}
+        )
+        body = json.loads(b"".join(self.get(character=self.hero.pk, start="1001").streaming_content))
+        self.assertEqual(body["rows"], self.rows("Raid"))
+        self.assertEqual(self.get(format="xml").status_code, 400)
+
+    def test_stream_binary(self):
+        response = self.get(format="binary")
+        self.assertEqual(response["X-Record-Format"], maps.CAMPAIGN_RECORD.format)
+        self.assertEqual(response["X-Record-Columns"], "key,lon,lat,event")
+        records = maps.CAMPAIGN_RECORD.iter_unpack(b"".join(response.streaming_content))
+        self.assertEqual([list(record) for record in records], self.rows("Landing", "Raid", "Market"))
+
+
+class CharacterTimelineTests(TransactionTestCase):
+    # Cached timelines are forgotten on commit, which TestCase never gets to.
+
+    def setUp(self):
+        cache.clear()
+        world = World.objects.create(name="Testworld", slug="testworld")
+        self.hero = Character.objects.create(world=world, name="Hero", slug="hero")
+        self.place = Place.objects.create(world=world, name="Realm", slug="realm")
+        self.order = Organization.objects.create(world=world, name="Order", slug="order")
+        self.battle = Event.objects.create(
+            world=world, name="Battle", slug="battle", start_year=1005, place=self.place
+        )
+        # The participation has no dates of its own, so it sorts by the battle's.
+        self.fought = EventParticipation.objects.create(character=self.hero, event=self.battle, role="Captain")
+        self.title = Title.objects.create(character=self.hero, place=self.place, rank="Count", start_year=1000)
+        self.honor = Honor.objects.create(character=self.hero, org=self.order, start_year=1002)
+        Honor.objects.create(character=self.hero, org=self.order)
+
+    def headlines(self):
+        return [entry["headline"] for entry in timeline.character_timeline(self.hero)]
+
+    def test_merged(self):
+        with self.assertNumQueries(3):
+            self.assertEqual(self.headlines(), ["Count of Realm", "Order", "Captain: Battle", "Order"])
+        entries = timeline.character_timeline(self.hero.pk)
+        self.assertEqual(entries[2]["start_date"], {"year": 1005})
+        self.assertEqual(entries[2]["place"], self.place.pk)
+        self.assertIsNone(entries[3]["start_date"])
+        with self.assertNumQueries(0):
+            timeline.character_timeline(self.hero)
+
+    def test_forgotten_on_commit(self):
+        self.headlines()
+        with transaction.atomic():
+            self.fought.role = "General"
+            self.fought.save()
+            self.assertEqual(self.headlines()[2], "Captain: Battle")
+        self.assertEqual(self.headlines()[2], "General: Battle")
+        self.battle.name = "Siege"
+        self.battle.save()
+        self.assertEqual(self.headlines()[2], "General: Siege")
+        self.title.rank = "Duke"
+        self.title.save()
+        self.assertEqual(self.headlines()[0], "Duke of Realm")
+        self.honor.start_year = 1010
+        self.honor.save()
+        self.assertEqual(self.headlines(), ["Duke of Realm", "General: Siege", "Order", "Order"])
+        self.order.name = "Guild"
+        self.order.save()
+        self.assertEqual(self.headlines()[-1], "Guild")
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        self.harbour = Place.objects.create(world=self.world, name="Old Harbour", slug="harbour", notes="Salt and tar")
+        self.keep = Place.objects.create(world=self.world, name="Keep", slug="keep")
+        self.captain = Character.objects.create(world=self.world, name="Harbourmaster", slug="captain")
+
+    def found(self, query, **kwargs):
+        return [(result["kind"], result["pk"]) for result in search.search(query, **kwargs)]
+
+    def test_indexed(self):
+        self.assertEqual(sorted(self.found("harb")), [("character", self.captain.pk), ("place", self.harbour.pk)])
+        self.assertEqual(self.found("harb", kinds=["place"]), [("place", self.harbour.pk)])
+        self.assertEqual(self.found("old tar"), [("place", self.harbour.pk)])
+        self.assertEqual(self.found("harb", world=World.objects.create(name="Other", slug="other")), [])
+
+    def test_kept_in_sync(self):
+        self.keep.tags.add("fortress")
+        self.assertEqual(self.found("fortress"), [("place", self.keep.pk)])
+        self.keep.name = "Citadel"
+        self.keep.save()
+        self.assertEqual(self.found("keep"), [])
+        self.assertEqual(self.found("citadel"), [("place", self.keep.pk)])
+        self.keep.delete()
+        self.assertEqual(self.found("citadel fortress"), [])
+
+    def test_admin(self):
+        self.client.force_login(get_user_model().objects.create_superuser("admin", "admin@example.com", "password"))
+        response = self.client.get(reverse("admin:worlds_place_changelist"), {"q": "harb"})
+        self.assertEqual(list(response.context["cl"].result_list), [self.harbour])
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        self.places = [
+            Place.objects.create(world=self.world, name="Place %d" % i, slug="place-%d" % i) for i in range(3)
+        ]
+
+    def counts(self):
+        return sorted(TagCount.objects.filter(world=self.world).values_list("kind", "tag__name", "count"))
+
+    def test_counts(self):
+        for place in self.places:
+            place.tags.add("coastal")
+        self.places[0].tags.add("ruined")
+        Character.objects.create(world=self.world, name="Sailor", slug="sailor").tags.add("coastal")
+        self.assertEqual(self.counts(), [("character", "coastal", 1), ("place", "coastal", 3), ("place", "ruined", 1)])
+        self.assertEqual(facets.tag_cloud(self.world, limit=1), [("coastal", "coastal", 4)])
+
+        self.places[0].tags.remove("coastal")
+        self.places[1].tags.remove("coastal")
+        self.assertEqual(self.counts(), [("character", "coastal", 1), ("place", "coastal", 1), ("place", "ruined", 1)])
+        self.places[0].tags.set("inland")
+        self.places[2].delete()
+        self.assertEqual(self.counts(), [("character", "coastal", 1), ("place", "inland", 1)])
+        self.assertEqual(list(facets.tagged(self.world, "place", ["INLAND"])), [self.places[0]])
+        expected = self.counts()
+        facets.rebuild(self.world)
+        self.assertEqual(self.counts(), expected)
+
+    def test_cloud_limit(self):
+        cache.clear()
+        slugs.clear()
+        self.places[0].tags.add("coastal", "ruined")
+        url = reverse("world_tags", args=[self.world.slug])
+        self.assertEqual(len(self.client.get(url, {"limit": 1}).json()["tags"]), 1)
+        for limit in (0, -1, views.MAX_SEARCH_LIMIT + 1, "many"):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.client.get(url, {"limit": limit}).status_code, 400)
+
+
+class DatingTests(TestCase):
+    def setUp(self):
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+
+    def event(self, name, **dates):
+        return Event.objects.create(world=self.world, name=name, slug=name.lower(), **dates)
+
+    def constrain(self, event, kind, other=None, **fields):
+        DateConstraint.objects.create(event=event, kind=kind, other=other, **fields)
+
+    def estimate(self, event):
+        event.refresh_from_db()
+        return event.estimated_key
+
+    def test_chain(self):
+        first, last = self.event("First", start_year=1000), self.event("Last", start_year=1100)
+        middle, later = self.event("Middle"), self.event("Later")
+        self.constrain(middle, DateConstraint.AFTER, first)
+        self.constrain(middle, DateConstraint.BEFORE, last)
+        self.constrain(later, DateConstraint.AFTER, middle)
+        self.assertEqual(self.estimate(first), first.start_key)
+        self.assertLess(first.start_key, self.estimate(middle))
+        self.assertLess(self.estimate(middle), last.start_key)
+        # Nothing bounds the later event from above, so it sits just after the middle one.
+        self.assertEqual(self.estimate(later), self.estimate(middle) + 1)
+
+    def test_circa(self):
+        event = self.event("Around")
+        self.constrain(event, DateConstraint.CIRCA, year=1050, margin=10)
+        self.assertEqual(self.estimate(event), (lower_bound(1040) + upper_bound(1060)) // 2)
+        # A known date wins over the estimate.
+        event.start_year = 1070
+        event.save()
+        self.assertEqual(self.estimate(event), event.start_key)
+
+    def test_contradictions(self):
+        early, late = self.event("Early", start_year=1000), self.event("Late", start_year=1100)
+        squeezed = self.event("Squeezed")
+        self.constrain(squeezed, DateConstraint.AFTER, late)
+        self.constrain(squeezed, DateConstraint.BEFORE, early)
+        self.assertEqual(self.estimate(squeezed), late.start_key + 1)
+        # A cycle is broken at its lowest pk, whose successor follows it.
+        first, second = self.event("First"), self.event("Second")
+        self.constrain(first, DateConstraint.CIRCA, year=1200)
+        self.constrain(first, DateConstraint.AFTER, second)
+        self.constrain(second, DateConstraint.AFTER, first)
+        self.assertEqual(self.estimate(second), self.estimate(first) + 1)
+
+    def test_resolve_world(self):
+        first, undated = self.event("First", start_year=1000), self.event("Undated")
+        self.constrain(undated, DateConstraint.AFTER, first)
+        expected = self.estimate(undated)
+        Event.objects.filter(world=self.world).update(estimated_key=None)
+        dating.resolve_world(self.world)
+        self.assertEqual((self.estimate(first), self.estimate(undated)), (first.start_key, expected))
+
+    def test_timeline(self):
+        first, last = self.event("First", start_year=1000, end_year=1000), self.event("Last", start_year=1100)
+        middle = self.event("Middle")
+        self.event("Unplaced")
+        self.constrain(middle, DateConstraint.AFTER, first)
+        self.constrain(middle, DateConstraint.BEFORE, last)
+        rows = timeline.timeline_queryset(self.world)
+        self.assertEqual([row["name"] for row in rows], ["First", "Middle", "Last"])
+        self.assertEqual(
+            [row["name"] for row in timeline.timeline_queryset(self.world, start=1001)], ["Middle", "Last"]
+        )
+        self.assertEqual(timeline.slide("event", rows[1])["start_date"], {"year": 1050})
+
+
+class SignificanceTests(TestCase):
+    def setUp(self):
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        # Two decades of one century, with a battle standing out in each.
+        self.events = {
+            name: Event.objects.create(
+                world=self.world, name=name, slug=name.lower(), start_year=year, significance=significance
+            )
+            for name, year, significance in (
+                ("Harvest", 1001, 1),
+                ("Battle", 1005, 9),
+                ("Fair", 1008, 2),
+                ("Flood", 1012, 3),
+                ("Siege", 1015, 7),
+            )
+        }
+
+    def top(self, level, per_bucket, start=None, end=None):
+        rows = timeline.timeline_queryset(self.world, zoom=level, per_bucket=per_bucket, start=start, end=end)
+        return [row["name"] for row in rows]
+
+    def buckets(self):
+        return sorted(EventBucket.objects.filter(world=self.world).values_list("level", "bucket", "rank", "event"))
+
+    def test_levels(self):
+        self.assertEqual(self.top(2, 1), ["Battle"])
+        self.assertEqual(self.top(3, 1), ["Battle", "Siege"])
+        self.assertEqual(self.top(3, 2), ["Battle", "Fair", "Flood", "Siege"])
+        self.assertEqual(self.top(3, 1, start=1010), ["Siege"])
+        with self.assertRaises(ValueError):
+            self.top(len(significance.LEVEL_YEARS), 1)
+
+    def test_kept_ranked(self):
+        flood = self.events["Flood"]
+        flood.significance = 8
+        flood.save()
+        self.assertEqual(self.top(3, 1), ["Battle", "Flood"])
+        self.events["Battle"].delete()
+        self.assertEqual(self.top(2, 1), ["Flood"])
+        # Moving an event to another decade refills both.
+        siege = self.events["Siege"]
+        siege.start_year = 1009
+        siege.save()
+        self.assertEqual(self.top(3, 1), ["Siege", "Flood"])
+        incremental = self.buckets()
+        significance.rebuild(self.world)
+        self.assertEqual(self.buckets(), incremental)
+
+    @mock.patch.object(significance, "MAX_PER_BUCKET", 2)
+    def test_full_buckets_kept(self):
+        for name, weight in (("Wedding", 5), ("Funeral", 4)):
+            Event.objects.create(world=self.world, name=name, slug=name.lower(), start_year=1001, significance=weight)
+        significance.rebuild(self.world)
+        harvest = self.events["Harvest"]
+        # Still below the last of the top two at every level: nothing to refill.
+        Event.objects.filter(pk=harvest.pk).update(significance=0)
+        with self.assertNumQueries(1):
+            significance.rerank(self.world.pk, harvest.pk, harvest.start_key, 0)
+        harvest.significance = 8
+        harvest.save()
+        self.assertEqual(self.top(3, 2), ["Harvest", "Battle", "Flood", "Siege"])
+        self.assertEqual(self.top(2, 2), ["Harvest", "Battle"])
+        incremental = self.buckets()
+        significance.rebuild(self.world)
+        self.assertEqual(self.buckets(), incremental)
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        self.elder = Character.objects.create(
+            world=self.world, name="Elder", slug="elder", start_year=1000, end_year=1060
+        )
+        self.heir = Character.objects.create(world=self.world, name="Heir", slug="heir", start_year=1040)
+        self.stranger = Character.objects.create(world=self.world, name="Stranger", slug="stranger")
+        FamilyTie.objects.create(parent=self.elder, child=self.heir)
+        World.objects.create(name="Elsewhere", slug="elsewhere")
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            manifest = snapshot.write_snapshot(self.world, directory)
+            self.assertEqual(manifest["tables"]["character"]["rows"], 3)
+            shot = snapshot.Snapshot(directory)
+            self.assertEqual(list(shot.column("character", "pk")), [self.elder.pk, self.heir.pk, self.stranger.pk])
+            self.assertEqual(shot.names("character"), ["Elder", "Heir", "Stranger"])
+            self.assertEqual(
+                list(shot.column("character", "start_key")),
+                [self.elder.start_key, self.heir.start_key, snapshot.NULL_KEY],
+            )
+            # Foreign keys become row numbers.
+            self.assertEqual(list(shot.column("familytie", "parent")), [0])
+            self.assertEqual(list(shot.column("familytie", "child")), [1])
+
+            # Only the elder has a known lifespan; the heir's end is open.
+            self.assertEqual(list(snapshot.lifespans(shot)), [60])
+            first, counts = snapshot.active_per_bucket(shot, "character", width=20)
+            self.assertEqual((first, list(counts)), (1000, [1, 1, 2, 2]))
+
+
+class TemporalStorageTests(TestCase):
+    def setUp(self):
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+
+    def keys(self, event):
+        event.refresh_from_db()
+        return (event.start_key, event.end_key)
+
+    def test_bulk_create(self):
+        fields = {"name": "Crowning", "slug": "crowning", "time_type": "instant", "start_year": 1200, "start_day": 5}
+        Event.objects.bulk_create([Event(world=self.world, **fields)])
+        event = Event.objects.get(slug="crowning")
+        # A day without a month is dropped, and the instant's end mirrors its start.
+        self.assertEqual((event.start_day, event.end_year), (None, 1200))
+        self.assertEqual(self.keys(event), (lower_bound(1200), upper_bound(1200)))
+
+    def test_bulk_update(self):
+        event = Event.objects.create(world=self.world, name="War", slug="war", start_year=1200, end_year=1210)
+        event.end_year, event.end_month = 1220, 3
+        Event.objects.bulk_update([event], ["end_year", "end_month"])
+        self.assertEqual(self.keys(event), (lower_bound(1200), upper_bound((1220, 3))))
+
+    def test_update(self):
+        event = Event.objects.create(world=self.world, name="War", slug="war", start_year=1200, end_year=1210)
+        self.assertEqual(Event.objects.filter(start_year=1200).update(start_year=1205, start_day=1, name="Feud"), 1)
+        event.refresh_from_db()
+        self.assertEqual((event.name, event.start_day), ("Feud", None))
+        self.assertEqual(self.keys(event), (lower_bound(1205), upper_bound(1210)))
+        Event.objects.filter(pk=event.pk).update(end_year=F("end_year") + 5)
+        self.assertEqual(self.keys(event), (lower_bound(1205), upper_bound(1215)))
+
+    def test_constraints(self):
+        event = Event.objects.create(world=self.world, name="War", slug="war", start_year=1200, end_year=1210)
+        instant = Event.objects.create(
+            world=self.world, name="Truce", slug="truce", time_type="instant", start_year=1205
+        )
+        for bad in (
+            # Out of range months are left for the database to reject.
+            lambda: Event.objects.filter(pk=event.pk).update(start_month=13),
+            lambda: Event.objects.create(world=self.world, name="Odd", slug="odd", start_year=1200, end_year=1100),
+            # Bypass normalization, as raw SQL would.
+            lambda: QuerySet.update(Event.objects.filter(pk=instant.pk), end_year=1206),
+            lambda: QuerySet.update(Event.objects.filter(pk=event.pk), start_day=3),
+        ):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                bad()
+
+
+class ResponseCacheTests(TransactionTestCase):
+    # World versions are bumped on commit, which TestCase never gets to.
+
+    def setUp(self):
+        cache.clear()
+        slugs.clear()
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        self.url = reverse("world_timeline", args=[self.world.slug])
+
+    def test_bumped_on_commit(self):
+        version = caching.world_version(self.world.pk)
+        with transaction.atomic():
+            Place.objects.create(world=self.world, name="Home", slug="home")
+            self.assertEqual(caching.world_version(self.world.pk), version)
+        self.assertGreater(caching.world_version(self.world.pk), version)
+        version = caching.world_version(self.world.pk)
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            Place.objects.create(world=self.world, name="Away", slug="away")
+            1 / 0
+        self.assertEqual(caching.world_version(self.world.pk), version)
+
+    def test_etag(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertEqual(b"".join(response.streaming_content).count(b'"unique_id"'), 0)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        Event.objects.create(world=self.world, name="Coronation", slug="coronation", start_year=1000)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(b"".join(response.streaming_content).count(b'"unique_id"'), 1)
+
+
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        cls.world = World.objects.create(name="Testworld", slug="testworld")
+
+    def setUp(self):
+        instrumentation.reset()
+        self.client.force_login(self.user)
+
+    def test_measure(self):
+        with instrumentation.measure("test", record=False) as measurement:
+            list(World.objects.all())
+            World.objects.count()
+        self.assertEqual(measurement.queries, 2)
+        self.assertGreaterEqual(measurement.wall_time, measurement.db_time)
+
+    @override_settings(QUERY_BUDGET_STRICT=True, QUERY_BUDGETS={"admin:worlds_world_changelist": 1})
+    def test_budget(self):
+        with self.assertRaises(instrumentation.QueryBudgetExceeded):
+            self.client.get(reverse("admin:worlds_world_changelist"))
+
+    def test_metrics(self):
+        self.client.get(reverse("admin:worlds_world_changelist"))
+        response = self.client.get(reverse("metrics"))
+        self.assertContains(response, 'storyworlds_view_requests_total{view="admin:worlds_world_changelist"} 1')
+
+
+class SyntheticWorldTests(TestCase):
+    def test_deterministic(self):
+        self.assertEqual(list(generate_records("a", 50, seed=1)), list(generate_records("a", 50, seed=1)))
+        self.assertNotEqual(list(generate_records("a", 50, seed=1)), list(generate_records("a", 50, seed=2)))
+
+    def test_generate_world(self):
+        world, counts = generate_world("synthetic", 80)
+        self.assertEqual(Character.objects.filter(world=world).count(), 80)
+        self.assertEqual(counts["event"], 40)
+        self.assertEqual(Lineage.objects.filter(descendant__world=world).order_by("-depth")[0].depth, GENERATIONS - 1)
+
+    def test_benchmarks(self):
+        report = benchmarks.run(40, repeat=1)
+        self.assertEqual(set(report["results"]), {"import"} | set(benchmarks.CASES))
+        self.assertEqual(benchmarks.compare(report, report), [])
+
+
+class ASGITests(TransactionTestCase):
+    # The pool threads use their own connections, so they only see committed rows.
+
+    def setUp(self):
+        cache.clear()
+        slugs.clear()
+        instrumentation.reset()
+        self.handler = asgi.ASGIHandler(threads=2)
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        for i in range(3):
+            Event.objects.create(world=self.world, name="Event %d" % i, slug="event-%d" % i, start_year=1000 + i)
+
+    def tearDown(self):
+        self.handler.executor.shutdown(wait=True)
+
+    def call(self, path, query=b"", headers=()):
+        """The messages the handler sends for a GET of path by a client that stays connected."""
+        headers = [(b"host", b"testserver"), *headers]
+        scope = {"type": "http", "method": "GET", "path": path, "query_string": query, "headers": headers}
+        incoming = [{"type": "http.request", "body": b""}]
+        sent = []
+
+        async def receive():
+            if incoming:
+                return incoming.pop()
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            sent.append(message)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.handler(scope, receive, send))
+        finally:
+            loop.close()
+        return sent
+
+    def test_streamed(self):
+        path = reverse("world_timeline", args=[self.world.slug])
+        with mock.patch.object(asgi, "CHUNK_SIZE", 1):
+            start, *bodies = self.call(path, b"limit=2")
+        self.assertEqual(start["status"], 200)
+        # One chunk per message, the last one closing the response.
+        self.assertGreater(len(bodies), 2)
+        self.assertEqual([body["more_body"] for body in bodies], [True] * (len(bodies) - 1) + [False])
+        document = json.loads(b"".join(body["body"] for body in bodies))
+        self.assertEqual([slide["text"]["headline"] for slide in document["events"]], ["Event 0", "Event 1"])
+        # Queries are counted whichever pool thread made each chunk.
+        requests, queries = instrumentation.totals()["world_timeline"][:2]
+        self.assertEqual(requests, 1)
+        self.assertGreater(queries, 0)
+
+        etag = dict(start["headers"])[b"ETag"]
+        start, body = self.call(path, b"limit=2", [(b"if-none-match", etag)])
+        self.assertEqual((start["status"], body["body"]), (304, b""))
+
+    def test_not_found(self):
+        start, body = self.call(reverse("world_timeline", args=["nowhere"]))
+        self.assertEqual(start["status"], 404)
+        self.assertNotIn("more_body", body)
+
+
+class SlugResolutionTests(TestCase):
+    def setUp(self):
+        slugs.clear()
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        self.place = Place.objects.create(world=self.world, name="Home", slug="home")
+
+    def test_resolve(self):
+        self.assertEqual(slugs.resolve("world", "testworld"), self.world.pk)
+        self.assertEqual(slugs.resolve("place", "home", self.world), self.place.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(slugs.resolve("place", "home", self.world), self.place.pk)
+        self.assertIsNone(slugs.resolve("place", "home", World.objects.create(name="Other", slug="other")))
+
+    def test_rename(self):
+        slugs.resolve("place", "home", self.world)
+        self.place.slug = "house"
+        self.place.save()
+        self.assertIsNone(slugs.resolve("place", "home", self.world))
+        self.assertEqual(slugs.resolve("place", "house", self.world), self.place.pk)
+
+
+class ConnectionsTests(TestCase):
+    def setUp(self):
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        self.people = {
+            name: Character.objects.create(world=self.world, name=name, slug=name.lower())
+            for name in ("Ash", "Birch", "Cedar", "Mentor")
+        }
+        ash, birch, cedar, mentor = (self.people[name] for name in ("Ash", "Birch", "Cedar", "Mentor"))
+        self.castle = Place.objects.create(world=self.world, name="Castle", slug="castle")
+        # Ash holds the castle, Birch feasted there; Cedar only went hunting, alone.
+        Title.objects.create(character=ash, place=self.castle, rank="Lord")
+        feast = Event.objects.create(world=self.world, name="Feast", slug="feast", place=self.castle)
+        EventParticipation.objects.create(character=birch, event=feast)
+        EventParticipation.objects.create(
+            character=cedar, event=Event.objects.create(world=self.world, name="Hunt", slug="hunt")
+        )
+        # The mentor is linked to each of them a different way, and to Ash twice.
+        CharacterRelationship.objects.create(from_char=ash, to_char=mentor, rel="student")
+        CharacterRelationship.objects.create(from_char=mentor, to_char=birch, rel="teacher")
+        FamilyTie.objects.create(parent=mentor, child=cedar)
+        FamilyTie.objects.create(parent=mentor, child=ash)
+
+    def shared(self, min_shared):
+        ids = [self.people[name].pk for name in ("Ash", "Birch", "Cedar")]
+        with self.assertNumQueries(8):
+            result = connections.connections(self.world, ids, min_shared)
+        return {entity["id"]: entity["count"] for entity in result["entities"]}, result["edges"]
+
+    def test_combined_links(self):
+        mentor, castle = "character-%d" % self.people["Mentor"].pk, "place-%d" % self.castle.pk
+        entities, edges = self.shared(2)
+        self.assertEqual(entities, {mentor: 3, castle: 2})
+        self.assertEqual(
+            sorted((edge["source"], edge["kind"]) for edge in edges if edge["target"] == castle),
+            [("character-%d" % self.people["Ash"].pk, "title"), ("character-%d" % self.people["Birch"].pk, "event")],
+        )
+        self.assertEqual(
+            sorted(edge["kind"] for edge in edges if edge["source"] == "character-%d" % self.people["Ash"].pk),
+            ["parent", "relationship", "title"],
+        )
+        self.assertEqual(self.shared(3)[0], {mentor: 3})
+
+
+class FamilyTreeTests(TransactionTestCase):
+    # Cached layouts are forgotten on commit, which TestCase never gets to.
+
+    def setUp(self):
+        cache.clear()
+        world = World.objects.create(name="Testworld", slug="testworld")
+        self.people = {
+            name: Character.objects.create(world=world, name=name, slug=name.lower())
+            for name in ("Root", "Elder", "Younger", "Grandchild")
+        }
+        self.elder = FamilyTie.objects.create(parent=self.people["Root"], child=self.people["Elder"], birth_order=0)
+        FamilyTie.objects.create(parent=self.people["Root"], child=self.people["Younger"], birth_order=1)
+        FamilyTie.objects.create(parent=self.people["Younger"], child=self.people["Grandchild"])
+
+    def layout(self):
+        return {
+            node["name"]: (node["generation"], node["position"])
+            for node in familytree.family_tree(self.people["Root"])["nodes"]
+        }
+
+    def test_layout(self):
+        self.assertEqual(self.layout(), {"Root": (0, 0), "Elder": (1, 0), "Younger": (1, 1), "Grandchild": (2, 0)})
+
+    def test_resort(self):
+        self.layout()
+        self.elder.birth_order = 2
+        self.elder.save()
+        self.assertEqual(self.layout()["Elder"], (1, 1))
+
+
+class IntervalIndexTests(SimpleTestCase):
+    def test_matches_scan(self):
+        spans = [
+            (start, start + length, i) for i, (start, length) in enumerate((s * 7 % 100, s % 13) for s in range(300))
+        ]
+        index = asof.IntervalIndex(spans)
+        for lo, hi in ((-5, -1), (0, 0), (17, 17), (40, 60), (99, 120), (200, 300)):
+            expected = sorted(i for start, end, i in spans if start <= hi and end >= lo)
+            self.assertEqual(sorted(index.overlapping(lo, hi)), expected)
+
+
+class AsOfTests(TransactionTestCase):
+    # World versions are bumped on commit, which TestCase never gets to.
+
+    def setUp(self):
+        asof.invalidate()
+        self.world = World.objects.create(name="Testworld", slug="testworld")
+        self.king = Character.objects.create(world=self.world, name="King", slug="king")
+        self.place = Place.objects.create(world=self.world, name="Realm", slug="realm")
+        Title.objects.create(character=self.king, place=self.place, rank="King", start_year=1000, end_year=1040)
+        Title.objects.create(character=self.king, place=self.place, rank="Regent")
+
+    def ranks(self, year):
+        return sorted(title["rank"] for title in asof.world_as_of(self.world, year, kinds=["title"])["title"])
+
+    def test_as_of(self):
+        self.assertEqual(self.ranks(1020), ["King", "Regent"])
+        self.assertEqual(self.ranks(1041), ["Regent"])
+        payload = asof.world_as_of(self.world, 1020)
+        self.assertEqual(
+            payload["names"], {"character-%d" % self.king.pk: "King", "place-%d" % self.place.pk: "Realm"}
+        )
+
+    def test_rebuilt_after_change(self):
+        self.assertEqual(self.ranks(1041), ["Regent"])
+        title = Title.objects.get(rank="King")
+        title.end_year = 1050
+        title.save()
+        self.assertEqual(self.ranks(1041), ["King", "Regent"])
+
+
+class DeltaTests(TestCase):
+    def test_frames(self):
+        world = World.objects.create(name="Testworld", slug="testworld")
+        king = Character.objects.create(world=world, name="King", slug="king", start_year=990, end_year=1040)
+        place = Place.objects.create(world=world, name="Realm", slug="realm")
+        title = Title.objects.create(character=king, place=place, rank="King", start_year=1012, end_year=1040)
+        frames = list(deltas.frames(world, 1000, 1049, step=10))
+        self.assertEqual(
+            frames,
+            [
+                {
+                    "frame": 1,
+                    "begin": {"title": [{"pk": title.pk, "character": king.pk, "place": place.pk, "rank": "King"}]},
+                    "end": {},
+                },
+                {"frame": 4, "begin": {}, "end": {"character": [king.pk], "title": [title.pk]}},
+            ],
+        )
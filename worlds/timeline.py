@@ -0,0 +1,289 @@
+"""World timeline export in the TimelineJS JSON format, and character timelines.
+
+Rows are read with ``.values()`` in keyset-paginated pages ordered by
+(start_key, pk), so an export never builds model instances and never holds
+more than one page in memory, however large the world is. Events are ordered
+by estimated_key instead, so those placed only by their DateConstraints (see
+worlds.dating) take their place in the timeline too.
+
+A character timeline merges the character's participations, titles and
+honors, each read in one query already sorted, and is cached until a change
+to one of the rows it was built from is committed.
+"""
+import heapq
+import json
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils.html import escape
+
+from . import significance
+from .chronology import lower_bound, unpack_date, upper_bound
+from .models import TEMPORAL_FIELDS, EventParticipation, Honor, Title
+
+PAGE_SIZE = 2000
+
+# Per Temporal model: the extra columns to read, how to build the slide
+# headline and text from them, and the key to order by if not start_key.
+SOURCES = {
+    "event": {
+        "fields": ("name", "notes", "place__name"),
+        "headline": "{name}",
+        "group": "place__name",
+        "key": "estimated_key",
+    },
+    "character": {"fields": ("name", "notes"), "headline": "{name}"},
+    "organization": {"fields": ("name", "notes"), "headline": "{name}"},
+    "title": {
+        "fields": ("rank", "place__name", "character__name"),
+        "headline": "{character__name}, {rank} of {place__name}",
+    },
+    "honor": {"fields": ("org__name", "character__name"), "headline": "{character__name}, {org__name}"},
+    "eventparticipation": {
+        "fields": ("role", "event__name", "character__name"),
+        "headline": "{character__name} ({role}): {event__name}",
+    },
+    "characterrelationship": {
+        "fields": ("rel", "from_char__name", "to_char__name"),
+        "headline": "{from_char__name} is {rel} of {to_char__name}",
+    },
+}
+
+
+def get_model(model_name):
+    """Return the Temporal model a timeline may be built from, or raise LookupError."""
+    if model_name not in SOURCES:
+        raise LookupError("No timeline for model %r" % model_name)
+    return apps.get_model("worlds", model_name)
+
+
+def sort_key(model_name):
+    """The column a model's timeline is ordered and paged by."""
+    return SOURCES[model_name].get("key", "start_key")
+
+
+def timeline_queryset(world, model_name="event", start=None, end=None, tags=(), zoom=None, per_bucket=None):
+    """Values queryset of one world's rows of a Temporal model, in timeline order.
+
+    start and end are partial dates (see worlds.chronology) bounding the time
+    window; tags must all be present on a row for it to be included. For events,
+    zoom picks a level of detail (see worlds.significance) at which only the
+    per_bucket most significant events of each bucket are included; significance
+    is only ranked among events with known dates, so zoomed timelines leave out
+    the estimated ones.
+    """
+    model = get_model(model_name)
+    key = sort_key(model_name)
+    queryset = model.objects.filter(**{model.world_path: world, key + "__isnull": False})
+    if zoom is not None:
+        if model_name != "event":
+            raise ValueError("Only event timelines can be zoomed")
+        per_bucket = significance.MAX_PER_BUCKET if per_bucket is None else per_bucket
+        queryset = queryset.filter(pk__in=significance.top_events(world, zoom, per_bucket, start, end))
+    window = Q()
+    # Rows without dates of their own fall in the window if their estimate does.
+    estimated = Q(start_key__isnull=True)
+    if start is not None:
+        window &= Q(end_key__gte=lower_bound(start))
+        estimated &= Q(**{key + "__gte": lower_bound(start)})
+    if end is not None:
+        window &= Q(start_key__lte=upper_bound(end))
+        estimated &= Q(**{key + "__lte": upper_bound(end)})
+    if window and key != "start_key":
+        window |= estimated
+    if window:
+        queryset = queryset.filter(window)
+    if tags and not any(f.name == "tags" for f in model._meta.get_fields()):
+        raise ValueError("Model %r has no tags" % model_name)
+    for tag in tags:
+        queryset = queryset.filter(tags__name__iexact=tag)
+    return queryset.order_by(key, "pk").values("pk", key, *TEMPORAL_FIELDS, *SOURCES[model_name]["fields"])
+
+
+def encode_cursor(cursor):
+    return "%d:%d" % cursor
+
+
+def decode_cursor(text):
+    """Parse a cursor produced by encode_cursor, raising ValueError if malformed."""
+    key, _, pk = text.partition(":")
+    return (int(key), int(pk))
+
+
+def timeline_page(
+    queryset, after=None, limit=PAGE_SIZE, cursor_of=lambda row: (row["start_key"], row["pk"]), key="start_key"
+):
+    """Fetch the rows following the (start_key, pk) cursor after.
+
+    Returns (rows, cursor) where cursor addresses the last row returned, or is
+    None when there are no more rows. cursor_of extracts the cursor from a row,
+    for querysets that are not values() dicts. key names the column to page on
+    instead of start_key, for querysets ordered by (key, pk).
+    """
+    if after is not None:
+        value, pk = after
+        queryset = queryset.filter(Q(**{key + "__gt": value}) | Q(**{key: value, "pk__gt": pk}))
+    rows = list(queryset[: limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, cursor_of(rows[-1])
+
+
+def _date(year, month, day, time):
+    date = {"year": year}
+    if month is not None:
+        date["month"] = month
+        if day is not None:
+            date["day"] = day
+            if time is not None:
+                date.update(hour=time.hour, minute=time.minute, second=time.second)
+    return date
+
+
+def slide(model_name, row):
+    """Convert one values() row into a TimelineJS slide dict."""
+    source = SOURCES[model_name]
+    if row["start_year"] is None:
+        # Only an estimate: give its year.
+        start_date = {"year": unpack_date(row[sort_key(model_name)])[0]}
+    else:
+        start_date = _date(row["start_year"], row["start_month"], row["start_day"], row["start_time"])
+    data = {
+        "unique_id": "%s-%d" % (model_name, row["pk"]),
+        "start_date": start_date,
+        "text": {"headline": escape(source["headline"].format(**row)), "text": escape(row.get("notes") or "")},
+    }
+    if row["time_type"] != "instant" and row["end_year"] is not None:
+        data["end_date"] = _date(row["end_year"], row["end_month"], row["end_day"], row["end_time"])
+    if source.get("group") and row[source["group"]]:
+        data["group"] = escape(row[source["group"]])
+    return data
+
+
+def stream_timeline(title, queryset, model_name, after=None, limit=None):
+    """Generate a TimelineJS document in chunks, one page of slides at a time.
+
+    When limit is given, at most that many slides are written and the document
+    carries a "next" cursor for the following page.
+    """
+    yield '{"title":%s,"events":[' % json.dumps({"text": {"headline": escape(title)}})
+    key = sort_key(model_name)
+    remaining = limit
+    cursor = after
+    separator = ""
+    while True:
+        rows, cursor = timeline_page(
+            queryset,
+            cursor,
+            PAGE_SIZE if remaining is None else min(PAGE_SIZE, remaining),
+            cursor_of=lambda row: (row[key], row["pk"]),
+            key=key,
+        )
+        if rows:
+            yield separator + ",".join(json.dumps(slide(model_name, row)) for row in rows)
+            separator = ","
+        if remaining is not None:
+            remaining -= len(rows)
+        if cursor is None or remaining == 0:
+            break
+    yield '],"next":%s}' % json.dumps(encode_cursor(cursor) if cursor else None)
+
+
+# ----------------------------------------------------------------------
+# Character timelines
+# ----------------------------------------------------------------------
+CHARACTER_CACHE_PREFIX = "worlds:character-timeline"
+CHARACTER_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Per source: the model, its sort key, the extra columns to read, and the headline.
+CHARACTER_SOURCES = (
+    (
+        "eventparticipation",
+        EventParticipation,
+        # Participations without dates of their own last as long as the event.
+        Coalesce("start_key", "event__start_key"),
+        ("role", "significance", "event", "event__name", "event__place", "event__place__name", "event__significance")
+        + tuple("event__" + field for field in TEMPORAL_FIELDS),
+        "{role}: {event__name}",
+    ),
+    ("title", Title, F("start_key"), ("rank", "place", "place__name"), "{rank} of {place__name}"),
+    ("honor", Honor, F("start_key"), ("org", "org__name"), "{org__name}"),
+)
+
+
+def _character_cache_key(pk):
+    return "%s:%d" % (CHARACTER_CACHE_PREFIX, pk)
+
+
+def forget_characters(pks):
+    """Drop the cached timelines of characters once the current transaction commits."""
+    keys = [_character_cache_key(pk) for pk in set(pks) if pk is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _merge_order(entry):
+    # Matches the SQL order of each source: undated rows last, then by key and pk.
+    return (entry["key"] is None, entry["key"] or 0, entry["pk"])
+
+
+def _entry(kind, headline, row):
+    if kind == "eventparticipation" and row["start_year"] is None:
+        row.update((field, row["event__" + field]) for field in TEMPORAL_FIELDS)
+    entry = {
+        "id": "%s-%d" % (kind, row["pk"]),
+        "kind": kind,
+        "pk": row["pk"],
+        "key": row["sort_key"],
+        "headline": headline.format(**row),
+        "start_date": None,
+    }
+    if row["start_year"] is not None:
+        entry["start_date"] = _date(row["start_year"], row["start_month"], row["start_day"], row["start_time"])
+    if row["time_type"] != "instant" and row["end_year"] is not None:
+        entry["end_date"] = _date(row["end_year"], row["end_month"], row["end_day"], row["end_time"])
+    for field in ("event", "place", "org"):
+        if field in row:
+            entry[field] = row[field]
+    if "event__place" in row:
+        entry["place"] = row["event__place"]
+        own = row["significance"]
+        entry["significance"] = row["event__significance"] if own is None else own
+    return entry
+
+
+def _entries(kind, headline, rows):
+    for row in rows:
+        yield _entry(kind, headline, row)
+
+
+def build_character_timeline(character):
+    """Every participation, title and honor of a character, in chronological order.
+
+    Costs one query per source; the sorted results are merged, not re-sorted.
+    """
+    streams = []
+    for kind, model, sort_key, fields, headline in CHARACTER_SOURCES:
+        rows = (
+            model.objects.filter(character=character)
+            .annotate(sort_key=sort_key)
+            .order_by(F("sort_key").asc(nulls_last=True), "pk")
+            .values("pk", "sort_key", *TEMPORAL_FIELDS, *fields)
+        )
+        streams.append(_entries(kind, headline, rows))
+    return list(heapq.merge(*streams, key=_merge_order))
+
+
+def character_timeline(character):
+    """The cached timeline of a character (instance or pk), building it on a miss."""
+    pk = getattr(character, "pk", character)
+    key = _character_cache_key(pk)
+    entries = cache.get(key)
+    if entries is None:
+        entries = build_character_timeline(pk)
+        cache.set(key, entries, CHARACTER_CACHE_TIMEOUT)
+    return entries
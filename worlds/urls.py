@@ -0,0 +1,18 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path("<slug:slug>/timeline/", views.world_timeline, name="world_timeline"),
+    path("<slug:slug>/graph/", views.world_graph, name="world_graph"),
+    path("<slug:slug>/as-of/", views.world_as_of, name="world_as_of"),
+    path("<slug:slug>/connections/", views.world_connections, name="world_connections"),
+    path("<slug:slug>/characters/<int:pk>/timeline/", views.character_timeline, name="character_timeline"),
+    path("<slug:slug>/characters/<int:pk>/family-tree/", views.family_tree, name="family_tree"),
+    path("<slug:slug>/search/", views.world_search, name="world_search"),
+    path("<slug:slug>/tags/", views.world_tags, name="world_tags"),
+    path("<slug:slug>/tags/<slug:kind>/", views.world_tagged, name="world_tagged"),
+    path("<slug:slug>/deltas/", views.world_deltas, name="world_deltas"),
+    path("<slug:slug>/campaign/", views.world_campaign, name="world_campaign"),
+    path("<slug:slug>/tiles/<int:z>/<int:x>/<int:y>.json", views.world_tile, name="world_tile"),
+]
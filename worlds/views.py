@@ -1,3 +1,336 @@
-from django.shortcuts import render
+from django.apps import apps
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from . import (
+    asof,
+    caching,
+    connections,
+    deltas,
+    facets,
+    familytree,
+    graph,
+    instrumentation,
+    maps,
+    search,
+    slugs,
+    timeline,
+)
+from .chronology import parse_partial_date
+from .models import Character, World
+
+MAX_GRAPH_HOPS = 3
+SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 500
+
+
+@require_GET
+@caching.world_cached
+def world_timeline(request, slug):
+    """Stream a world's timeline as TimelineJS JSON.
+
+    Query parameters: model (any Temporal model, default "event"), start and end
+    (partial dates bounding the window), tag (repeatable, all must match), limit
+    (page size) and after (the "next" cursor of the previous page). For events,
+    zoom (0 for the widest view) and per_bucket return only the most
+    significant events of each span of time.
+    """
+    world = slugs.resolve_or_404("world", slug)
+    params = request.GET
+    model_name = params.get("model", "event")
+    try:
+        start = parse_partial_date(params["start"]) if "start" in params else None
+        end = parse_partial_date(params["end"]) if "end" in params else None
+        limit = int(params["limit"]) if "limit" in params else None
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be positive")
+        after = timeline.decode_cursor(params["after"]) if "after" in params else None
+        zoom = int(params["zoom"]) if "zoom" in params else None
+        per_bucket = int(params["per_bucket"]) if "per_bucket" in params else None
+        queryset = timeline.timeline_queryset(world, model_name, start, end, params.getlist("tag"), zoom, per_bucket)
+    except (LookupError, ValueError) as err:
+        return HttpResponseBadRequest(str(err))
+    title = World.objects.filter(pk=world).values_list("name", flat=True).get()
+    return StreamingHttpResponse(
+        timeline.stream_timeline(title, queryset, model_name, after, limit), content_type="application/json"
+    )
+
+
+def _node_payload(keys, distances=None):
+    """Describe graph nodes, fetching names with one query per node kind."""
+    pks = {}
+    for kind, pk in keys:
+        pks.setdefault(kind, []).append(pk)
+    names = {}
+    for kind, kind_pks in pks.items():
+        model = apps.get_model("worlds", kind)
+        for pk, name in model.objects.filter(pk__in=kind_pks).order_by().values_list("pk", "name"):
+            names[(kind, pk)] = name
+    nodes = []
+    for key in keys:
+        node = {"id": "%s-%d" % key, "kind": key[0], "pk": key[1], "name": names.get(key)}
+        if distances is not None:
+            node["distance"] = distances[key]
+        nodes.append(node)
+    return nodes
+
+
+@instrumentation.query_budget(15)
+@require_GET
+@caching.world_cached
+def world_graph(request, slug):
+    """A character's neighbourhood in the world's social graph, as nodes and edges.
+
+    Query parameters: character (pk, required), hops (default 1), to (a second
+    character pk, to return a shortest path instead), as_of (partial date the
+    relationships must be current at) and kind (repeatable edge kinds to follow:
+    relationship, family, participation, honor).
+    """
+    world = slugs.resolve_or_404("world", slug)
+    params = request.GET
+    try:
+        character = int(params["character"])
+        hops = int(params.get("hops", 1))
+        if not 1 <= hops <= MAX_GRAPH_HOPS:
+            raise ValueError("hops must be between 1 and %d" % MAX_GRAPH_HOPS)
+        as_of = parse_partial_date(params["as_of"]) if "as_of" in params else None
+        kinds = params.getlist("kind") or None
+        if kinds and not set(kinds) <= set(graph.EDGE_KINDS):
+            raise ValueError("kind must be one of %s" % ", ".join(graph.EDGE_KINDS))
+        world_graph = graph.get_graph(world)
+        if "to" in params:
+            path = world_graph.shortest_path(character, int(params["to"]), as_of, kinds) or []
+            nodes, distances = path, None
+        else:
+            distances = world_graph.neighbourhood(character, hops, as_of, kinds)
+            nodes, path = list(distances), None
+    except KeyError as err:
+        return HttpResponseBadRequest("Missing parameter %s" % err)
+    except (LookupError, ValueError) as err:
+        return HttpResponseBadRequest(str(err))
+    edges = [
+        {"source": "%s-%d" % u, "target": "%s-%d" % v, "kind": kind, "pk": pk}
+        for u, v, kind, pk in world_graph.edges_among(nodes, as_of, kinds)
+    ]
+    payload = {"nodes": _node_payload(nodes, distances), "edges": edges}
+    if path is not None:
+        payload["path"] = ["%s-%d" % key for key in path]
+    return JsonResponse(payload)
+
+
+@instrumentation.query_budget(5)
+@require_GET
+@caching.world_cached
+def world_tile(request, slug, z, x, y):
+    """One GeoJSON map tile of a world's places, with geometries simplified for its zoom level."""
+    world = slugs.resolve_or_404("world", slug)
+    try:
+        return JsonResponse(maps.tile(world, z, x, y))
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+
+
+@require_GET
+@caching.world_cached
+def world_campaign(request, slug):
+    """Stream a world's located events in chronological order, for animating on a map.
+
+    Query parameters: character (pk, to follow one character's events), start
+    and end (partial dates bounding the window) and format: "json" (default)
+    for {"columns", "rows"} or "binary" for packed little-endian records of
+    int64 sort key, float64 longitude, float64 latitude and int64 event pk.
+    """
+    world = slugs.resolve_or_404("world", slug)
+    params = request.GET
+    fmt = params.get("format", "json")
+    try:
+        character = int(params["character"]) if "character" in params else None
+        start = parse_partial_date(params["start"]) if "start" in params else None
+        end = parse_partial_date(params["end"]) if "end" in params else None
+        if fmt not in ("json", "binary"):
+            raise ValueError("format must be json or binary")
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+    queryset = maps.campaign_queryset(world, character, start, end)
+    if fmt == "binary":
+        response = StreamingHttpResponse(
+            maps.stream_campaign_binary(queryset), content_type="application/octet-stream"
+        )
+        response["X-Record-Format"] = maps.CAMPAIGN_RECORD.format
+        response["X-Record-Columns"] = ",".join(maps.CAMPAIGN_COLUMNS)
+        return response
+    return StreamingHttpResponse(maps.stream_campaign_json(queryset), content_type="application/json")
+
+
+@require_GET
+@caching.world_cached
+def world_deltas(request, slug):
+    """Stream what begins and ends in each step of a time window, for animating a world's state.
+
+    Query parameters: start and end (partial dates, required), step (years per
+    frame, default 1) and kind (repeatable: character, organization, title,
+    honor, relationship; default all). Frames apply to the state at start, as
+    given by the as-of view.
+    """
+    world = slugs.resolve_or_404("world", slug)
+    params = request.GET
+    try:
+        start = parse_partial_date(params["start"])
+        end = parse_partial_date(params["end"])
+        step = int(params.get("step", 1))
+        frames = deltas.frames(world, start, end, step, params.getlist("kind") or None)
+    except KeyError as err:
+        return HttpResponseBadRequest("Missing parameter %s" % err)
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+    return StreamingHttpResponse(deltas.stream_frames(step, frames), content_type="application/json")
+
+
+@instrumentation.query_budget(10)
+@require_GET
+@caching.world_cached
+def world_connections(request, slug):
+    """The people, places, events and organizations shared by a set of characters, as a bipartite graph.
+
+    Query parameters: character (repeatable pks, at least two) and min (how many
+    of the characters must share an entity, default 2).
+    """
+    world = slugs.resolve_or_404("world", slug)
+    params = request.GET
+    try:
+        characters = [int(pk) for pk in params.getlist("character")]
+        if len(characters) < 2:
+            raise ValueError("At least two characters are needed")
+        min_shared = int(params.get("min", 2))
+        if not 2 <= min_shared <= len(characters):
+            raise ValueError("min must be between 2 and the number of characters")
+        return JsonResponse(connections.connections(world, characters, min_shared))
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+
+
+@instrumentation.query_budget(6)
+@require_GET
+@caching.world_cached
+def world_as_of(request, slug):
+    """The titles, honors, relationships and participations of a world current at a date.
+
+    Query parameters: as_of (partial date, required), end (partial date, to
+    ask about the whole window from as_of through end instead) and kind
+    (repeatable: title, honor, relationship, participation; default all).
+    """
+    world = slugs.resolve_or_404("world", slug)
+    params = request.GET
+    try:
+        start = parse_partial_date(params["as_of"])
+        end = parse_partial_date(params["end"]) if "end" in params else None
+        return JsonResponse(asof.world_as_of(world, start, end, params.getlist("kind") or None))
+    except KeyError as err:
+        return HttpResponseBadRequest("Missing parameter %s" % err)
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+
+
+@instrumentation.query_budget(6)
+@require_GET
+@caching.world_cached
+def character_timeline(request, slug, pk):
+    """A character's participations, titles and honors, merged in chronological order."""
+    character = get_object_or_404(Character, world=slugs.resolve_or_404("world", slug), pk=pk)
+    return JsonResponse(
+        {"character": {"pk": character.pk, "name": character.name}, "entries": timeline.character_timeline(character)}
+    )
+
+
+@instrumentation.query_budget(4)
+@require_GET
+@caching.world_cached
+def family_tree(request, slug, pk):
+    """The layered layout of a character's family tree: their descendants by generation, siblings in birth order."""
+    character = get_object_or_404(Character.objects.only("pk"), world=slugs.resolve_or_404("world", slug), pk=pk)
+    return JsonResponse(familytree.family_tree(character))
+
+
+@instrumentation.query_budget(4)
+@require_GET
+@caching.world_cached
+def world_search(request, slug):
+    """Full-text search of a world's names, notes and tags, best matches first.
+
+    Query parameters: q (the search words, each matched as a prefix), kind
+    (repeatable: place, setting, event, organization, character) and limit.
+    """
+    world = slugs.resolve_or_404("world", slug)
+    params = request.GET
+    try:
+        kinds = _kinds(params)
+        limit = int(params.get("limit", SEARCH_LIMIT))
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            raise ValueError("limit must be between 1 and %d" % MAX_SEARCH_LIMIT)
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+    return JsonResponse({"results": search.search(params.get("q", ""), world, kinds, limit)})
+
+
+def _kinds(params):
+    kinds = params.getlist("kind") or None
+    if kinds and not set(kinds) <= set(facets.TAGGED_MODELS):
+        raise ValueError("kind must be one of %s" % ", ".join(facets.TAGGED_MODELS))
+    return kinds
+
+
+@instrumentation.query_budget(3)
+@require_GET
+@caching.world_cached
+def world_tags(request, slug):
+    """A world's tag cloud from the precomputed counts.
+
+    Query parameters: kind (repeatable model names to count) and limit.
+    """
+    world = slugs.resolve_or_404("world", slug)
+    try:
+        kinds = _kinds(request.GET)
+        limit = int(request.GET["limit"]) if "limit" in request.GET else None
+        if limit is not None and not 1 <= limit <= MAX_SEARCH_LIMIT:
+            raise ValueError("limit must be between 1 and %d" % MAX_SEARCH_LIMIT)
+    except ValueError as err:
+        return HttpResponseBadRequest(str(err))
+    cloud = facets.tag_cloud(world, kinds, limit)
+    return JsonResponse({"tags": [{"name": name, "slug": slug, "count": count} for name, slug, count in cloud]})
+
+
+@instrumentation.query_budget(4)
+@require_GET
+@caching.world_cached
+def world_tagged(request, slug, kind):
+    """A world's objects of one kind carrying tags.
+
+    Query parameters: tag (repeatable, required), match ("all", the default, or
+    "any") and limit.
+    """
+    world = slugs.resolve_or_404("world", slug)
+    params = request.GET
+    try:
+        tags = params.getlist("tag")
+        if not tags:
+            raise ValueError("tag is required")
+        if params.get("match", "all") not in ("all", "any"):
+            raise ValueError("match must be all or any")
+        limit = int(params.get("limit", SEARCH_LIMIT))
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            raise ValueError("limit must be between 1 and %d" % MAX_SEARCH_LIMIT)
+        objects = facets.tagged(world, kind, tags, params.get("match", "all") == "all")
+    except (LookupError, ValueError) as err:
+        return HttpResponseBadRequest(str(err))
+    rows = objects.order_by("name", "pk").values("pk", "slug", "name")[:limit]
+    return JsonResponse({"results": list(rows)})
+
+
+@require_GET
+def metrics(request):
+    """Per view request, query and timing totals of this process, for Prometheus to scrape."""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(instrumentation.prometheus_text(), content_type="text/plain; version=0.0.4")